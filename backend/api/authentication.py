@@ -0,0 +1,132 @@
+"""
+带缓存的 JWT 认证
+JWTAuthentication 每个请求都按令牌中的用户ID查询一次用户；这里把用户连同其角色缓存在进程内存中，
+按 (用户ID, 令牌版本) 存放，轮询接口等频繁请求在命中时不再查询用户和角色。
+- 条目超过 AUTH_USER_CACHE_SECONDS 秒后失效，最多保存 AUTH_USER_CACHE_SIZE 个（LRU）
+- 用户信息或角色变化时由 api/signals.py 清除本进程中该用户的条目；
+  修改密码、角色时令牌版本加一，之后签发的令牌不会命中其他进程中的旧条目，
+  旧令牌在其他进程中最多沿用 AUTH_USER_CACHE_SECONDS 秒
+- 每个请求拿到的是缓存对象的副本，视图修改 request.user 不影响缓存；
+  缓存的用户可能已过期，不能保存（CustomUser.save 会拒绝），需要修改时重新读取
+
+推送票据：EventSource 无法设置请求头，通知推送接口不在 URL 中携带访问令牌，而是使用
+issue_stream_ticket() 签发的短期票据；票据只能用于推送接口，STREAM_TICKET_SECONDS 秒后失效，
+令牌版本变化（修改密码、角色）后同样失效
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+# 令牌中的版本声明，由 MyTokenObtainPairSerializer 写入
+TOKEN_VERSION_CLAIM = 'token_version'
+
+# 推送票据的签名用途，其他用途签发的数据不能当作票据使用
+STREAM_TICKET_SALT = 'feedback.notification_stream'
+
+
+class UserCache:
+    """OrderedDict 实现的 LRU，键为 (用户ID, 令牌版本)，值为 (过期时刻, 用户)"""
+
+    def __init__(self, maxsize=None, ttl=None):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        return self._maxsize if self._maxsize is not None else getattr(settings, 'AUTH_USER_CACHE_SIZE', 1000)
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else getattr(settings, 'AUTH_USER_CACHE_SECONDS', 60)
+
+    def get(self, user_id, version):
+        key = (str(user_id), version)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return copy.copy(user)
+
+    def set(self, user_id, version, user):
+        if self.ttl <= 0:
+            return
+        key = (str(user_id), version)
+        cached = copy.copy(user)
+        # 命中时返回的副本带有该标记，不能保存
+        cached._from_auth_cache = True
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, cached)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def evict(self, user_ids):
+        """清除这些用户的全部条目（不论令牌版本）"""
+        user_ids = {str(user_id) for user_id in user_ids}
+        with self._lock:
+            for key in [key for key in self._entries if key[0] in user_ids]:
+                del self._entries[key]
+
+    def clear(self, **kwargs):
+        """信号处理函数入口，忽略信号参数"""
+        with self._lock:
+            self._entries.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    未命中时按原方式查询用户（含 is_active 检查），并用一条查询取出角色，
+    授权上下文（api/authorization.py）直接使用缓存的角色，不再查询
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            return super().get_user(validated_token)
+        version = validated_token.get(TOKEN_VERSION_CLAIM)
+
+        user = user_cache.get(user_id, version)
+        if user is not None:
+            return user
+        user = super().get_user(validated_token)
+        user._authorization_roles = tuple(user.roles.values_list('name', 'topic'))
+        user_cache.set(user_id, version, user)
+        return user
+
+
+def issue_stream_ticket(user):
+    """为已登录用户签发通知推送票据"""
+    return signing.dumps({'user_id': user.pk, 'version': user.token_version}, salt=STREAM_TICKET_SALT)
+
+
+def authenticate_stream_ticket(ticket):
+    """校验推送票据，返回对应的用户；票据无效、过期或令牌版本已变化时返回 None"""
+    try:
+        data = signing.loads(
+            ticket, salt=STREAM_TICKET_SALT, max_age=getattr(settings, 'STREAM_TICKET_SECONDS', 60)
+        )
+    except signing.BadSignature:
+        return None
+    return get_user_model().objects.filter(
+        pk=data['user_id'], token_version=data['version'], is_active=True
+    ).first()
+
+
+# 创建单例实例
+user_cache = UserCache()
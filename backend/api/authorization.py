@@ -0,0 +1,75 @@
+"""
+请求级的授权上下文
+每个请求第一次判断角色时用一条查询取出当前用户的全部角色（名称和负责的分类关键字），保存在请求上；
+同一请求中的权限类、管理员视图和通知过滤都读取它，不再各自查询角色。
+内容管理员负责的分类ID由本请求查到的角色关键字与分类名称匹配得到（分类名称取自 feedback/admin_routing.py
+的缓存索引，不查询数据库）；不使用索引中按管理员预先计算的结果，该索引在其他进程中可能尚未失效，
+被撤销的角色不能因此继续生效。
+JWT 中的 roles/topics 声明在令牌过期前不会更新，撤销角色后仍会生效，因此不作为授权依据。
+"""
+from functools import cached_property
+
+from feedback.admin_routing import SUPER_ADMIN_ROLE, admin_routing
+
+# 内容管理员的角色名以此结尾（如 生活_admin；super_admin 同样满足）
+ADMIN_ROLE_SUFFIX = '_admin'
+
+
+class AuthorizationContext:
+
+    def __init__(self, user_id, roles):
+        """roles: [(角色名, 负责的分类关键字)]"""
+        self.user_id = user_id
+        self.role_names = frozenset(name for name, _ in roles)
+        self.role_topics = tuple(topic for _, topic in roles if topic)
+
+    @classmethod
+    def for_user(cls, user):
+        """
+        一条查询取出用户的全部角色；未登录用户没有角色
+        认证缓存（api/authentication.py）返回的用户已带有角色，不再查询
+        """
+        if user is None or not user.is_authenticated:
+            return cls(None, ())
+        roles = getattr(user, '_authorization_roles', None)
+        if roles is None:
+            roles = list(user.roles.values_list('name', 'topic'))
+        return cls(user.pk, roles)
+
+    @property
+    def is_super_admin(self):
+        return SUPER_ADMIN_ROLE in self.role_names
+
+    @property
+    def is_content_admin(self):
+        return any(name.endswith(ADMIN_ROLE_SUFFIX) for name in self.role_names)
+
+    @property
+    def is_any_admin(self):
+        return self.is_content_admin or self.is_super_admin
+
+    def has_role_containing(self, keyword):
+        return any(keyword in name for name in self.role_names)
+
+    @cached_property
+    def topic_ids(self):
+        """内容管理员负责的分类ID集合"""
+        return admin_routing.topics_matching(self.role_topics)
+
+    def can_manage_topic(self, topic_id):
+        """超级管理员管理所有分类，内容管理员只管理自己负责的分类"""
+        return self.is_super_admin or topic_id in self.topic_ids
+
+
+def get_authorization(request):
+    """
+    当前请求的授权上下文，第一次调用时创建
+    保存在底层的 HttpRequest 上，DRF 的 Request 和视图拿到的是同一个；用户变化（如登录）时重新创建
+    """
+    http_request = getattr(request, '_request', request)
+    user = request.user
+    context = getattr(http_request, '_authorization', None)
+    if context is None or context.user_id != (user.pk if user.is_authenticated else None):
+        context = AuthorizationContext.for_user(user)
+        http_request._authorization = context
+    return context
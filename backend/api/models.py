@@ -23,9 +23,23 @@ class CustomUser(AbstractUser):
     # 新增的字段，用于关联角色
     roles = models.ManyToManyField('Role', related_name='users', blank=True)
 
+    # 令牌版本：写入 JWT，修改密码或角色时加一，认证缓存按 (用户ID, 令牌版本) 存放（见 api/authentication.py）
+    token_version = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return self.username
 
+    def set_password(self, raw_password):
+        super().set_password(raw_password)
+        self.token_version += 1
+
+    def save(self, *args, **kwargs):
+        # 认证缓存中的用户（api/authentication.py）最多已过期 AUTH_USER_CACHE_SECONDS 秒，
+        # 写回会覆盖其他请求修改的密码、账号状态和令牌版本；需要修改时重新读取该用户
+        if getattr(self, '_from_auth_cache', False):
+            raise RuntimeError('Cached authenticated users are read-only; reload the user before saving')
+        super().save(*args, **kwargs)
+
 def generate_invitation_code():
     """生成随机邀请码"""
     chars = string.ascii_uppercase + string.digits
@@ -1,16 +1,17 @@
 from rest_framework import permissions
 
+from .authorization import get_authorization
+
+# 角色从请求级的授权上下文读取，同一请求中的多个权限类和视图共用一次查询
+
 class IsContentAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.roles.filter(name__endswith='_admin').exists()
+        return request.user.is_authenticated and get_authorization(request).is_content_admin
 
 class IsSuperAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.roles.filter(name='super_admin').exists()
+        return request.user.is_authenticated and get_authorization(request).is_super_admin
 
 class IsAnyAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and (
-            request.user.roles.filter(name__endswith='_admin').exists() or
-            request.user.roles.filter(name='super_admin').exists()
-        )
\ No newline at end of file
+        return request.user.is_authenticated and get_authorization(request).is_any_admin
@@ -0,0 +1,41 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import user_cache
+from .models import CustomUser, Role
+
+# 用户信息变化（包括修改密码、停用账号）时清除认证缓存中的该用户
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def evict_cached_user(sender, instance, **kwargs):
+    user_cache.evict([instance.pk])
+
+# 角色变化时令牌版本加一，之后签发的令牌不再命中其他进程中缓存的旧角色
+@receiver(m2m_changed, sender=CustomUser.roles.through)
+def user_roles_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        # 正向修改（user.roles.set() 等）：在数据库中加一（内存中的值可能已过期），再读回内存中的实例，
+        # 之后调用 save() 不会写回旧版本
+        CustomUser.objects.filter(pk=instance.pk).update(token_version=F('token_version') + 1)
+        instance.refresh_from_db(fields=['token_version'])
+        user_cache.evict([instance.pk])
+    elif pk_set:
+        CustomUser.objects.filter(pk__in=pk_set).update(token_version=F('token_version') + 1)
+        user_cache.evict(pk_set)
+    else:
+        # role.users.clear()：无法得知涉及的用户
+        user_cache.clear()
+
+# 角色名称或负责的分类变化时，持有该角色的用户令牌版本加一
+@receiver(post_save, sender=Role)
+def role_changed(sender, instance, created, **kwargs):
+    if created:
+        return
+    user_ids = list(instance.users.values_list('id', flat=True))
+    CustomUser.objects.filter(pk__in=user_ids).update(token_version=F('token_version') + 1)
+    user_cache.evict(user_ids)
+
+post_delete.connect(user_cache.clear, sender=Role, dispatch_uid='user_cache_role_deleted')
@@ -1,3 +1,114 @@
+"""
+认证缓存测试
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from feedback.admin_routing import admin_routing
+from .authentication import TOKEN_VERSION_CLAIM, UserCache, user_cache
+from .models import Role
+from .views import MyTokenObtainPairSerializer
+
+User = get_user_model()
+
+
+class CachedAuthenticationTest(TestCase):
+    """带缓存的 JWT 认证测试类"""
+
+    def setUp(self):
+        user_cache.clear()
+        admin_routing.invalidate()
+        self.role = Role.objects.create(name='生活_admin', topic='生活')
+        self.admin = User.objects.create_user(username='life_admin', password='pass12345')
+        self.admin.roles.add(self.role)
+        self.client = APIClient()
+        self.login(self.admin)
+        # 预先建立路由索引，只统计认证本身的查询
+        admin_routing.get()
+
+    def login(self, user):
+        user.refresh_from_db()
+        token = MyTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return token
+
+    def auth_queries(self, path, params=None):
+        """请求 path，返回查询用户或角色的 SQL"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, params or {})
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries if '"api_customuser"' in query['sql'] or '"api_role"' in query['sql']]
+
+    def test_polling_hits_cache(self):
+        """第一次请求查询用户和角色，之后的轮询不再查询"""
+        path, params = '/feedback/notifications/unread-count/', {'admin_filter': 'true'}
+        self.assertEqual(len(self.auth_queries(path, params)), 2)
+        self.assertEqual(self.auth_queries(path, params), [])
+        self.assertEqual(self.auth_queries('/api/admin/issues/'), [])
+
+    def test_role_and_password_changes_invalidate(self):
+        """修改角色、密码或停用账号后不再使用缓存的用户"""
+        version = self.admin.token_version
+        self.auth_queries('/api/admin/issues/')
+
+        # 与 UserAdminUpdateSerializer.update 相同的调用
+        self.admin.roles.set([])
+        self.admin.save()
+        self.admin.refresh_from_db()
+        self.assertGreater(self.admin.token_version, version)
+        self.assertEqual(self.client.get('/api/admin/issues/').status_code, 403)
+
+        token = self.login(self.admin)
+        self.assertEqual(token[TOKEN_VERSION_CLAIM], self.admin.token_version)
+        self.admin.set_password('new-pass12345')
+        self.admin.save()
+        self.assertGreater(self.admin.token_version, token[TOKEN_VERSION_CLAIM])
+        self.assertEqual(len(self.auth_queries('/feedback/notifications/unread-count/')), 2)
+
+        self.admin.is_active = False
+        self.admin.save()
+        self.assertEqual(self.client.get('/api/me/').status_code, 401)
+
+    def test_role_change_on_stale_instance(self):
+        """内存中的令牌版本已过期（其他请求改过角色）时，修改角色仍使版本增加"""
+        stale = User.objects.get(pk=self.admin.pk)
+        self.admin.roles.remove(self.role)
+        self.admin.refresh_from_db()
+        version = self.admin.token_version
+        stale.roles.add(self.role)
+        self.assertGreater(stale.token_version, version)
+        stale.refresh_from_db()
+        self.assertGreater(stale.token_version, version)
+
+    def test_profile_update_does_not_write_back_cached_user(self):
+        """缓存的用户已过期时，修改个人资料不会覆盖其他请求修改的密码和令牌版本"""
+        self.auth_queries('/api/me/')
+        cached = user_cache.get(self.admin.pk, self.admin.token_version)
+        with self.assertRaises(RuntimeError):
+            cached.save()
+        User.objects.filter(pk=self.admin.pk).update(password='changed-elsewhere', token_version=F('token_version') + 5)
+        response = self.client.patch('/api/profile/', {'bio': '你好'})
+        self.assertEqual(response.status_code, 200)
+        self.admin.refresh_from_db()
+        self.assertEqual((self.admin.password, self.admin.bio), ('changed-elsewhere', '你好'))
+
+    def test_cache_bounds(self):
+        """超过容量淘汰最久未使用的条目，过期的条目不再返回，返回的是副本"""
+        cache = UserCache(maxsize=2, ttl=60)
+        users = [User(pk=i, username=f'user{i}') for i in range(3)]
+        for user in users:
+            cache.set(user.pk, 0, user)
+        self.assertIsNone(cache.get(0, 0))
+        self.assertEqual(cache.get(2, 0).username, 'user2')
+        self.assertIsNone(cache.get(2, 1))
+        cache.get(2, 0).username = 'changed'
+        self.assertEqual(cache.get(2, 0).username, 'user2')
 
-# Create your tests here.
+        expired = UserCache(maxsize=2, ttl=-1)
+        expired.set(1, 0, users[1])
+        self.assertIsNone(expired.get(1, 0))
@@ -15,6 +15,7 @@ from .serializers import (
 )
 from .permissions import IsSuperAdmin, IsAnyAdmin, IsContentAdmin # 确保你已经创建了这些权限类
 from .models import CustomUser, InvitationCode
+from .authentication import TOKEN_VERSION_CLAIM
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
@@ -24,13 +25,15 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         # 将用户信息添加到令牌的自定义载荷中
         token['username'] = user.username
 
-        # 获取用户的所有角色名称
-        roles = [role.name for role in user.roles.all()]
-        token['roles'] = roles
+        # 获取用户的所有角色名称（一次查询取出全部角色）
+        roles = list(user.roles.all())
+        token['roles'] = [role.name for role in roles]
 
         # 新增：从用户的角色中获取所有相关的主题
-        topics = [role.topic for role in user.roles.all() if role.topic]
-        token['topics'] = topics
+        token['topics'] = [role.topic for role in roles if role.topic]
+
+        # 令牌版本：认证缓存的键（见 api/authentication.py）
+        token[TOKEN_VERSION_CLAIM] = user.token_version
 
         return token
 
@@ -47,7 +50,8 @@ class UserProfileUpdateView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_object(self):
-        return self.request.user
+        # request.user 可能来自认证缓存（已过期的副本），保存前重新读取，不写回旧的密码、状态和令牌版本
+        return CustomUser.objects.get(pk=self.request.user.pk)
 
 # 2. 新增的视图：用于获取当前登录用户的详细信息
 class UserDetailView(generics.RetrieveAPIView):
@@ -66,34 +70,25 @@ class UserAdminViewSet(viewsets.ModelViewSet):
 # 4. 管理员问题管理视图
 from rest_framework.decorators import api_view, permission_classes
 from feedback.models import Issue, Reply
-from feedback.serializers import IssueSerializer, ReplySerializer
+from feedback.serializers import AdminIssueListSerializer, ReplySerializer
+from .authorization import get_authorization
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAnyAdmin])
 def admin_issues_list(request):
     """管理员获取问题列表，根据角色过滤"""
-    user = request.user
-    user_roles = [role.name for role in user.roles.all()]
-    user_topics = [role.topic for role in user.roles.all() if role.topic]
+    auth = get_authorization(request)
+    issues = Issue.objects.filter(is_public=True)
     
-    # 如果是超级管理员，显示所有问题
-    if 'super_admin' in user_roles:
-        issues = Issue.objects.filter(is_public=True)
-    else:
-        # 内容管理员只能看到自己负责的分类
-        # 使用 Q 对象和 icontains 进行模糊匹配
-        from django.db.models import Q
-        query = Q()
-        for topic in user_topics:
-            # 匹配包含该topic关键字的主题
-            query |= Q(topic__name__icontains=topic)
-        
-        issues = Issue.objects.filter(is_public=True).filter(query)
+    # 超级管理员显示所有问题，内容管理员只能看到自己负责的分类
+    # 负责的分类由路由索引预先匹配为 topic_id，直接走外键索引
+    if not auth.is_super_admin:
+        issues = issues.filter(topic_id__in=auth.topic_ids)
     
     # 按更新时间排序
-    issues = issues.order_by('-updated')
+    issues = AdminIssueListSerializer.setup_queryset(issues.order_by('-updated'))
     
-    serializer = IssueSerializer(issues, many=True, context={'request': request})
+    serializer = AdminIssueListSerializer(issues, many=True, context={'request': request})
     return Response(serializer.data)
 
 @api_view(['POST'])
@@ -103,20 +98,10 @@ def admin_reply_issue(request, issue_id):
     try:
         issue = Issue.objects.get(id=issue_id, is_public=True)
         user = request.user
-        user_roles = [role.name for role in user.roles.all()]
-        user_topics = [role.topic for role in user.roles.all() if role.topic]
         
         # 权限检查：超级管理员可以回复所有问题，内容管理员只能回复自己负责的分类
-        if 'super_admin' not in user_roles:
-            # 检查issue的主题是否包含用户负责的任何主题关键字
-            has_permission = False
-            for topic in user_topics:
-                if topic in issue.topic.name:
-                    has_permission = True
-                    break
-            
-            if not has_permission:
-                return Response({'error': '您没有权限回复此问题'}, status=status.HTTP_403_FORBIDDEN)
+        if not get_authorization(request).can_manage_topic(issue.topic_id):
+            return Response({'error': '您没有权限回复此问题'}, status=status.HTTP_403_FORBIDDEN)
         
         # 创建回复
         content = request.data.get('content', '')
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
 application = get_asgi_application()
+
+# 在后台导入 OpenAI SDK 并创建共享客户端和服务，第一个请求不必等待（可通过 SERVICE_WARMUP 关闭）
+from feedback.service_registry import services  # noqa: E402
+
+services.warmup()
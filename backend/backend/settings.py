@@ -35,7 +35,7 @@ ALLOWED_HOSTS = ["*"]
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -159,4 +159,86 @@ CORS_TRUSTED_ORIGINS = [
 ]
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
\ No newline at end of file
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+
+# 浏览量/点赞量写回缓冲（feedback/counters.py）
+# 增量写回数据库的间隔（秒），<= 0 时不启动后台线程，只能手动 flush
+ISSUE_COUNTER_FLUSH_INTERVAL = 5
+# 设置为 CACHES 中的别名时，增量存放在该缓存中（多进程共享），否则存放在进程内存中（进程崩溃时未写回的增量会丢失）
+ISSUE_COUNTER_CACHE = None
+
+# 通知分发方式（需显式开启发件箱）：'sync'（默认）在请求中直接生成通知，扇出的开销仍在请求中；
+# 'outbox' 写入发件箱，由 `python manage.py dispatch_notifications` 异步生成通知，
+# 必须同时运行该 worker（或定时执行 --once），否则通知不会生成
+NOTIFICATION_DISPATCH_MODE = 'sync'
+
+# 通知推送（notifications/stream/，需通过 ASGI 部署）
+# 单个用户在同一进程中的最大推送连接数
+NOTIFICATION_PUSH_MAX_CONNECTIONS = 3
+# 空闲时的心跳间隔（秒）
+NOTIFICATION_PUSH_HEARTBEAT_SECONDS = 15
+# 补查其他进程生成的通知的间隔（秒），通知全部在 Web 进程中生成（'sync' 模式）时可设为 None
+NOTIFICATION_PUSH_CATCHUP_SECONDS = 60
+# 单个连接的最长保持时间（秒），之后由客户端重连并重新校验令牌
+NOTIFICATION_PUSH_MAX_SECONDS = 300
+
+# 智能分类结果缓存（feedback/classify_cache.py）
+# 进程内 LRU 的条目数和过期时间（秒）
+CLASSIFY_CACHE_SIZE = 1024
+CLASSIFY_CACHE_TTL = 3600
+# 是否同时写入数据库缓存表（多进程共享、重启后保留），及其过期时间（秒）
+CLASSIFY_CACHE_DB = False
+CLASSIFY_CACHE_DB_TTL = 7 * 24 * 3600
+# 本地关键词分类（feedback/keyword_classifier.py）的置信度达到该值时不再调用远程模型，设为大于 1 的值则总是调用
+CLASSIFY_LOCAL_CONFIDENCE_THRESHOLD = 0.75
+# 关键词分类置信度公式的常数，None 时使用未经拟合的默认值（1.5 和 2.0）
+# `python manage.py train_classifier` 会在留出集上拟合并输出，同时给出上述阈值下本地结果的准确率
+CLASSIFY_KEYWORD_SHARPNESS = None
+CLASSIFY_KEYWORD_EVIDENCE_SCALE = None
+# 离线训练的本地分类模型（`python manage.py train_classifier` 生成），文件不存在时跳过
+CLASSIFY_MODEL_PATH = BASE_DIR / 'classify_model.bin'
+# 本地模型的置信度达到该值时不再调用远程模型
+CLASSIFY_MODEL_CONFIDENCE_THRESHOLD = 0.8
+# 批量分类：远程模型的最大并发数，以及批量接口单次最多的问题数
+CLASSIFY_BATCH_CONCURRENCY = 4
+CLASSIFY_BATCH_MAX_ITEMS = 200
+
+# 服务注册表（feedback/service_registry.py）：ASGI/WSGI 进程启动后在后台预先导入 OpenAI SDK 并创建服务
+SERVICE_WARMUP = True
+
+# 异步 LLM 客户端（feedback/llm_client.py，chat/ 和 classify/ 的异步视图使用）
+# 每个进程同时进行的上游请求数上限
+LLM_MAX_CONCURRENCY = 8
+# 单个请求的截止时间（秒），包括排队等待
+LLM_CHAT_DEADLINE_SECONDS = 20
+LLM_CLASSIFY_DEADLINE_SECONDS = 8
+# 熔断器：连续失败次数阈值和熔断冷却时间（秒）
+LLM_BREAKER_FAILURES = 5
+LLM_BREAKER_RESET_SECONDS = 30
+# 流式回复中相邻两段内容的最长间隔（秒）
+LLM_STREAM_IDLE_SECONDS = 15
+
+# 智能客服会话（feedback/chat_sessions.py）
+# 最近对话原文的 token 预算，超出后把较早的轮次压缩进摘要
+CHAT_HISTORY_TOKEN_BUDGET = 1200
+# 摘要的 token 上限
+CHAT_SUMMARY_MAX_TOKENS = 300
+# 会话闲置多久（秒）后失效，由 purge_chat_sessions 命令清理
+CHAT_SESSION_TTL = 7 * 24 * 3600
+# 答案缓存（feedback/answer_cache.py）：相似度达到阈值的首个问题直接返回置顶或审核通过的回答
+CHAT_ANSWER_SIMILARITY_THRESHOLD = 0.86
+# 待审核的模型回答的上限，超出后淘汰最早的（置顶和审核通过的条目不计入、不淘汰）
+CHAT_ANSWER_CACHE_SIZE = 500
+
+# 全文搜索（feedback/search_index.py）：只对最新的若干条匹配文档（及其 1/5 数量的标题匹配文档）计算相关度，
+# 查询耗时与匹配数无关；常见词的结果偏向较新的问题，结果最多这么多个问题
+SEARCH_CANDIDATES = 500
+
+# 重复问题检测（feedback/duplicate_index.py）：估计的重合系数（共同的两字片段占较短文本的比例）达到该值时提示可能重复
+DUPLICATE_SIMILARITY_THRESHOLD = 0.4
+
+# 认证缓存（api/authentication.py）：已认证用户及其角色在进程内存中保存的秒数和最大条目数
+AUTH_USER_CACHE_SECONDS = 60
+AUTH_USER_CACHE_SIZE = 1000
+# 通知推送票据（notifications/stream-ticket/ 签发）的有效期（秒），只在建立连接时校验
+STREAM_TICKET_SECONDS = 60
@@ -1,6 +1,6 @@
 # your_app_name/admin.py
 from django.contrib import admin
-from .models import Issue, Topic, Notification # 从你的 models.py 中导入模型
+from .models import Issue, Topic, Notification, NotificationOutbox, ChatAnswer # 从你的 models.py 中导入模型
 
 # 注册你的模型
 admin.site.register(Issue)
@@ -12,3 +12,24 @@ class NotificationAdmin(admin.ModelAdmin):
     list_filter = ['notification_type', 'is_read', 'created']
     search_fields = ['recipient__username', 'title', 'message']
     readonly_fields = ['created']
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['id', 'event_type', 'status', 'attempts', 'created', 'processed_at']
+    list_filter = ['event_type', 'status']
+    search_fields = ['idempotency_key', 'last_error']
+    readonly_fields = ['created', 'processed_at', 'locked_at', 'claimed_by']
+
+
+@admin.register(ChatAnswer)
+class ChatAnswerAdmin(admin.ModelAdmin):
+    """
+    智能客服答案缓存：新增条目并勾选置顶即为常见问题，置顶条目不会被淘汰
+    登录用户提问得到的模型回答进入待审核队列，勾选审核通过后才会返回给其他用户
+    """
+    list_display = ['question', 'pinned', 'approved', 'hits', 'last_hit', 'created']
+    list_editable = ['pinned', 'approved']
+    list_filter = ['approved', 'pinned']
+    search_fields = ['question', 'answer']
+    readonly_fields = ['hits', 'last_hit', 'created']
@@ -0,0 +1,102 @@
+"""
+分类 → 管理员路由索引
+把管理员角色上的 topic 关键字预先匹配到具体的 Topic，
+新问题通知和管理员视图直接按 topic_id 查找，不再逐个管理员做字符串匹配或 icontains 查询
+"""
+import logging
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+SUPER_ADMIN_ROLE = 'super_admin'
+
+
+class AdminRoutingIndex:
+    """
+    缓存的路由索引，结构为：
+    {
+        'super_admins': {admin_id, ...},
+        'topic_admins': {topic_id: {admin_id, ...}},   # 不含超级管理员
+        'admin_topics': {admin_id: {topic_id, ...}},
+        'topic_names': {topic_id: 小写的分类名称},
+    }
+    角色、用户角色或分类变化时由 feedback/signals.py 调用 invalidate()，
+    下次访问时重建；缓存超时作为多进程部署下的兜底。
+    未配置共享缓存时 invalidate() 只作用于当前进程，其他进程最多沿用旧索引 timeout 秒，
+    因此授权判断（api/authorization.py）不使用 admin_topics，而是用请求中查到的角色关键字匹配 topic_names。
+    """
+    cache_key = 'feedback:admin_routing_index'
+    timeout = 300
+
+    def get(self):
+        index = cache.get(self.cache_key)
+        if index is None:
+            index = self.build()
+            cache.set(self.cache_key, index, self.timeout)
+        return index
+
+    def invalidate(self, **kwargs):
+        """信号处理函数入口，忽略信号参数"""
+        cache.delete(self.cache_key)
+
+    def build(self):
+        """重建索引：管理员角色关键字与分类名称做一次性的不区分大小写的包含匹配"""
+        from api.models import Role
+        from .models import Topic
+
+        super_admins = set()
+        keyword_admins = {}
+        roles = Role.objects.filter(users__isnull=False).values_list('name', 'topic', 'users')
+        for name, keyword, admin_id in roles:
+            if name == SUPER_ADMIN_ROLE:
+                super_admins.add(admin_id)
+            elif keyword:
+                keyword_admins.setdefault(keyword.lower(), set()).add(admin_id)
+
+        topic_admins = {}
+        admin_topics = {}
+        topic_names = {}
+        for topic_id, topic_name in Topic.objects.values_list('id', 'name'):
+            name = topic_names[topic_id] = topic_name.lower()
+            for keyword, admin_ids in keyword_admins.items():
+                if keyword in name:
+                    topic_admins.setdefault(topic_id, set()).update(admin_ids)
+                    for admin_id in admin_ids:
+                        admin_topics.setdefault(admin_id, set()).add(topic_id)
+
+        logger.info(f"Admin routing index rebuilt: {len(super_admins)} super admins, {len(topic_admins)} routed topics")
+        return {
+            'super_admins': super_admins,
+            'topic_admins': topic_admins,
+            'admin_topics': admin_topics,
+            'topic_names': topic_names,
+        }
+
+    def is_super_admin(self, admin_id):
+        return admin_id in self.get()['super_admins']
+
+    def super_admins(self):
+        return set(self.get()['super_admins'])
+
+    def admins_for_topic(self, topic_id):
+        """负责该分类的内容管理员（不含超级管理员）"""
+        return set(self.get()['topic_admins'].get(topic_id, ()))
+
+    def topics_for_admin(self, admin_id):
+        """内容管理员负责的分类ID集合"""
+        return set(self.get()['admin_topics'].get(admin_id, ()))
+
+    def topics_matching(self, keywords):
+        """名称包含任一关键字（不区分大小写）的分类ID集合"""
+        keywords = [keyword.lower() for keyword in keywords if keyword]
+        if not keywords:
+            return set()
+        return {
+            topic_id for topic_id, name in self.get()['topic_names'].items()
+            if any(keyword in name for keyword in keywords)
+        }
+
+
+# 创建单例实例
+admin_routing = AdminRoutingIndex()
@@ -0,0 +1,185 @@
+"""
+智能客服答案缓存
+把问题编码为哈希字符 n-gram 的稀疏向量（L2 归一化），用倒排表在管理员维护的常见问题和
+审核通过的模型回答中查找余弦相似度最高的一条，达到 CHAT_ANSWER_SIMILARITY_THRESHOLD 时
+直接返回其答案，不再调用模型。
+模型回答会被原样返回给其他用户，因此只记录登录用户的提问，并且在管理员审核通过（approved）之前
+只进入待审核队列，不参与查找。
+条目保存在 ChatAnswer 表中，每个进程在内存中维护一份索引；可查找的条目被修改时通过缓存中的版本号
+通知其他进程重新加载，超时重新加载作为兜底。
+"""
+import logging
+import math
+import re
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .classify_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = 1 << 18
+NGRAM_RANGE = (1, 3)
+
+# 含义相同的疑问词统一写法，语气词和客套话去掉，使“如何提交问题？”与“请问怎么提交问题啊”一致
+SYNONYMS = [("怎么样", "怎么"), ("怎样", "怎么"), ("如何", "怎么"), ("咋", "怎么")]
+FILLERS = re.compile("请问|一下|吗|呢|啊|呀|吧")
+
+
+def embed(text):
+    """问题 → {桶编号: 权重}，n-gram 按长度 n 加权，较长的片段重合更能说明是同一个问题"""
+    text = normalize_text(text)
+    for word, canonical in SYNONYMS:
+        text = text.replace(word, canonical)
+    text = FILLERS.sub('', text)
+
+    counts = Counter()
+    low, high = NGRAM_RANGE
+    for n in range(low, high + 1):
+        for i in range(len(text) - n + 1):
+            counts[zlib.crc32(text[i:i + n].encode('utf-8')) % BUCKETS] += n
+    norm = math.sqrt(sum(w * w for w in counts.values()))
+    return {b: w / norm for b, w in counts.items()} if norm else {}
+
+
+class AnswerIndex:
+    """
+    内存中的向量索引
+    entries: {条目ID: (向量, 答案)}，postings: {桶编号: {条目ID, ...}}
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.postings = defaultdict(set)
+
+    def add(self, entry_id, question, answer):
+        self.remove(entry_id)
+        vector = embed(question)
+        self.entries[entry_id] = (vector, answer)
+        for bucket in vector:
+            self.postings[bucket].add(entry_id)
+
+    def remove(self, entry_id):
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for bucket in entry[0]:
+            ids = self.postings.get(bucket)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self.postings[bucket]
+
+    def search(self, question):
+        """返回 (条目ID, 相似度)，没有任何重合时返回 (None, 0.0)"""
+        scores = defaultdict(float)
+        for bucket, weight in embed(question).items():
+            for entry_id in self.postings.get(bucket, ()):
+                scores[entry_id] += weight * self.entries[entry_id][0][bucket]
+        if not scores:
+            return None, 0.0
+        entry_id = max(scores, key=scores.get)
+        return entry_id, scores[entry_id]
+
+
+class AnswerCache:
+    version_key = 'feedback:chat_answer_version'
+    refresh_interval = 300
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._loaded_at = 0.0
+
+    @property
+    def threshold(self):
+        return getattr(settings, 'CHAT_ANSWER_SIMILARITY_THRESHOLD', 0.86)
+
+    @property
+    def maxsize(self):
+        return getattr(settings, 'CHAT_ANSWER_CACHE_SIZE', 500)
+
+    def _current_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_key)
+        return version
+
+    def _get_index(self):
+        version = self._current_version()
+        with self._lock:
+            if (
+                self._index is None or self._version != version
+                or time.monotonic() - self._loaded_at > self.refresh_interval
+            ):
+                from .models import ChatAnswer
+                index = AnswerIndex()
+                entries = ChatAnswer.objects.filter(Q(pinned=True) | Q(approved=True))
+                for entry_id, question, answer in entries.values_list('id', 'question', 'answer'):
+                    index.add(entry_id, question, answer)
+                self._index, self._version, self._loaded_at = index, version, time.monotonic()
+            return self._index
+
+    def lookup(self, question):
+        """
+        查找相似的问题
+        Returns:
+            dict: {"id": 条目ID, "answer": 答案, "similarity": 相似度}，未命中返回 None
+        """
+        from .models import ChatAnswer
+        try:
+            index = self._get_index()
+            entry_id, similarity = index.search(question)
+            if entry_id is None or similarity < self.threshold:
+                return None
+            ChatAnswer.objects.filter(pk=entry_id).update(hits=F('hits') + 1, last_hit=timezone.now())
+        except DatabaseError as e:
+            logger.warning(f"Chat answer cache lookup failed: {str(e)}")
+            return None
+        return {"id": entry_id, "answer": index.entries[entry_id][1], "similarity": round(similarity, 4)}
+
+    def learn(self, question, answer):
+        """
+        把模型的回答加入待审核队列（审核通过前不会被返回），相同的问题只记录一次；
+        待审核的条目超出上限时淘汰最早的
+        """
+        from .models import ChatAnswer
+        question = question[:1000]
+        try:
+            if ChatAnswer.objects.filter(question=question).exists():
+                return None
+            entry = ChatAnswer.objects.create(question=question, answer=answer)
+            stale = list(
+                ChatAnswer.objects.filter(pinned=False, approved=False).order_by('-id')
+                .values_list('id', flat=True)[self.maxsize:]
+            )
+            if stale:
+                ChatAnswer.objects.filter(id__in=stale).delete()
+        except DatabaseError as e:
+            logger.warning(f"Chat answer cache write failed: {str(e)}")
+            return None
+        return entry
+
+    def invalidate(self, instance=None, **kwargs):
+        """
+        信号处理函数入口：可查找的条目被新增、修改或删除后通知所有进程重新加载
+        新增或删除待审核的条目不影响索引；修改时可能是撤销了审核，总是重新加载
+        """
+        if instance is not None and not (instance.pinned or instance.approved) and kwargs.get('created', True):
+            return
+        cache.set(self.version_key, uuid.uuid4().hex, None)
+
+
+# 创建单例实例
+answer_cache = AnswerCache()
@@ -2,11 +2,16 @@
 智能客服聊天服务
 使用 OpenAI API 提供 DoveLink 校园反馈系统的智能客服功能
 """
-from openai import OpenAI
 from django.conf import settings
 from rest_framework.exceptions import ValidationError
 from .validation_utils import InputValidator, SQLInjectionDetector
+from .llm_client import llm_client, UpstreamUnavailable
+from .service_registry import SharedService, services
+from .chat_sessions import chat_sessions
+from .answer_cache import answer_cache
+from asgiref.sync import sync_to_async
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -14,29 +19,10 @@ logger = logging.getLogger(__name__)
 class ChatService:
     """智能客服聊天服务类"""
     
+    # 与智能分类共用的 OpenAI 客户端，第一次调用时才导入 SDK 并创建；未配置 API 密钥时为 None
+    client = SharedService('openai')
+
     def __init__(self):
-        """初始化 OpenAI 客户端"""
-        try:
-            api_key = settings.OPENAI_API_KEY
-            base_url = settings.OPENAI_BASE_URL
-            
-            if not api_key or api_key == "your_openai_api_key_here":
-                logger.error("OPENAI_API_KEY is not set in settings")
-                self.client = None
-                logger.warning("OpenAI API密钥未配置，智能客服功能将不可用")
-            else:
-                self.client = OpenAI(
-                    api_key=api_key,
-                    base_url=base_url,
-                    timeout=60.0,  # 设置60秒超时
-                    max_retries=2   # 失败后重试2次
-                )
-                logger.info("ChatService OpenAI client initialized successfully")
-                
-        except Exception as e:
-            logger.error(f"Failed to initialize ChatService OpenAI client: {str(e)}")
-            self.client = None
-        
         # 定义系统角色 Prompt
         self.system_prompt = (
             "你是 DoveLink 校园反馈系统的智能客服，负责帮助学生与老师解决校园事务相关问题。"
@@ -55,96 +41,41 @@ class ChatService:
             "请用简洁、清晰的语言回答问题，必要时可以分点说明。"
         )
     
-    def get_response(self, user_message: str, conversation_history: list = None) -> dict:
+    def get_response(self, user_message: str, conversation_history: list = None, user=None) -> dict:
         """
         获取 AI 客服回复
         
         Args:
             user_message: 用户输入的消息
             conversation_history: 对话历史（可选），格式为 [{"role": "user/assistant", "content": "..."}]
+            user: 提问的用户（可选），只有登录用户的提问会进入答案缓存的待审核队列
         
         Returns:
             dict: 包含回复内容和状态的字典
         """
-        # 检查客户端是否已初始化
-        if self.client is None:
-            logger.warning("ChatService client is None, cannot process request")
-            return {
-                "success": False,
-                "message": "智能客服功能暂未启用，请配置OpenAI API密钥后使用。",
-                "error": "OpenAI API密钥未配置"
-            }
-        
         try:
-            # 输入验证
-            if not user_message or not user_message.strip():
-                return {
-                    "success": False,
-                    "message": "请输入有效的消息内容。",
-                    "error": "消息内容为空"
-                }
+            messages, error = self._build_messages(user_message, conversation_history)
+            if error:
+                return error
             
-            # 验证消息长度
-            if len(user_message) > 1000:
-                return {
-                    "success": False,
-                    "message": "消息内容过长，请控制在1000个字符以内。",
-                    "error": "消息内容过长"
-                }
+            # 与上下文无关的问题先查答案缓存，未配置 API 密钥时常见问题同样可以回答
+            cacheable = self._cacheable(conversation_history, None)
+            if cacheable:
+                hit = answer_cache.lookup(user_message.strip())
+                if hit:
+                    return self._cached_result(hit)
             
-            # 检测SQL注入
-            if SQLInjectionDetector.detect_sql_injection(user_message):
-                logger.warning(f"Detected possible SQL injection attempt in chat message: {user_message[:50]}")
-                return {
-                    "success": False,
-                    "message": "检测到不安全的输入内容，请检查后重试。",
-                    "error": "SQL注入检测"
-                }
-            
-            # 清理用户输入
-            safe_user_message = InputValidator.sanitize_input(user_message, max_length=1000)
-            
-            # 构建消息列表
-            messages = [{"role": "system", "content": self.system_prompt}]
-            
-            # 添加历史对话（如果有）
-            if conversation_history:
-                # 验证历史对话格式
-                if isinstance(conversation_history, list):
-                    for msg in conversation_history:
-                        if isinstance(msg, dict) and 'role' in msg and 'content' in msg:
-                            # 清理历史消息内容
-                            safe_content = InputValidator.sanitize_input(msg['content'], max_length=1000)
-                            messages.append({
-                                "role": msg['role'],
-                                "content": safe_content
-                            })
-            
-            # 添加当前用户消息
-            messages.append({"role": "user", "content": safe_user_message})
-            
-            logger.info(f"ChatService preparing API call - messages: {len(messages)}, user_message_length: {len(safe_user_message)}")
+            # 检查客户端是否已初始化
+            if self.client is None:
+                logger.warning("ChatService client is None, cannot process request")
+                return self._not_configured_result()
             
             # 调用 OpenAI API
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",  # 可以根据需要更改模型
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500
-            )
-            
-            # 提取回复内容
-            assistant_message = response.choices[0].message.content
-            
-            return {
-                "success": True,
-                "message": assistant_message,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
-            }
+            response = self.client.chat.completions.create(**self._completion_kwargs(messages))
+            result = self._success_result(response)
+            if cacheable and self._learnable(user=user) and self._complete(response.choices[0]):
+                answer_cache.learn(user_message.strip(), result['message'])
+            return result
             
         except Exception as e:
             import traceback
@@ -156,7 +87,251 @@ class ChatService:
                 "error": str(e),
                 "error_type": type(e).__name__
             }
+    
+    async def aget_response(self, user_message: str, conversation_history: list = None, session=None) -> dict:
+        """
+        get_response 的异步版本（ASGI 视图使用）
+        通过共享的异步客户端调用，受并发上限、截止时间和熔断器约束；
+        上游不可用时立即返回固定的降级回复（degraded=True）
+        传入 session（ChatSession）时使用服务端保存的历史，忽略 conversation_history，成功后保存本轮对话
+        """
+        messages, error = self._build_messages(user_message, conversation_history, session)
+        if error:
+            return error
+        
+        cacheable = self._cacheable(conversation_history, session)
+        hit = await sync_to_async(answer_cache.lookup)(user_message.strip()) if cacheable else None
+        if hit:
+            result = self._cached_result(hit)
+            if session is not None:
+                await chat_sessions.arecord_turn(session, messages[-1]['content'], result['message'])
+                result['session_id'] = str(session.pk)
+            return result
+        if not llm_client.configured:
+            return self._not_configured_result()
+        
+        deadline = time.monotonic() + getattr(settings, 'LLM_CHAT_DEADLINE_SECONDS', 20)
+        try:
+            response = await llm_client.chat_completion(deadline, **self._completion_kwargs(messages))
+        except UpstreamUnavailable as e:
+            logger.warning(f"ChatService degraded: {str(e)}")
+            return {
+                "success": False,
+                "message": "智能客服当前繁忙，请稍后再试。您也可以直接提交反馈问题，管理员会尽快处理。",
+                "error": str(e),
+                "degraded": True
+            }
+        result = self._success_result(response)
+        if cacheable and self._learnable(session=session) and self._complete(response.choices[0]):
+            await sync_to_async(answer_cache.learn)(user_message.strip(), result['message'])
+        if session is not None:
+            await chat_sessions.arecord_turn(session, messages[-1]['content'], result['message'], self.asummarize)
+            result['session_id'] = str(session.pk)
+        return result
+    
+    def astream_response(self, user_message: str, conversation_history: list = None, session=None):
+        """
+        流式获取 AI 客服回复
+        输入校验与 get_response 相同，校验失败时返回错误结果字典；
+        否则返回异步生成器，依次产出 ("delta", 文本片段)，最后产出 ("done", usage) 或 ("error", 提示信息)
+        传入 session 时的处理与 aget_response 相同，完整回复结束后保存本轮对话
+        """
+        messages, error = self._build_messages(user_message, conversation_history, session)
+        if error:
+            return error
+        question = user_message.strip() if self._cacheable(conversation_history, session) else None
+        if question is None and not llm_client.configured:
+            return self._not_configured_result()
+        return self._stream(messages, session, question)
+    
+    async def _stream(self, messages, session=None, question=None):
+        """question 不为空时先查答案缓存，命中则一次性产出缓存的答案"""
+        hit = await sync_to_async(answer_cache.lookup)(question) if question else None
+        if hit:
+            if session is not None:
+                await chat_sessions.arecord_turn(session, messages[-1]['content'], hit['answer'])
+            yield "delta", hit['answer']
+            yield "done", self._cached_result(hit)['usage']
+            return
+        if not llm_client.configured:
+            yield "error", self._not_configured_result()['message']
+            return
+        
+        deadline = time.monotonic() + getattr(settings, 'LLM_CHAT_DEADLINE_SECONDS', 20)
+        usage = {}
+        parts = []
+        finish_reason = None
+        try:
+            async for chunk in llm_client.stream_chat_completion(
+                deadline, stream_options={"include_usage": True}, **self._completion_kwargs(messages)
+            ):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield "delta", chunk.choices[0].delta.content
+                if chunk.choices and getattr(chunk.choices[0], 'finish_reason', None):
+                    finish_reason = chunk.choices[0].finish_reason
+                if getattr(chunk, 'usage', None):
+                    usage = {
+                        "prompt_tokens": chunk.usage.prompt_tokens,
+                        "completion_tokens": chunk.usage.completion_tokens,
+                        "total_tokens": chunk.usage.total_tokens
+                    }
+        except UpstreamUnavailable as e:
+            logger.warning(f"ChatService stream degraded: {str(e)}")
+            yield "error", "智能客服当前繁忙，请稍后再试。您也可以直接提交反馈问题，管理员会尽快处理。"
+            return
+        if question and self._learnable(session=session) and finish_reason in (None, 'stop'):
+            await sync_to_async(answer_cache.learn)(question, ''.join(parts))
+        if session is not None:
+            await chat_sessions.arecord_turn(session, messages[-1]['content'], ''.join(parts), self.asummarize)
+        yield "done", usage
+    
+    async def asummarize(self, summary, evicted):
+        """
+        把原摘要和移出窗口的对话压缩成新摘要，上游不可用时返回 None（保留本地压缩的摘要）
+        """
+        max_tokens = getattr(settings, 'CHAT_SUMMARY_MAX_TOKENS', 300)
+        labels = {'user': '用户', 'assistant': '客服'}
+        transcript = '\n'.join(f"{labels.get(m['role'], m['role'])}：{m['content']}" for m in evicted)
+        prompt = (
+            f"请把下面的客服对话压缩成不超过{max_tokens}字的摘要，"
+            "保留用户的身份、诉求、涉及的问题和客服已给出的结论，只输出摘要本身。\n\n"
+            f"已有摘要：\n{summary or '（无）'}\n\n新增对话：\n{transcript}"
+        )
+        deadline = time.monotonic() + getattr(settings, 'LLM_CHAT_DEADLINE_SECONDS', 20)
+        try:
+            response = await llm_client.chat_completion(
+                deadline,
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+                max_tokens=max_tokens,
+            )
+        except UpstreamUnavailable as e:
+            logger.warning(f"ChatService summary skipped: {str(e)}")
+            return None
+        return response.choices[0].message.content
+    
+    def _build_messages(self, user_message, conversation_history, session=None):
+        """
+        校验用户消息并构建消息列表
+        session 不为空时使用服务端保存的摘要和最近对话，不再使用客户端发送的历史
+        
+        Returns:
+            (messages, None) 或 (None, 错误结果)
+        """
+        # 输入验证
+        if not user_message or not user_message.strip():
+            return None, {
+                "success": False,
+                "message": "请输入有效的消息内容。",
+                "error": "消息内容为空"
+            }
+        
+        # 验证消息长度
+        if len(user_message) > 1000:
+            return None, {
+                "success": False,
+                "message": "消息内容过长，请控制在1000个字符以内。",
+                "error": "消息内容过长"
+            }
+        
+        # 检测SQL注入
+        if SQLInjectionDetector.detect_sql_injection(user_message):
+            logger.warning(f"Detected possible SQL injection attempt in chat message: {user_message[:50]}")
+            return None, {
+                "success": False,
+                "message": "检测到不安全的输入内容，请检查后重试。",
+                "error": "SQL注入检测"
+            }
+        
+        # 清理用户输入
+        safe_user_message = InputValidator.sanitize_input(user_message, max_length=1000)
+        
+        # 构建消息列表
+        messages = [{"role": "system", "content": self.system_prompt}]
+        
+        # 添加历史对话（如果有）
+        if session is not None:
+            messages.extend(chat_sessions.context_messages(session))
+        elif conversation_history:
+            # 验证历史对话格式
+            if isinstance(conversation_history, list):
+                for msg in conversation_history:
+                    if isinstance(msg, dict) and 'role' in msg and 'content' in msg:
+                        # 清理历史消息内容
+                        safe_content = InputValidator.sanitize_input(msg['content'], max_length=1000)
+                        messages.append({
+                            "role": msg['role'],
+                            "content": safe_content
+                        })
+        
+        # 添加当前用户消息
+        messages.append({"role": "user", "content": safe_user_message})
+        
+        logger.info(f"ChatService preparing API call - messages: {len(messages)}, user_message_length: {len(safe_user_message)}")
+        return messages, None
+    
+    @staticmethod
+    def _cacheable(conversation_history, session):
+        """只有对话中的第一个问题与上下文无关，可以使用和写入答案缓存"""
+        if session is not None:
+            return session.turns == 0 and not session.summary
+        return not conversation_history
+    
+    @staticmethod
+    def _learnable(session=None, user=None):
+        """只把登录用户的提问记录到答案缓存（审核通过前不会被使用），匿名请求可以任意构造问答"""
+        if session is not None:
+            return session.user_id is not None
+        return user is not None and user.is_authenticated
+    
+    @staticmethod
+    def _complete(choice):
+        """被 max_tokens 截断的回答不写入缓存"""
+        return getattr(choice, 'finish_reason', None) in (None, 'stop')
+    
+    @staticmethod
+    def _cached_result(hit):
+        return {
+            "success": True,
+            "message": hit['answer'],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            "cached": True
+        }
+    
+    @staticmethod
+    def _completion_kwargs(messages):
+        return {
+            "model": "gpt-3.5-turbo",  # 可以根据需要更改模型
+            "messages": messages,
+            "temperature": 0.7,
+            "max_tokens": 500
+        }
+    
+    @staticmethod
+    def _success_result(response):
+        # 提取回复内容
+        return {
+            "success": True,
+            "message": response.choices[0].message.content,
+            "usage": {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens
+            }
+        }
+    
+    @staticmethod
+    def _not_configured_result():
+        return {
+            "success": False,
+            "message": "智能客服功能暂未启用，请配置OpenAI API密钥后使用。",
+            "error": "OpenAI API密钥未配置",
+            "degraded": True
+        }
 
 
-# 创建单例实例
-chat_service = ChatService()
+# 注册到服务注册表，第一次使用时创建
+services.register('chat', ChatService)
+chat_service = services.lazy('chat')
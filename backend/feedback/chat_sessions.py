@@ -0,0 +1,169 @@
+"""
+智能客服会话存储
+对话历史保存在服务端，客户端每次只发送 session_id 和新消息。
+发给模型的上下文 = 系统提示 + 更早对话的摘要 + 最近若干轮原文：
+最近轮次的 token 数超过 CHAT_HISTORY_TOKEN_BUDGET 时，把最早的轮次移出窗口（直到不超过预算的一半），
+压缩进摘要，因此每次请求的大小有上限，且不会每一轮都触发压缩。
+保存的内容已经过清理，再次发送时不重复清理。
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ChatSession
+
+logger = logging.getLogger(__name__)
+
+# 每条消息在角色、分隔符上的额外开销
+MESSAGE_OVERHEAD_TOKENS = 4
+# 本地摘要中每条消息保留的字符数
+EXCERPT_CHARS = 80
+
+
+def estimate_tokens(text):
+    """粗略估计 token 数：非 ASCII 字符（中文等）每个按 1 个计，ASCII 字符每 4 个按 1 个计"""
+    text = text or ''
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return len(text) - ascii_chars + (ascii_chars + 3) // 4
+
+
+def message_tokens(messages):
+    return sum(estimate_tokens(m['content']) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def truncate_tokens(text, max_tokens):
+    """保留文本末尾不超过 max_tokens 的部分（摘要中越靠后的内容越新）"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high) // 2
+        if estimate_tokens(text[middle:]) <= max_tokens:
+            high = middle
+        else:
+            low = middle + 1
+    return text[low:]
+
+
+def fold_summary(summary, messages, max_tokens):
+    """本地压缩：在原摘要后追加被移出窗口的每条消息的开头部分"""
+    labels = {'user': '用户', 'assistant': '客服'}
+    lines = [summary] if summary else []
+    for message in messages:
+        content = ' '.join(message['content'].split())
+        if len(content) > EXCERPT_CHARS:
+            content = content[:EXCERPT_CHARS] + '…'
+        lines.append(f"{labels.get(message['role'], message['role'])}：{content}")
+    return truncate_tokens('\n'.join(lines), max_tokens)
+
+
+class ChatSessionStore:
+
+    @property
+    def budget(self):
+        return getattr(settings, 'CHAT_HISTORY_TOKEN_BUDGET', 1200)
+
+    @property
+    def summary_max_tokens(self):
+        return getattr(settings, 'CHAT_SUMMARY_MAX_TOKENS', 300)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'CHAT_SESSION_TTL', 7 * 24 * 3600)
+
+    def load(self, session_id, user=None):
+        """
+        读取会话；session_id 为空、无效、已过期或属于其他用户时返回一个尚未保存的新会话
+        匿名会话只凭 session_id（随机 UUID）访问
+        """
+        user_id = getattr(user, 'pk', None)
+        if session_id:
+            try:
+                session = ChatSession.objects.filter(
+                    pk=uuid.UUID(str(session_id)), updated__gte=timezone.now() - timedelta(seconds=self.ttl)
+                ).first()
+            except ValueError:
+                session = None
+            if session is not None and session.user_id in (None, user_id):
+                return session
+        return ChatSession(user_id=user_id)
+
+    def context_messages(self, session):
+        """发给模型的历史消息：摘要（如有）+ 最近的对话窗口"""
+        messages = []
+        if session.summary:
+            messages.append({"role": "system", "content": f"此前对话的摘要：\n{session.summary}"})
+        return messages + list(session.messages)
+
+    def _append(self, session, user_content, assistant_content):
+        """
+        在行锁内追加一轮对话，超出预算时移出最早的轮次并先用本地方式并入摘要
+        Returns:
+            (摘要版本, 追加前的摘要, 被移出的消息)
+        """
+        turn = [
+            {"role": "user", "content": user_content},
+            {"role": "assistant", "content": assistant_content},
+        ]
+        with transaction.atomic():
+            row = ChatSession.objects.select_for_update().filter(pk=session.pk).first()
+            if row is None:
+                row = ChatSession(pk=session.pk, user_id=session.user_id)
+            previous_summary = row.summary
+            messages = row.messages + turn
+            evicted = []
+            if message_tokens(messages) > self.budget:
+                # 至少保留最新一轮
+                while len(messages) > 2 and message_tokens(messages) > self.budget // 2:
+                    evicted += messages[:2]
+                    messages = messages[2:]
+            row.messages = messages
+            row.turns += 1
+            if evicted:
+                row.summary = fold_summary(previous_summary, evicted, self.summary_max_tokens)
+                row.summary_version += 1
+            row.save()
+
+        session.messages, session.summary = row.messages, row.summary
+        session.turns, session.summary_version = row.turns, row.summary_version
+        session._state.adding = False
+        return row.summary_version, previous_summary, evicted
+
+    def _replace_summary(self, session, version, summary):
+        """版本未变（期间没有其他请求压缩过）时用模型生成的摘要替换本地摘要"""
+        summary = truncate_tokens(summary.strip(), self.summary_max_tokens)
+        updated = ChatSession.objects.filter(pk=session.pk, summary_version=version).update(summary=summary)
+        if updated:
+            session.summary = summary
+        return bool(updated)
+
+    async def arecord_turn(self, session, user_content, assistant_content, summarize=None):
+        """
+        保存一轮对话
+        summarize: 可选的 async (原摘要, 被移出的消息) -> 新摘要或 None，
+        失败或返回 None 时保留本地压缩的摘要
+        """
+        version, previous_summary, evicted = await sync_to_async(self._append)(
+            session, user_content, assistant_content
+        )
+        if evicted and summarize is not None:
+            summary = await summarize(previous_summary, evicted)
+            if summary:
+                await sync_to_async(self._replace_summary)(session, version, summary)
+        return session
+
+    def purge(self):
+        """删除过期会话，返回删除的数量"""
+        deleted, _ = ChatSession.objects.filter(
+            updated__lt=timezone.now() - timedelta(seconds=self.ttl)
+        ).delete()
+        return deleted
+
+
+# 创建单例实例
+chat_sessions = ChatSessionStore()
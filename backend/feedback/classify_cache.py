@@ -0,0 +1,139 @@
+"""
+智能分类结果缓存
+以规范化后的标题和描述的哈希为键：进程内 LRU（带过期时间）+ 可选的数据库层。
+学生输入过程中前端会反复请求 classify/，相同或仅有空白、标点、大小写差异的内容
+直接命中缓存，不再调用远程模型。
+"""
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    """全角转半角、统一大小写，并去掉空白、标点和符号"""
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    return ''.join(ch for ch in text if unicodedata.category(ch)[0] not in 'ZPSC')
+
+
+def cache_key(title, description=''):
+    normalized = normalize_text(title) + '\x1f' + normalize_text(description)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class ClassificationCache:
+    """
+    两级缓存
+    - 内存层：OrderedDict 实现的 LRU，条目超过 ttl 秒后失效
+    - 数据库层：CLASSIFY_CACHE_DB = True 时启用，多进程共享、重启后保留
+    只缓存远程模型成功返回的结果
+    """
+
+    def __init__(self, maxsize=None, ttl=None):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0}
+
+    @property
+    def maxsize(self):
+        return self._maxsize if self._maxsize is not None else getattr(settings, 'CLASSIFY_CACHE_SIZE', 1024)
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else getattr(settings, 'CLASSIFY_CACHE_TTL', 3600)
+
+    @property
+    def db_enabled(self):
+        return getattr(settings, 'CLASSIFY_CACHE_DB', False)
+
+    def get(self, key):
+        """返回缓存的 {category, confidence, reason}，未命中返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return dict(result)
+                del self._entries[key]
+
+        result = self._get_from_db(key) if self.db_enabled else None
+        with self._lock:
+            if result is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['db_hits'] += 1
+        self._remember(key, result)
+        return dict(result)
+
+    def set(self, key, category, confidence, reason):
+        try:
+            confidence = float(confidence)
+        except (TypeError, ValueError):
+            return
+        result = {'category': category, 'confidence': confidence, 'reason': str(reason)}
+        self._remember(key, result)
+        if self.db_enabled:
+            self._save_to_db(key, result)
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _get_from_db(self, key):
+        from .models import ClassificationCacheEntry
+        ttl = getattr(settings, 'CLASSIFY_CACHE_DB_TTL', 7 * 24 * 3600)
+        try:
+            entry = ClassificationCacheEntry.objects.filter(
+                key=key, created__gte=timezone.now() - timedelta(seconds=ttl)
+            ).first()
+        except DatabaseError as e:
+            logger.warning(f"Classification cache lookup failed: {str(e)}")
+            return None
+        if entry is None:
+            return None
+        return {'category': entry.category, 'confidence': entry.confidence, 'reason': entry.reason}
+
+    def _save_to_db(self, key, result):
+        from .models import ClassificationCacheEntry
+        try:
+            ClassificationCacheEntry.objects.update_or_create(
+                key=key, defaults={**result, 'reason': result['reason'][:255], 'created': timezone.now()}
+            )
+        except DatabaseError as e:
+            logger.warning(f"Classification cache write failed: {str(e)}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self):
+        """命中/未命中次数、命中率和当前内存条目数"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['db_hits']) / lookups if lookups else 0.0
+        return stats
+
+
+# 创建单例实例
+classification_cache = ClassificationCache()
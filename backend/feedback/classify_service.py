@@ -2,12 +2,19 @@
 智能问题分类服务
 使用 OpenAI API 自动分类校园反馈问题
 """
-from openai import OpenAI
 from django.conf import settings
 from rest_framework.exceptions import ValidationError
 from .validation_utils import InputValidator, SQLInjectionDetector
+from .classify_cache import classification_cache, cache_key
+from .keyword_classifier import keyword_classifier
+from .topic_model import topic_model
+from .llm_client import llm_client, UpstreamUnavailable
+from .service_registry import SharedService, services
+from asgiref.sync import sync_to_async
 import logging
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
@@ -15,28 +22,10 @@ logger = logging.getLogger(__name__)
 class ClassifyService:
     """智能问题分类服务类"""
     
+    # 与智能客服共用的 OpenAI 客户端，第一次调用远程模型时才导入 SDK 并创建；未配置 API 密钥时为 None
+    client = SharedService('openai')
+
     def __init__(self):
-        """初始化 OpenAI 客户端"""
-        try:
-            api_key = settings.OPENAI_API_KEY
-            base_url = settings.OPENAI_BASE_URL
-            
-            if not api_key:
-                logger.error("OPENAI_API_KEY is not set in settings")
-                raise ValueError("OPENAI_API_KEY is missing")
-            
-            self.client = OpenAI(
-                api_key=api_key,
-                base_url=base_url,
-                timeout=60.0,  # 设置60秒超时
-                max_retries=2   # 失败后重试2次
-            )
-            logger.info("OpenAI client initialized successfully")
-            
-        except Exception as e:
-            logger.error(f"Failed to initialize OpenAI client: {str(e)}")
-            raise
-        
         # 定义分类系统 Prompt
         self.system_prompt = (
             "你是 DoveLink 校园反馈系统的智能分类助手。你需要将学生的问题精准分类到以下五个类别之一：\n\n"
@@ -98,6 +87,7 @@ class ClassifyService:
     def classify_issue(self, title: str, description: str = "") -> dict:
         """
         智能分类问题
+        依次尝试：结果缓存 → 本地关键词分类 → 离线训练的本地模型 → 远程模型
         
         Args:
             title: 问题标题
@@ -113,187 +103,259 @@ class ClassifyService:
             }
         """
         try:
-            # 输入验证
-            if not title or not title.strip():
-                return {
-                    "success": False,
-                    "category": "其他",
-                    "confidence": 0.0,
-                    "reason": "标题不能为空",
-                    "error": "标题为空"
-                }
-            
-            # 验证标题长度
-            if len(title) > 100:
-                return {
-                    "success": False,
-                    "category": "其他",
-                    "confidence": 0.0,
-                    "reason": "标题过长，请控制在100个字符以内",
-                    "error": "标题过长"
-                }
-            
-            # 验证描述长度
-            if description and len(description) > 500:
-                description = description[:500]
+            prepared, error = self._prepare(title, description)
+            if error:
+                return error
+            return self._classify_local(*prepared) or self._classify_remote(*prepared)
+        except Exception as e:
+            return self._failure_result(title, description, e)
+    
+    async def aclassify_issue(self, title: str, description: str = "") -> dict:
+        """
+        classify_issue 的异步版本（ASGI 视图使用）
+        本地分类可能访问数据库缓存，在线程中执行；远程模型通过共享的异步客户端调用，
+        熔断、排队超时或超过截止时间时立即回退到关键词分类
+        """
+        try:
+            prepared, error = await sync_to_async(self._prepare)(title, description)
+            if error:
+                return error
+            result = await sync_to_async(self._classify_local)(*prepared)
+            if result is not None:
+                return result
             
-            # 检测SQL注入
-            if SQLInjectionDetector.detect_sql_injection(title) or SQLInjectionDetector.detect_sql_injection(description):
-                logger.warning(f"Detected possible SQL injection attempt in classification request: {title[:50]}")
+            deadline = time.monotonic() + getattr(settings, 'LLM_CLASSIFY_DEADLINE_SECONDS', 8)
+            try:
+                response = await llm_client.chat_completion(deadline, **self._completion_kwargs(*prepared[:2]))
+            except UpstreamUnavailable as e:
+                logger.warning(f"ClassifyService degraded: {str(e)}")
                 return {
                     "success": False,
-                    "category": "其他",
-                    "confidence": 0.0,
-                    "reason": "检测到不安全的输入内容",
-                    "error": "SQL注入检测"
-                }
-            
-            # 清理输入内容
-            safe_title = InputValidator.sanitize_input(title, max_length=100)
-            safe_description = InputValidator.sanitize_input(description, max_length=500) if description else ""
-            
-            # 构建用户消息
-            user_message = f"问题标题：{safe_title}\n"
-            if safe_description:
-                user_message += f"问题描述：{safe_description}"
-            
-            # 调用 OpenAI API
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                temperature=0.1,  # 更低的温度以获得更稳定和准确的分类结果
-                max_tokens=200,
-                response_format={"type": "json_object"}  # 强制返回 JSON
-            )
-            
-            # 解析 AI 返回的 JSON
-            result = json.loads(response.choices[0].message.content)
-            
-            # 验证分类是否有效
-            valid_categories = ["学业", "生活", "管理", "情感", "其他"]
-            category = result.get("category", "")
-            
-            if category not in valid_categories:
-                logger.warning(f"Invalid category '{category}' returned for title '{safe_title}', using fallback logic")
-                # 使用关键词回退策略
-                category = self._fallback_classify(safe_title, safe_description)
-            
-            confidence = result.get("confidence", 0.5)
-            reason = result.get("reason", "根据内容分析得出")
-            
-            logger.info(f"Classified '{safe_title}' as '{category}' with confidence {confidence}")
-            
-            return {
-                "success": True,
-                "category": category,
-                "confidence": confidence,
-                "reason": reason,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
+                    "category": self._fallback_classify(*prepared[:2]),
+                    "confidence": 0.3,
+                    "reason": "智能分类服务繁忙，使用关键词匹配",
+                    "error": str(e),
+                    "degraded": True
                 }
-            }
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error in classify_issue: {str(e)}")
-            # 使用关键词回退策略
-            category = self._fallback_classify(title, description)
-            return {
-                "success": False,
-                "category": category,
-                "confidence": 0.3,
-                "reason": "AI分类失败，使用关键词匹配",
-                "error": str(e)
-            }
+            return await sync_to_async(self._parse_response)(response, *prepared)
         except Exception as e:
-            logger.error(f"ClassifyService error: {type(e).__name__} - {str(e)}")
+            return self._failure_result(title, description, e)
+    
+    def classify_batch(self, items, max_workers=None) -> list:
+        """
+        批量分类
+        相同内容只分类一次；缓存和本地分类先处理，剩余的才并发调用远程模型
+        
+        Args:
+            items: [(标题, 描述), ...]
+            max_workers: 远程模型的最大并发数，默认为 CLASSIFY_BATCH_CONCURRENCY
+        
+        Returns:
+            list: 与 items 一一对应的分类结果（格式同 classify_issue）
+        """
+        results = [None] * len(items)
+        pending = {}  # 缓存键 → (清理后的输入, [items 下标])
+        for index, (title, description) in enumerate(items):
+            try:
+                prepared, error = self._prepare(title, description or "")
+            except Exception as e:
+                results[index] = self._failure_result(title, description or "", e)
+                continue
+            if error:
+                results[index] = error
+                continue
+            key = prepared[2]
+            if key in pending:
+                pending[key][1].append(index)
+            else:
+                pending[key] = (prepared, [index])
+        
+        residual = []
+        for prepared, indexes in pending.values():
+            result = self._classify_local(*prepared)
+            if result is None:
+                residual.append((prepared, indexes))
+                continue
+            for index in indexes:
+                results[index] = result
+        
+        if residual:
+            max_workers = max_workers or getattr(settings, 'CLASSIFY_BATCH_CONCURRENCY', 4)
             
-            # 使用关键词回退策略
-            category = self._fallback_classify(title, description)
-            return {
-                "success": False,
-                "category": category,
-                "confidence": 0.3,
-                "reason": f"分类服务异常，使用关键词匹配",
-                "error": str(e)
-            }
+            def classify_remote(prepared):
+                try:
+                    return self._classify_remote(*prepared)
+                except Exception as e:
+                    return self._failure_result(prepared[0], prepared[1], e)
+            
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                remote_results = pool.map(classify_remote, [prepared for prepared, _ in residual])
+                for (_, indexes), result in zip(residual, remote_results):
+                    for index in indexes:
+                        results[index] = result
+        
+        logger.info(f"Batch classified {len(items)} issues, {len(pending)} unique, {len(residual)} sent to remote model")
+        return results
     
-    def _fallback_classify(self, title: str, description: str = "") -> str:
+    def _prepare(self, title, description):
         """
-        关键词回退分类策略
-        当 AI 分类失败时使用
+        校验并清理输入
+        
+        Returns:
+            ((safe_title, safe_description, 缓存键), None) 或 (None, 错误结果)
         """
-        text = (title + " " + description).lower()
+        # 输入验证
+        if not title or not title.strip():
+            return None, {
+                "success": False,
+                "category": "其他",
+                "confidence": 0.0,
+                "reason": "标题不能为空",
+                "error": "标题为空"
+            }
         
-        # 学业关键词
-        academic_keywords = [
-            "课程", "作业", "考试", "教学", "教师", "老师", "成绩", "图书馆",
-            "实验室", "教材", "学习", "复习", "考研", "讲座", "选课", "学分",
-            "数学", "英语", "物理", "化学", "计算机", "专业课", "公共课"
-        ]
+        # 验证标题长度
+        if len(title) > 100:
+            return None, {
+                "success": False,
+                "category": "其他",
+                "confidence": 0.0,
+                "reason": "标题过长，请控制在100个字符以内",
+                "error": "标题过长"
+            }
         
-        # 生活关键词
-        life_keywords = [
-            "宿舍", "食堂", "饭", "菜", "餐", "热水", "洗澡", "洗衣", "空调",
-            "网络", "wifi", "水电", "维修", "卫生", "校医", "体育", "健身",
-            "运动", "安全", "门禁", "路灯", "交通", "公交", "食品"
-        ]
+        # 验证描述长度
+        if description and len(description) > 500:
+            description = description[:500]
         
-        # 管理关键词
-        management_keywords = [
-            "学生证", "证明", "办理", "流程", "学生会", "奖学金", "补助",
-            "收费", "缴费", "就业", "招聘", "实习", "政策", "规定", "制度",
-            "活动组织", "校园卡", "充值", "报销", "申请"
-        ]
+        # 检测SQL注入
+        if SQLInjectionDetector.detect_sql_injection(title) or SQLInjectionDetector.detect_sql_injection(description):
+            logger.warning(f"Detected possible SQL injection attempt in classification request: {title[:50]}")
+            return None, {
+                "success": False,
+                "category": "其他",
+                "confidence": 0.0,
+                "reason": "检测到不安全的输入内容",
+                "error": "SQL注入检测"
+            }
         
-        # 情感关键词
-        emotion_keywords = [
-            "焦虑", "压力", "抑郁", "烦恼", "困扰", "迷茫", "孤独", "难过",
-            "伤心", "失恋", "恋爱", "感情", "心理", "情绪", "人际关系",
-            "室友关系", "同学关系", "师生关系", "心理咨询", "倾诉", "安慰",
-            "成长", "自我", "未来", "方向", "人生", "困惑"
-        ]
+        # 清理输入内容
+        safe_title = InputValidator.sanitize_input(title, max_length=100)
+        safe_description = InputValidator.sanitize_input(description, max_length=500) if description else ""
+        return (safe_title, safe_description, cache_key(safe_title, safe_description)), None
+    
+    def _classify_local(self, safe_title, safe_description, key):
+        """不调用远程模型的分类，无法确定时返回 None"""
+        # 相同（或仅空白、标点、大小写不同）的内容直接返回缓存结果
+        cached = classification_cache.get(key)
+        if cached is not None:
+            return {"success": True, **cached, "cached": True}
         
-        # 其他关键词
-        other_keywords = [
-            "系统", "功能", "建议", "改进", "优化", "反馈系统", "平台",
-            "界面", "操作", "使用体验", "技术问题", "bug", "故障",
-            "不确定", "复杂", "综合", "多方面", "特殊情况"
-        ]
+        # 本地关键词分类足够确定时不再调用远程模型
+        local = keyword_classifier.classify(safe_title, safe_description)
+        threshold = getattr(settings, 'CLASSIFY_LOCAL_CONFIDENCE_THRESHOLD', 0.75)
+        if local["confidence"] >= threshold:
+            return {
+                "success": True,
+                "category": local["category"],
+                "confidence": local["confidence"],
+                "reason": f"关键词匹配：{'、'.join(local['keywords'][:5])}",
+                "source": "local"
+            }
         
-        # 统计关键词匹配数
-        academic_count = sum(1 for kw in academic_keywords if kw in text)
-        life_count = sum(1 for kw in life_keywords if kw in text)
-        management_count = sum(1 for kw in management_keywords if kw in text)
-        emotion_count = sum(1 for kw in emotion_keywords if kw in text)
-        other_count = sum(1 for kw in other_keywords if kw in text)
+        # 其次使用离线训练的本地模型（未训练时跳过）
+        model = topic_model.get()
+        if model is not None:
+            predicted = model.predict(safe_title, safe_description)
+            if predicted["confidence"] >= getattr(settings, 'CLASSIFY_MODEL_CONFIDENCE_THRESHOLD', 0.8):
+                return {
+                    "success": True,
+                    "category": predicted["category"],
+                    "confidence": predicted["confidence"],
+                    "reason": "根据历史问题的分类结果判断",
+                    "source": "model"
+                }
+        return None
+    
+    def _classify_remote(self, safe_title, safe_description, key):
+        """调用远程模型分类，成功的结果写入缓存"""
+        if self.client is None:
+            raise UpstreamUnavailable("OpenAI API密钥未配置")
+        response = self.client.chat.completions.create(**self._completion_kwargs(safe_title, safe_description))
+        return self._parse_response(response, safe_title, safe_description, key)
+    
+    def _completion_kwargs(self, safe_title, safe_description):
+        # 构建用户消息
+        user_message = f"问题标题：{safe_title}\n"
+        if safe_description:
+            user_message += f"问题描述：{safe_description}"
         
-        # 返回匹配最多的分类
-        counts = {
-            "学业": academic_count,
-            "生活": life_count,
-            "管理": management_count,
-            "情感": emotion_count,
-            "其他": other_count
+        return {
+            "model": "gpt-3.5-turbo",
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": user_message}
+            ],
+            "temperature": 0.1,  # 更低的温度以获得更稳定和准确的分类结果
+            "max_tokens": 200,
+            "response_format": {"type": "json_object"}  # 强制返回 JSON
         }
+    
+    def _parse_response(self, response, safe_title, safe_description, key):
+        # 解析 AI 返回的 JSON
+        result = json.loads(response.choices[0].message.content)
+        
+        # 验证分类是否有效
+        valid_categories = ["学业", "生活", "管理", "情感", "其他"]
+        category = result.get("category", "")
         
-        max_count = max(counts.values())
+        if category not in valid_categories:
+            logger.warning(f"Invalid category '{category}' returned for title '{safe_title}', using fallback logic")
+            # 使用关键词回退策略
+            category = self._fallback_classify(safe_title, safe_description)
         
-        if max_count == 0:
-            return "其他"  # 默认分类改为其他
+        confidence = result.get("confidence", 0.5)
+        reason = result.get("reason", "根据内容分析得出")
         
-        # 返回第一个匹配数最多的分类
-        for category, count in counts.items():
-            if count == max_count:
-                return category
+        logger.info(f"Classified '{safe_title}' as '{category}' with confidence {confidence}")
+        classification_cache.set(key, category, confidence, reason)
         
-        # 如果没有匹配，返回默认分类
-        return "其他"
+        return {
+            "success": True,
+            "category": category,
+            "confidence": confidence,
+            "reason": reason,
+            "usage": {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens
+            }
+        }
+    
+    def _failure_result(self, title, description, error):
+        """分类出错时使用关键词回退策略"""
+        if isinstance(error, json.JSONDecodeError):
+            logger.error(f"JSON decode error in classify_issue: {str(error)}")
+            reason = "AI分类失败，使用关键词匹配"
+        else:
+            logger.error(f"ClassifyService error: {type(error).__name__} - {str(error)}")
+            reason = "分类服务异常，使用关键词匹配"
+        return {
+            "success": False,
+            "category": self._fallback_classify(title, description),
+            "confidence": 0.3,
+            "reason": reason,
+            "error": str(error)
+        }
+    
+    def _fallback_classify(self, title: str, description: str = "") -> str:
+        """
+        关键词回退分类策略
+        当 AI 分类失败时使用，与本地优先分类共用 keyword_classifier
+        """
+        return keyword_classifier.classify(title, description)["category"]
 
 
-# 创建单例实例
-classify_service = ClassifyService()
+# 注册到服务注册表，第一次使用时创建
+services.register('classify', ClassifyService)
+classify_service = services.lazy('classify')
@@ -0,0 +1,285 @@
+"""
+问题浏览量/点赞量写回缓冲
+请求中只累加增量，由后台线程按固定间隔合并后批量写回数据库
+"""
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import trending
+from .models import Issue
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('views', 'likes')
+
+
+class MemoryCounterBackend:
+    """
+    进程内增量存储（默认）
+    增量只保存在本进程内存中：正常退出时由 atexit 写回，进程崩溃或被强制结束时尚未写回的增量会丢失
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(lambda: [0, 0])
+
+    def add(self, issue_id, views, likes):
+        with self._lock:
+            delta = self._pending[issue_id]
+            delta[0] += views
+            delta[1] += likes
+
+    def get_many(self, issue_ids):
+        with self._lock:
+            return {
+                issue_id: tuple(self._pending[issue_id])
+                for issue_id in issue_ids if issue_id in self._pending
+            }
+
+    def drain(self):
+        """取出并清空全部增量"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: [0, 0])
+        return {issue_id: tuple(delta) for issue_id, delta in pending.items()}
+
+    def restore(self, deltas):
+        """写回失败时把增量放回缓冲"""
+        for issue_id, (views, likes) in deltas.items():
+            self.add(issue_id, views, likes)
+
+
+class CacheCounterBackend:
+    """
+    基于 Django 缓存的增量存储
+    使用 incr/decr 原子累加，多个进程共用同一个缓存（如 Redis）时增量也不会丢失
+
+    - 待写回的问题集合也存放在缓存中，任一进程（包括已回收进程留下的增量）都能取出
+    - 取出增量时先持有缓存中的锁，同一时刻只有一个进程读取并扣除，增量不会被重复写回
+    - 请求中只在问题第一次出现增量时（dirty 标记不存在）才需要获取锁，把问题加入集合
+    """
+    key_prefix = 'issue_counter'
+    # 锁的过期时间（秒），持有锁的进程崩溃时锁会自动释放
+    lock_timeout = 60
+    # 获取锁的最长等待时间（秒）
+    lock_wait = 10
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def key(self, issue_id, field):
+        return f'{self.key_prefix}:{issue_id}:{field}'
+
+    def dirty_key(self, issue_id):
+        return f'{self.key_prefix}:{issue_id}:dirty'
+
+    @property
+    def dirty_set_key(self):
+        return f'{self.key_prefix}:dirty'
+
+    @property
+    def lock_key(self):
+        return f'{self.key_prefix}:lock'
+
+    @contextmanager
+    def _locked(self):
+        """缓存中的互斥锁（cache.add 仅在键不存在时成功）"""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_wait
+        while not self.cache.add(self.lock_key, token, timeout=self.lock_timeout):
+            if time.monotonic() > deadline:
+                raise TimeoutError("Timed out waiting for the issue counter lock")
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            if self.cache.get(self.lock_key) == token:
+                self.cache.delete(self.lock_key)
+
+    def _incr(self, key, delta):
+        if not delta:
+            return
+        try:
+            self.cache.incr(key, delta)
+        except ValueError:
+            # 键不存在时先创建；并发下 add 失败说明已被其他进程创建
+            if not self.cache.add(key, delta, timeout=None):
+                self.cache.incr(key, delta)
+
+    def add(self, issue_id, views, likes):
+        for field, delta in zip(FIELDS, (views, likes)):
+            self._incr(self.key(issue_id, field), delta)
+        # 先累加再标记：drain() 先清除标记再读取，标记已存在时本次增量一定会被读到
+        if self.cache.add(self.dirty_key(issue_id), 1, timeout=None):
+            with self._locked():
+                dirty = self.cache.get(self.dirty_set_key, set())
+                dirty.add(issue_id)
+                self.cache.set(self.dirty_set_key, dirty, timeout=None)
+
+    def get_many(self, issue_ids):
+        keys = {self.key(i, f): (i, f) for i in issue_ids for f in FIELDS}
+        values = self.cache.get_many(list(keys))
+        result = {}
+        for key, value in values.items():
+            issue_id, field = keys[key]
+            delta = list(result.get(issue_id, (0, 0)))
+            delta[FIELDS.index(field)] = value
+            result[issue_id] = tuple(delta)
+        return result
+
+    def drain(self):
+        """取出并清空所有进程累加的增量"""
+        with self._locked():
+            dirty = self.cache.get(self.dirty_set_key, set())
+            if not dirty:
+                return {}
+            self.cache.set(self.dirty_set_key, set(), timeout=None)
+            # 清除标记之后的增量会重新加入集合，留到下一轮
+            self.cache.delete_many([self.dirty_key(issue_id) for issue_id in dirty])
+            deltas = self.get_many(dirty)
+            for issue_id, values in deltas.items():
+                for field, value in zip(FIELDS, values):
+                    # 只扣除本次读到的值，期间其他请求新增的部分留到下一轮
+                    self._incr(self.key(issue_id, field), -value)
+        return deltas
+
+    def restore(self, deltas):
+        for issue_id, (views, likes) in deltas.items():
+            self.add(issue_id, views, likes)
+
+
+class IssueCounterBuffer:
+    """
+    浏览量/点赞量写回聚合器
+
+    - add() 只在内存中累加增量，请求路径上不产生任何 UPDATE
+    - flush() 把同一问题的增量合并，增量相同的问题共用一条
+      UPDATE ... SET views = views + x, likes = likes + y, popularity = ...，
+      热度值和趋势分在同一条语句中重新计算
+    - 读取时通过 merge() 叠加尚未写回的增量，客户端看到的仍是最新数值
+    """
+
+    def __init__(self, backend=None, interval=None):
+        self._backend = backend
+        self._interval = interval
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._exit_hook = False
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            alias = getattr(settings, 'ISSUE_COUNTER_CACHE', None)
+            self._backend = CacheCounterBackend(alias) if alias else MemoryCounterBackend()
+        return self._backend
+
+    @property
+    def interval(self):
+        if self._interval is None:
+            return getattr(settings, 'ISSUE_COUNTER_FLUSH_INTERVAL', 5)
+        return self._interval
+
+    def add(self, issue_id, views=0, likes=0):
+        """累加增量"""
+        self.backend.add(issue_id, views, likes)
+        self._ensure_flusher()
+
+    def pending(self, issue_ids):
+        """返回尚未写回的增量 {issue_id: (views, likes)}"""
+        return self.backend.get_many(issue_ids)
+
+    def merge(self, issue_id, views, likes, pending=None):
+        """在数据库数值上叠加未写回的增量，返回 (views, likes, popularity)"""
+        if pending is None:
+            pending = self.pending([issue_id])
+        delta_views, delta_likes = pending.get(issue_id, (0, 0))
+        views += delta_views
+        likes += delta_likes
+        return views, likes, Issue.popularity_of(likes=likes, views=views)
+
+    def flush(self):
+        """把缓冲中的增量批量写回数据库，返回写回的问题数"""
+        deltas = {
+            issue_id: delta for issue_id, delta in self.backend.drain().items()
+            if any(delta)
+        }
+        if not deltas:
+            return 0
+
+        groups = defaultdict(list)
+        for issue_id, delta in deltas.items():
+            groups[delta].append(issue_id)
+
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                for (views, likes), issue_ids in groups.items():
+                    # UPDATE 中右侧引用的是旧值，因此热度按旧值加增量计算
+                    values = {
+                        'views': F('views') + views,
+                        'likes': F('likes') + likes,
+                        'popularity': Issue.popularity_of(
+                            likes=F('likes') + likes,
+                            views=F('views') + views,
+                        ),
+                    }
+                    # 本轮的浏览/点赞作为同一时刻的事件计入趋势分
+                    weight = views * trending.VIEW_WEIGHT + max(likes, 0) * trending.LIKE_WEIGHT
+                    if weight > 0:
+                        values['hot_score'] = trending.add_event_expression(
+                            trending.event_score(weight, now)
+                        )
+                    Issue.objects.filter(pk__in=issue_ids).update(**values)
+        except Exception:
+            logger.exception("Failed to flush issue counters, keeping deltas for retry")
+            self.backend.restore(deltas)
+            raise
+        return len(deltas)
+
+    def _ensure_flusher(self):
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='issue-counter-flusher', daemon=True
+            )
+            self._thread.start()
+            if not self._exit_hook:
+                # 进程正常退出时写回剩余增量
+                atexit.register(self.stop)
+                self._exit_hook = True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                pass  # flush() 已记录日志并保留增量，下一轮重试
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        """停止后台线程并写回剩余增量"""
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception:
+            pass  # 退出阶段数据库可能已不可用
+
+
+# 创建单例实例
+counter_buffer = IssueCounterBuffer()
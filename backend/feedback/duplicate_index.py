@@ -0,0 +1,288 @@
+"""
+重复问题检测
+问题文本（归一化后）中相邻两字组成集合，用 MinHash 签名估计两个集合的重合程度。
+同一个问题的不同说法（"宿舍热水" / "宿舍没有热水"）字数往往差别较大，Jaccard 相似度偏低，
+因此签名同时记录集合大小，按重合系数 |A∩B| / min(|A|, |B|) 打分。
+每个问题保存两个签名：标题的，以及标题 + 描述开头的；学生只填了标题时也能找到标题相近的问题。
+签名保存在 IssueSignature 表中，每个进程在内存中维护未解决的公开问题的 LSH 索引：
+签名分成 BANDS 段，任意一段完全相同的问题成为候选，再按签名估计的重合系数筛选。
+问题新增、删除，或者标题、描述、公开状态、是否已解决变化时更新签名和索引，并通过缓存中的版本号
+通知其他进程重新加载；浏览、点赞、分类等其他字段的保存不改变版本号，其他进程不必重新加载。
+版本号存放在默认缓存中：配置了多进程共享的缓存（如 Redis）时其他进程在下一次查询时重新加载，
+默认的进程内缓存无法通知其他进程，它们最多在 refresh_interval 秒后定期重新加载时看到变化。
+"""
+import logging
+import random
+import struct
+import threading
+import time
+import uuid
+import zlib
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from .classify_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 2
+# 只取描述的开头参与计算，重复的问题主要体现在标题和描述的开头，签名的计算量也有上限
+DESCRIPTION_CHARS = 200
+# 少于该数量的片段（如只输入了两三个字）不做检测，否则几乎与所有问题都"重合"
+MIN_SHINGLES = 3
+# 超过该数量的桶（由常见词形成）查询时跳过，真正重复的问题还会在其他段上相同
+MAX_BUCKET_SIZE = 200
+# 已解决的问题不再作为重复候选
+RESOLVED_STATUS = '已解决'
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20251)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+# 集合大小 + NUM_PERM 个 32 位最小哈希值
+_FORMAT = f'<I{NUM_PERM}I'
+
+
+def shingles(text):
+    text = normalize_text(text)
+    if len(text) < SHINGLE_SIZE:
+        return {zlib.crc32(text.encode('utf-8'))} if text else set()
+    return {zlib.crc32(text[i:i + SHINGLE_SIZE].encode('utf-8')) for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    """文本 → 签名 (集合大小, NUM_PERM 个最小哈希值的元组)，没有可用文字时返回 None"""
+    values = shingles(text)
+    if not values:
+        return None
+    return len(values), tuple(min([(a * x + b) % _PRIME for x in values]) & 0xffffffff for a, b in _PERMUTATIONS)
+
+
+def overlap(left, right):
+    """
+    估计重合系数：相同位置最小哈希值相同的比例是 Jaccard 相似度 J 的估计，
+    交集大小 = J × (|A| + |B|) / (1 + J)
+    """
+    (left_size, left_values), (right_size, right_values) = left, right
+    jaccard = sum(x == y for x, y in zip(left_values, right_values)) / NUM_PERM
+    intersection = jaccard * (left_size + right_size) / (1 + jaccard)
+    return min(intersection / min(left_size, right_size), 1.0)
+
+
+def pack(signature):
+    return struct.pack(_FORMAT, signature[0], *signature[1]) if signature else b''
+
+
+def unpack(data):
+    if not data:
+        return None
+    size, *values = struct.unpack(_FORMAT, bytes(data))
+    return size, tuple(values)
+
+
+def signatures(title, description=''):
+    """(标题签名, 标题 + 描述开头的签名)"""
+    return minhash(title), minhash(f'{title} {description[:DESCRIPTION_CHARS]}')
+
+
+class LSHIndex:
+    """
+    内存中的 LSH 索引
+    entries: {问题ID: (标题签名, 全文签名)}，buckets: [{段取值: {问题ID, ...}}] * BANDS
+    标题签名和全文签名分别建桶，查询时各自只与同类签名比较
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.buckets = {
+            'title': [defaultdict(set) for _ in range(BANDS)],
+            'full': [defaultdict(set) for _ in range(BANDS)],
+        }
+
+    @staticmethod
+    def _bands(signature):
+        values = signature[1]
+        return [values[i * ROWS:(i + 1) * ROWS] for i in range(BANDS)]
+
+    def _signatures(self, title_signature, signature):
+        return [(kind, sig) for kind, sig in (('title', title_signature), ('full', signature)) if sig]
+
+    def add(self, issue_id, title_signature, signature):
+        self.remove(issue_id)
+        self.entries[issue_id] = (title_signature, signature)
+        for kind, sig in self._signatures(title_signature, signature):
+            for bucket, key in zip(self.buckets[kind], self._bands(sig)):
+                bucket[key].add(issue_id)
+
+    def remove(self, issue_id):
+        entry = self.entries.pop(issue_id, None)
+        if entry is None:
+            return
+        for kind, sig in self._signatures(*entry):
+            for bucket, key in zip(self.buckets[kind], self._bands(sig)):
+                ids = bucket.get(key)
+                if ids is not None:
+                    ids.discard(issue_id)
+                    if not ids:
+                        del bucket[key]
+
+    def query(self, title_signature, signature, threshold, limit):
+        """返回 [(问题ID, 重合系数)]，按重合系数从高到低"""
+        scores = {}
+        for kind, sig in self._signatures(title_signature, signature):
+            if sig[0] < MIN_SHINGLES:
+                continue
+            candidates = set()
+            for bucket, key in zip(self.buckets[kind], self._bands(sig)):
+                ids = bucket.get(key)
+                if ids and len(ids) <= MAX_BUCKET_SIZE:
+                    candidates |= ids
+            index = 0 if kind == 'title' else 1
+            for issue_id in candidates:
+                entry = self.entries[issue_id][index]
+                if entry:
+                    scores[issue_id] = max(scores.get(issue_id, 0.0), overlap(sig, entry))
+
+        results = [(issue_id, score) for issue_id, score in scores.items() if score >= threshold]
+        results.sort(key=lambda item: (-item[1], -item[0]))
+        return results[:limit]
+
+
+class DuplicateIndex:
+    version_key = 'feedback:duplicate_index_version'
+    refresh_interval = 300
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._loaded_at = 0.0
+
+    @property
+    def threshold(self):
+        return getattr(settings, 'DUPLICATE_SIMILARITY_THRESHOLD', 0.4)
+
+    @staticmethod
+    def is_candidate(issue):
+        """只有未解决的公开问题参与检测"""
+        return issue.is_public and issue.status != RESOLVED_STATUS
+
+    @classmethod
+    def state(cls, issue):
+        """影响签名和索引的字段：(标题, 描述, 是否参与检测)"""
+        return issue.title, issue.description, cls.is_candidate(issue)
+
+    def _current_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_key)
+        return version
+
+    def _get_index(self):
+        version = self._current_version()
+        with self._lock:
+            if (
+                self._index is None or self._version != version
+                or time.monotonic() - self._loaded_at > self.refresh_interval
+            ):
+                from .models import IssueSignature
+                index = LSHIndex()
+                rows = IssueSignature.objects.filter(issue__is_public=True).exclude(
+                    issue__status=RESOLVED_STATUS
+                ).values_list('issue_id', 'title_signature', 'signature')
+                for issue_id, title_signature, signature in rows.iterator(chunk_size=2000):
+                    index.add(issue_id, unpack(title_signature), unpack(signature))
+                self._index, self._version, self._loaded_at = index, version, time.monotonic()
+            return self._index
+
+    def find_similar(self, title, description='', limit=5, exclude=None):
+        """
+        查找可能重复的问题
+        Returns:
+            list: [(问题ID, 相似度)]，按相似度从高到低
+        """
+        title_signature, signature = signatures(title, description)
+        if signature is None:
+            return []
+        try:
+            index = self._get_index()
+        except DatabaseError as e:
+            logger.warning(f"Duplicate index load failed: {str(e)}")
+            return []
+        results = index.query(title_signature, signature, self.threshold, limit + 1)
+        return [(issue_id, score) for issue_id, score in results if issue_id != exclude][:limit]
+
+    def update(self, issue, old_state=None):
+        """
+        信号处理函数入口：问题新增或修改后更新签名和索引
+        old_state 为保存前的 state()（新增的问题为 None）；没有变化时不做任何事，
+        只有公开状态或是否已解决变化时不重新保存签名，只更新索引
+        """
+        from .models import IssueSignature
+        state = self.state(issue)
+        if state == old_state:
+            return
+        title_signature, signature = signatures(issue.title, issue.description)
+        if old_state is None or old_state[:2] != state[:2]:
+            try:
+                IssueSignature.objects.update_or_create(
+                    issue_id=issue.pk,
+                    defaults={'title_signature': pack(title_signature), 'signature': pack(signature)},
+                )
+            except DatabaseError as e:
+                logger.warning(f"Issue signature update failed: {str(e)}")
+                return
+        self._apply(issue.pk, (title_signature, signature) if self.is_candidate(issue) else None)
+
+    def remove(self, issue_id):
+        """问题删除后移出索引（签名随问题级联删除）"""
+        self._apply(issue_id, None)
+
+    def _apply(self, issue_id, entry):
+        """本进程直接修改已加载的索引，再换新版本号通知其他进程重新加载"""
+        version = uuid.uuid4().hex
+        cache.set(self.version_key, version, None)
+        with self._lock:
+            if self._index is None:
+                return
+            if entry is None:
+                self._index.remove(issue_id)
+            else:
+                self._index.add(issue_id, *entry)
+            self._version = version
+
+    def rebuild(self, batch_size=1000):
+        """为所有问题重新计算签名（上线前已有的问题，或修改了分片规则后），返回问题数"""
+        from .models import Issue, IssueSignature
+        total = 0
+        batch = []
+        for issue_id, title, description in Issue.objects.values_list('id', 'title', 'description').iterator(
+            chunk_size=batch_size
+        ):
+            title_signature, signature = signatures(title, description)
+            batch.append(IssueSignature(
+                issue_id=issue_id, title_signature=pack(title_signature), signature=pack(signature)
+            ))
+            if len(batch) >= batch_size:
+                total += self._save_batch(IssueSignature, batch)
+                batch = []
+        total += self._save_batch(IssueSignature, batch)
+        cache.set(self.version_key, uuid.uuid4().hex, None)
+        return total
+
+    @staticmethod
+    def _save_batch(model, batch):
+        model.objects.bulk_create(
+            batch, update_conflicts=True, unique_fields=['issue'], update_fields=['title_signature', 'signature']
+        )
+        return len(batch)
+
+
+# 创建单例实例
+duplicate_index = DuplicateIndex()
@@ -0,0 +1,215 @@
+"""
+本地关键词分类引擎
+全部分类的关键词编译成一个 Aho-Corasick 自动机，一次扫描文本即可找出所有命中的关键词，
+按关键词权重和命中位置（标题/描述）计分，再换算为 0~1 的置信度。
+置信度达到 CLASSIFY_LOCAL_CONFIDENCE_THRESHOLD 时 ClassifyService 直接采用本地结果，不再调用远程模型。
+置信度公式中的两个常数可用已分类的问题拟合（train_classifier 命令输出），通过设置项覆盖默认值。
+"""
+import math
+import unicodedata
+from collections import deque
+
+from django.conf import settings
+
+CATEGORIES = ["学业", "生活", "管理", "情感", "其他"]
+
+# 关键词权重：1.0 为普通关键词，含义宽泛的词降低权重，指向性强的词提高权重
+KEYWORDS = {
+    "学业": {
+        "课程": 1.5, "作业": 1.5, "考试": 1.5, "教学": 1.5, "教师": 1.0, "老师": 1.0, "成绩": 1.5,
+        "图书馆": 1.5, "实验室": 1.5, "教材": 1.5, "学习": 0.5, "复习": 1.0, "考研": 1.5, "讲座": 1.0,
+        "选课": 2.0, "学分": 2.0, "数学": 1.0, "英语": 1.0, "物理": 1.0, "化学": 1.0, "计算机": 1.0,
+        "专业课": 2.0, "公共课": 2.0, "上课": 1.0, "自习": 1.5, "挂科": 2.0, "论文": 1.0,
+    },
+    "生活": {
+        "宿舍": 1.5, "食堂": 2.0, "饭": 0.5, "菜": 0.5, "餐": 0.5, "热水": 1.5, "洗澡": 1.5, "洗衣": 1.5,
+        "空调": 1.5, "网络": 1.0, "wifi": 1.5, "水电": 1.5, "维修": 1.0, "卫生": 1.0, "校医": 1.5,
+        "体育": 1.0, "健身": 1.0, "运动": 0.5, "安全": 0.5, "门禁": 1.5, "路灯": 1.5, "交通": 1.0,
+        "公交": 1.0, "食品": 1.0, "停电": 1.5, "停水": 1.5, "快递": 1.0, "澡堂": 2.0,
+    },
+    "管理": {
+        "学生证": 2.0, "证明": 1.0, "办理": 1.0, "流程": 1.0, "学生会": 1.5, "奖学金": 2.0, "补助": 1.5,
+        "收费": 1.5, "缴费": 1.5, "就业": 1.5, "招聘": 1.5, "实习": 1.0, "政策": 1.0, "规定": 1.0,
+        "制度": 1.0, "活动组织": 1.5, "校园卡": 1.5, "充值": 1.0, "报销": 1.5, "申请": 0.5,
+        "学费": 2.0, "助学金": 2.0, "盖章": 1.5,
+    },
+    "情感": {
+        "焦虑": 2.0, "压力": 1.0, "抑郁": 2.0, "烦恼": 1.0, "困扰": 0.5, "迷茫": 1.5, "孤独": 1.5,
+        "难过": 1.5, "伤心": 1.5, "失恋": 2.0, "恋爱": 1.5, "感情": 1.0, "心理": 1.5, "情绪": 1.5,
+        "人际关系": 2.0, "室友关系": 2.0, "同学关系": 2.0, "师生关系": 2.0, "心理咨询": 2.0,
+        "倾诉": 1.5, "安慰": 1.5, "成长": 0.5, "自我": 0.5, "未来": 0.5, "方向": 0.5, "人生": 1.0,
+        "困惑": 1.0, "失眠": 1.5,
+    },
+    "其他": {
+        "系统": 0.5, "功能": 1.0, "建议": 0.3, "改进": 0.5, "优化": 0.5, "反馈系统": 2.0, "平台": 1.0,
+        "界面": 1.5, "操作": 0.5, "使用体验": 1.5, "技术问题": 1.5, "bug": 2.0, "故障": 0.5,
+        "不确定": 1.0, "复杂": 0.5, "综合": 0.5, "多方面": 1.0, "特殊情况": 1.0,
+    },
+}
+
+
+def normalize(text):
+    """全角转半角并统一大小写，保证与关键词的写法一致"""
+    return unicodedata.normalize('NFKC', text or '').casefold()
+
+
+class AhoCorasick:
+    """多模式串匹配自动机：构建 O(总关键词长度)，匹配 O(文本长度 + 命中数)"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for pattern, value in patterns:
+            node = 0
+            for ch in pattern:
+                if ch not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][ch] = len(self.goto) - 1
+                node = self.goto[node][ch]
+            self.output[node].append((pattern, value))
+
+        # 广度优先计算失败指针，并把失败链上的输出合并到当前节点
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                target = self.goto[state].get(ch, 0)
+                self.fail[child] = target if target != child else 0
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def iter_matches(self, text):
+        """依次产出 (结束位置, 关键词, 值)"""
+        node = 0
+        for index, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for pattern, value in self.output[node]:
+                yield index, pattern, value
+
+
+class KeywordClassifier:
+    """
+    计分规则
+    - 每个命中的关键词按权重计分，同一关键词重复出现按 1 + log(次数) 递减累加
+    - 标题中的命中乘以 TITLE_WEIGHT
+    置信度 = softmax(SHARPNESS * 各类得分) 中最高类的概率 × (1 - exp(-最高得分 / EVIDENCE_SCALE))
+    前一项衡量与次高类的区分度，后一项衡量证据总量：只命中一个宽泛词时置信度很低，
+    命中多个指向性强的关键词时接近 1
+    SHARPNESS、EVIDENCE_SCALE 为未经拟合的默认值，设置了 CLASSIFY_KEYWORD_SHARPNESS、
+    CLASSIFY_KEYWORD_EVIDENCE_SCALE（calibrate() 在留出集上拟合的结果）时使用设置项
+    """
+    TITLE_WEIGHT = 1.5
+    SHARPNESS = 1.5
+    EVIDENCE_SCALE = 2.0
+
+    def __init__(self, keywords=None):
+        keywords = keywords or KEYWORDS
+        self._sharpness = None
+        self._evidence_scale = None
+        self.categories = list(keywords)
+        self.automaton = AhoCorasick(
+            (normalize(keyword), (category, weight))
+            for category, table in keywords.items()
+            for keyword, weight in table.items()
+        )
+
+    @property
+    def sharpness(self):
+        if self._sharpness is None:
+            return getattr(settings, 'CLASSIFY_KEYWORD_SHARPNESS', None) or self.SHARPNESS
+        return self._sharpness
+
+    @property
+    def evidence_scale(self):
+        if self._evidence_scale is None:
+            return getattr(settings, 'CLASSIFY_KEYWORD_EVIDENCE_SCALE', None) or self.EVIDENCE_SCALE
+        return self._evidence_scale
+
+    def _count(self, text):
+        counts = {}
+        for _, keyword, (category, weight) in self.automaton.iter_matches(normalize(text)):
+            key = (category, keyword)
+            counts[key] = (counts[key][0] + 1, weight) if key in counts else (1, weight)
+        return counts
+
+    def score(self, title, description=""):
+        """返回 ({分类: 得分}, [命中的关键词])"""
+        scores = dict.fromkeys(self.categories, 0.0)
+        matched = []
+        for text, factor in ((title, self.TITLE_WEIGHT), (description, 1.0)):
+            for (category, keyword), (count, weight) in self._count(text).items():
+                scores[category] += factor * weight * (1 + math.log(count))
+                if keyword not in matched:
+                    matched.append(keyword)
+        return scores, matched
+
+    def classify(self, title, description=""):
+        """
+        Returns:
+            dict: {"category": 分类, "confidence": 0.0-1.0, "scores": {...}, "keywords": [...]}
+            没有命中任何关键词时返回 "其他"，置信度为 0
+        """
+        scores, matched = self.score(title, description)
+        top_score = max(scores.values())
+        if top_score <= 0:
+            return {"category": "其他", "confidence": 0.0, "scores": scores, "keywords": []}
+
+        category = self._top_category(scores)
+        return {
+            "category": category,
+            "confidence": round(self._confidence(scores, category, self.sharpness, self.evidence_scale), 4),
+            "scores": scores,
+            "keywords": matched,
+        }
+
+    def _top_category(self, scores):
+        # 得分相同时按 CATEGORIES 顺序取第一个，与原关键词回退策略一致
+        return max(self.categories, key=lambda c: (scores[c], -self.categories.index(c)))
+
+    @staticmethod
+    def _confidence(scores, category, sharpness, evidence_scale):
+        top_score = scores[category]
+        exps = [math.exp(sharpness * (s - top_score)) for s in scores.values()]
+        evidence = 1 - math.exp(-top_score / evidence_scale)
+        return evidence / sum(exps)
+
+    def calibrate(self, samples, sharpness=(0.5, 1, 1.5, 2, 3, 4), evidence_scales=(0.5, 1, 2, 3, 4, 6)):
+        """
+        在已分类的留出集 [(标题, 描述, 分类)] 上拟合 SHARPNESS 和 EVIDENCE_SCALE：
+        置信度应是本地结果正确的概率，选取使其对数损失最小的组合，写入当前实例
+        没有命中任何关键词的样本置信度恒为 0，不参与拟合
+        Returns:
+            tuple: (sharpness, evidence_scale)，没有可用样本时返回当前值
+        """
+        scored = []
+        for title, description, label in samples:
+            scores, _ = self.score(title, description)
+            if max(scores.values()) > 0:
+                category = self._top_category(scores)
+                scored.append((scores, category, category == label))
+        if not scored:
+            return self.sharpness, self.evidence_scale
+
+        def log_loss(params):
+            loss = 0.0
+            for scores, category, correct in scored:
+                confidence = min(max(self._confidence(scores, category, *params), 1e-6), 1 - 1e-6)
+                loss -= math.log(confidence if correct else 1 - confidence)
+            return loss / len(scored)
+
+        self._sharpness, self._evidence_scale = min(
+            ((a, b) for a in sharpness for b in evidence_scales), key=log_loss
+        )
+        return self._sharpness, self._evidence_scale
+
+
+# 创建单例实例
+keyword_classifier = KeywordClassifier()
@@ -0,0 +1,56 @@
+"""
+点赞服务
+基于 IssueLike 的唯一约束原子地切换点赞状态，并在同一事务中更新点赞数、热度值和趋势分
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from . import trending
+from .models import Issue, IssueLike
+
+
+class LikeService:
+    @staticmethod
+    def toggle(user, issue):
+        """
+        切换点赞状态
+
+        先尝试插入点赞记录，违反唯一约束说明已点过赞，改为删除。
+        点赞数使用 F() 表达式在数据库中增减，不依赖内存中可能过期的 issue.likes。
+
+        Returns:
+            tuple: (liked, likes, views, popularity, like_id)，like_id 为新建或删除的点赞记录ID
+        """
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    like = IssueLike.objects.create(user=user, issue_id=issue.pk)
+                liked, delta = True, 1
+                hot_score = trending.add_event_expression(
+                    trending.event_score(trending.LIKE_WEIGHT, like.created)
+                )
+            except IntegrityError:
+                like = IssueLike.objects.filter(user=user, issue_id=issue.pk).only('id', 'created').first()
+                deleted = IssueLike.objects.filter(pk=like.pk).delete()[0] if like else 0
+                liked, delta = False, -1 if deleted else 0
+                # 移除这次点赞在点赞当时计入的趋势分
+                hot_score = trending.remove_event_expression(
+                    trending.event_score(trending.LIKE_WEIGHT, like.created),
+                    floor=trending.event_score(trending.CREATE_WEIGHT, issue.created),
+                ) if deleted else F('hot_score')
+            likes, views, popularity = LikeService._apply_delta(issue.pk, delta, hot_score)
+        return liked, likes, views, popularity, like.pk if like else None
+
+    @staticmethod
+    def _apply_delta(issue_id, delta, hot_score):
+        """更新点赞数、热度值和趋势分，并返回更新后的 (likes, views, popularity)"""
+        values = {
+            'likes': F('likes') + delta,
+            'popularity': Issue.popularity_of(likes=F('likes') + delta, views=F('views')),
+            'hot_score': hot_score,
+        }
+        # 更新后在同一事务中读回：UPDATE 持有该行的写锁直到提交，读到的就是这次更新后的数值
+        # （不拼接 UPDATE ... RETURNING：MariaDB 等数据库不支持，而 ORM 没有对应的通用接口）
+        if not Issue.objects.filter(pk=issue_id).update(**values):
+            raise Issue.DoesNotExist
+        return Issue.objects.filter(pk=issue_id).values_list('likes', 'views', 'popularity').get()
@@ -0,0 +1,246 @@
+"""
+异步 OpenAI 客户端
+供 ASGI 下的异步视图（chat/、classify/）使用：
+- 每个事件循环共享一个 AsyncOpenAI 客户端（复用其连接池），事件循环结束时关闭并移除
+  （WSGI 下 async_to_sync 为每个请求新建事件循环，客户端随请求结束关闭，不会累积）
+- 进程级信号量限制同时进行的上游请求数，所有事件循环共用同一限额
+- 每个请求有截止时间，超时立即放弃，不再重试
+- 熔断器：上游连续失败或超时达到阈值后，在冷却期内直接失败，调用方立即返回降级结果
+"""
+import asyncio
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .service_registry import openai_configured
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailable(Exception):
+    """上游不可用（熔断、排队超时、请求超时或未配置）"""
+
+
+class CircuitBreaker:
+    """
+    closed：正常放行，连续失败 failure_threshold 次后进入 open
+    open：reset_timeout 秒内直接拒绝，之后进入 half-open
+    half-open：只放行一个探测请求，成功则恢复 closed，失败则重新 open
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    logger.warning(f"LLM circuit breaker opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self):
+        """探测请求未真正发出（例如排队超时）时让出探测机会"""
+        with self._lock:
+            self._probing = False
+
+    def reset(self):
+        self.record_success()
+
+
+class AsyncLLMClient:
+
+    def __init__(self):
+        # 事件循环 → (客户端, 负责关闭客户端的任务)
+        self._loop_state = {}
+        self._lock = threading.Lock()
+        self._limiter = None
+        self.breaker = CircuitBreaker(
+            failure_threshold=getattr(settings, 'LLM_BREAKER_FAILURES', 5),
+            reset_timeout=getattr(settings, 'LLM_BREAKER_RESET_SECONDS', 30),
+        )
+
+    @property
+    def configured(self):
+        return openai_configured()
+
+    def _create_client(self):
+        # 第一次创建时才导入 SDK（服务注册表预热时会提前导入）
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            max_retries=0,  # 由调用方的截止时间控制，不在客户端内部重试
+        )
+
+    @property
+    def limiter(self):
+        """进程级并发名额（LLM_MAX_CONCURRENCY），不随事件循环重建"""
+        if self._limiter is None:
+            with self._lock:
+                if self._limiter is None:
+                    self._limiter = threading.BoundedSemaphore(getattr(settings, 'LLM_MAX_CONCURRENCY', 8))
+        return self._limiter
+
+    async def _acquire(self, deadline):
+        """在截止时间前取得并发名额，返回是否成功；名额跨事件循环共享，只能非阻塞地轮询"""
+        while not self.limiter.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    def _client(self):
+        """当前事件循环的客户端，AsyncOpenAI 的连接池不能跨事件循环使用"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # 未经 asyncio.run 正常结束的事件循环：客户端无法再关闭，只移除引用
+            for closed in [other for other in self._loop_state if other.is_closed()]:
+                del self._loop_state[closed]
+            state = self._loop_state.get(loop)
+            if state is None:
+                client = self._create_client()
+                state = (client, loop.create_task(self._close_with_loop(loop, client)))
+                self._loop_state[loop] = state
+            return state[0]
+
+    async def _close_with_loop(self, loop, client):
+        """一直等待到事件循环结束（asyncio.run 退出前会取消所有任务），再关闭客户端的连接池并移除"""
+        try:
+            await loop.create_future()
+        finally:
+            with self._lock:
+                if self._loop_state.get(loop, (None,))[0] is client:
+                    del self._loop_state[loop]
+            if hasattr(client, 'close'):
+                await client.close()
+
+    async def chat_completion(self, deadline, **kwargs):
+        """
+        调用 chat.completions.create，deadline 为 time.monotonic() 的截止时刻
+        上游不可用时抛出 UpstreamUnavailable
+        """
+        if not self.configured:
+            raise UpstreamUnavailable("OpenAI API密钥未配置")
+        if not self.breaker.allow():
+            raise UpstreamUnavailable("circuit open")
+
+        client = self._client()
+        if not await self._acquire(deadline):
+            # 排队超时说明本进程已满负荷，不计入上游失败
+            self.breaker.release_probe()
+            raise UpstreamUnavailable("too many concurrent requests")
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            response = await asyncio.wait_for(
+                client.chat.completions.create(timeout=remaining, **kwargs), remaining
+            )
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            raise UpstreamUnavailable("deadline exceeded")
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.error(f"LLM upstream error: {type(e).__name__} - {str(e)}")
+            raise UpstreamUnavailable(str(e)) from e
+        finally:
+            self.limiter.release()
+        self.breaker.record_success()
+        return response
+
+    async def stream_chat_completion(self, deadline, **kwargs):
+        """
+        流式调用 chat.completions.create，逐个产出上游的 chunk
+        deadline 约束到第一个 chunk 为止；之后相邻 chunk 的间隔超过 LLM_STREAM_IDLE_SECONDS 视为超时。
+        整个流式过程中占用一个并发名额，调用方提前关闭生成器（例如客户端断开）时释放
+        """
+        if not self.configured:
+            raise UpstreamUnavailable("OpenAI API密钥未配置")
+        if not self.breaker.allow():
+            raise UpstreamUnavailable("circuit open")
+
+        client = self._client()
+        if not await self._acquire(deadline):
+            self.breaker.release_probe()
+            raise UpstreamUnavailable("too many concurrent requests")
+
+        idle_timeout = getattr(settings, 'LLM_STREAM_IDLE_SECONDS', 15)
+        stream = None
+        first = True
+        try:
+            try:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                stream = await asyncio.wait_for(
+                    client.chat.completions.create(stream=True, timeout=remaining, **kwargs), remaining
+                )
+                chunks = stream.__aiter__()
+                while True:
+                    timeout = max(deadline - time.monotonic(), 0) if first else idle_timeout
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    if first:
+                        # 收到第一个 chunk 即认为上游可用
+                        self.breaker.record_success()
+                        first = False
+                    yield chunk
+            except asyncio.TimeoutError:
+                if first:
+                    self.breaker.record_failure()
+                raise UpstreamUnavailable("deadline exceeded")
+            except UpstreamUnavailable:
+                raise
+            except Exception as e:
+                if first:
+                    self.breaker.record_failure()
+                logger.error(f"LLM upstream stream error: {type(e).__name__} - {str(e)}")
+                raise UpstreamUnavailable(str(e)) from e
+        finally:
+            self.limiter.release()
+            if stream is not None and hasattr(stream, 'close'):
+                await stream.close()
+
+
+
+# 创建单例实例
+llm_client = AsyncLLMClient()
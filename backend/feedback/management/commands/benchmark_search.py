@@ -0,0 +1,80 @@
+import itertools
+import random
+import sqlite3
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from feedback.search_index import CANDIDATES, CREATE_SQL, INSERT_SQL, TABLE, issue_row, message_row, search
+
+# 校园反馈中的常见词，出现频率按 Zipf 分布，越靠前越常见
+WORDS = [
+    "宿舍", "食堂", "图书馆", "热水", "空调", "网络", "教室", "课程", "考试", "老师", "同学", "维修",
+    "学校", "希望", "问题", "时间", "安排", "校园卡", "自习", "座位", "价格", "饭菜", "洗衣机", "快递",
+    "体育馆", "实验室", "奖学金", "选课", "成绩", "辅导员", "门禁", "停电", "漏水", "噪音", "外卖",
+    "校车", "操场", "打印", "充电", "垃圾", "蚊子", "暖气", "wifi", "教务系统", "报修", "晚归", "社团",
+]
+FILLER = "的了是在有和就不都也很还要会到说去能好这那我们你他请"
+
+
+class Command(BaseCommand):
+    help = '全文搜索的微基准：在内存数据库中生成合成文档，测量不同类型查询的耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=100000, help='文档总数（问题约占 40%%，其余为评论）')
+        parser.add_argument('--queries', type=int, default=200, help='每类查询的次数')
+        parser.add_argument('--candidates', type=int, default=CANDIDATES, help='参与打分的候选文档数')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # 其余的合成词（由常用字随机组合）构成长尾
+        pool = "学生教务校区楼层窗口服务设备管理通知申请流程办理时段开放关闭更新系统平台账号密码"
+        vocabulary = WORDS + [''.join(rng.sample(pool, 2)) for _ in range(3000)]
+        cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+
+        def sentence(words):
+            parts = rng.choices(vocabulary, cum_weights=cumulative, k=words)
+            return ''.join(part + rng.choice(FILLER) for part in parts)
+
+        connection = sqlite3.connect(':memory:')
+        cursor = connection.cursor()
+        cursor.execute(CREATE_SQL)
+        started = time.perf_counter()
+        issues = int(options['documents'] * 0.4)
+        rows = [
+            issue_row(i, sentence(rng.randint(2, 5)), sentence(rng.randint(10, 40)), rng.random() < 0.9)
+            for i in range(1, issues + 1)
+        ]
+        rows += [
+            message_row(i, sentence(rng.randint(2, 15)), rng.randint(1, issues), True)
+            for i in range(1, options['documents'] - issues + 1)
+        ]
+        cursor.executemany(INSERT_SQL, rows)
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+        connection.commit()
+        self.stdout.write(f"索引 {len(rows)} 条文档用时 {time.perf_counter() - started:.1f} s")
+
+        # 查询类型：(名称, 生成查询)
+        kinds = [
+            ('高频词', lambda: rng.choice(WORDS[:5])),
+            ('中频词', lambda: rng.choice(WORDS[10:40])),
+            ('长尾词', lambda: rng.choice(vocabulary[len(WORDS):])),
+            ('两个词', lambda: ' '.join(rng.sample(WORDS[:20], 2))),
+            ('单字', lambda: rng.choice(pool)),
+            ('无结果', lambda: '量子计算'),
+        ]
+        for name, make_query in kinds:
+            timings = []
+            hits = 0
+            for _ in range(options['queries']):
+                query = make_query()
+                begin = time.perf_counter()
+                hits += len(search(cursor, query, 20, candidates=options['candidates']))
+                timings.append((time.perf_counter() - begin) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f"  {name}：平均 {statistics.mean(timings):.2f} ms，中位数 {statistics.median(timings):.2f} ms，"
+                f"P95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms，平均每页 {hits / len(timings):.1f} 条"
+            )
@@ -0,0 +1,69 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# 在新进程中测量：django.setup()、第一个请求（包括加载 URL 配置、导入视图和服务）、第一次取得 OpenAI 客户端
+FIRST_REQUEST_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter() - started
+from django.test import Client
+from django.test.utils import setup_test_environment
+setup_test_environment()
+if sys.argv[1] == 'warm':
+    from feedback.service_registry import services
+    services.warmup().join()
+begin = time.perf_counter()
+Client().get('/feedback/topics/')
+first_request = time.perf_counter() - begin
+begin = time.perf_counter()
+from feedback.classify_service import classify_service
+classify_service.client
+first_client = time.perf_counter() - begin
+print(json.dumps({'setup': setup, 'first_request': first_request, 'first_client': first_client}))
+"""
+
+
+class Command(BaseCommand):
+    help = '启动耗时的基准：manage.py check 的总耗时，以及新进程中第一个请求和第一次使用 OpenAI 客户端的耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='每项测量的次数（取中位数）')
+
+    def handle(self, *args, **options):
+        runs = options['runs']
+        # 测量需要创建客户端的情况，使用一个不会被调用的占位密钥
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'backend.settings', 'OPENAI_API_KEY': 'benchmark-key'}
+        cwd = str(settings.BASE_DIR)
+
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run(
+                [sys.executable, 'manage.py', 'check'], env=env, cwd=cwd, capture_output=True, check=True
+            )
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(f"manage.py check：中位数 {statistics.median(timings) * 1000:.0f} ms")
+
+        for mode, label in [('cold', '不预热'), ('warm', '启动后预热完成')]:
+            results = []
+            for _ in range(runs):
+                output = subprocess.run(
+                    [sys.executable, '-c', FIRST_REQUEST_SCRIPT, mode], env=env, cwd=cwd,
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                results.append(json.loads(output.strip().splitlines()[-1]))
+            self.stdout.write(f"新进程（{label}）：" + '，'.join(
+                f"{name} {statistics.median(result[key] for result in results) * 1000:.0f} ms"
+                for key, name in [
+                    ('setup', 'django.setup()'), ('first_request', '第一个请求'), ('first_client', '第一次使用客户端'),
+                ]
+            ))
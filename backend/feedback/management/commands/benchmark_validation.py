@@ -0,0 +1,85 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from feedback.test_validation_reference import (
+    CHINESE, ENGLISH, FRAGMENTS, HTML, random_text, reference_detect_sql_injection, reference_sanitize_input,
+)
+from feedback.validation_utils import InputValidator, SQLInjectionDetector, _sanitize
+
+
+def uncached_sanitize_input(input_text, max_length=1000):
+    """不使用结果缓存的 sanitize_input，用于测量单次扫描本身的耗时"""
+    if not input_text:
+        return ""
+    return _sanitize.__wrapped__(input_text[:max_length])
+
+
+# 基准输入：(名称, 可选片段)
+CORPORA = [
+    ('中文', CHINESE),
+    ('中英混合', CHINESE + ENGLISH),
+    ('英文', ENGLISH),
+    ('含注入片段', FRAGMENTS),
+]
+SANITIZE_CORPORA = [
+    ('中文', CHINESE),
+    ('中英混合', CHINESE + ENGLISH),
+    ('含HTML标签', CHINESE + HTML),
+]
+
+
+class Command(BaseCommand):
+    help = '输入校验的微基准：对比 SQL 注入检测、输入清理的新实现与原实现的结果和耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--length', type=int, default=1000, help='每条输入的字符数')
+        parser.add_argument('--samples', type=int, default=200, help='每类随机输入的条数')
+        parser.add_argument('--repeat', type=int, default=20, help='每条输入重复处理的次数')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        length = options['length']
+        # 正常文本需要扫描到末尾，是最常见也最耗时的情况；含注入片段的文本通常很早就能判定
+        self.stdout.write('SQL 注入检测')
+        for name, fragments in CORPORA:
+            samples = [random_text(rng, length, fragments) for _ in range(options['samples'])]
+            self.compare(name, samples, [
+                ('原实现', reference_detect_sql_injection),
+                ('单次扫描', SQLInjectionDetector.detect_sql_injection),
+            ], options['repeat'])
+
+        # 缓存命中的耗时：每条输入先处理一次，之后重复处理
+        self.stdout.write('输入清理')
+        for name, fragments in SANITIZE_CORPORA:
+            samples = [random_text(rng, length, fragments) for _ in range(options['samples'])]
+            self.compare(name, samples, [
+                ('原实现', reference_sanitize_input),
+                ('单次扫描', uncached_sanitize_input),
+                ('缓存命中', InputValidator.sanitize_input),
+            ], options['repeat'])
+
+    def compare(self, name, samples, implementations, repeat):
+        """检查各实现的结果与第一个（原实现）一致，并输出每条输入的平均耗时"""
+        (_, reference), *others = implementations
+        for label, implementation in others:
+            mismatches = [text for text in samples if implementation(text) != reference(text)]
+            if mismatches:
+                self.stdout.write(self.style.ERROR(
+                    f'  {name} {label}: {len(mismatches)} 条结果不一致，例如 {mismatches[0][:80]!r}'
+                ))
+
+        timings = []
+        for label, implementation in implementations:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                for text in samples:
+                    implementation(text)
+            timings.append((label, (time.perf_counter() - started) / (repeat * len(samples)) * 1e6))
+        baseline = timings[0][1]
+        self.stdout.write(f"  {name}（{len(samples)} 条，{len(samples[0])} 字符）：" + '，'.join(
+            f"{label} {elapsed:.1f} μs/条" + (f"（{baseline / elapsed:.2f}x）" if elapsed != baseline else '')
+            for label, elapsed in timings
+        ))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from feedback.classify_service import classify_service
+from feedback.models import Issue, Notification, Topic
+from feedback.unread_counters import UnreadCounterService
+
+
+class Command(BaseCommand):
+    help = '批量分类问题并写回 Issue.topic（默认只处理未分类的问题）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新分类全部问题')
+        parser.add_argument('--batch-size', type=int, default=200, help='每批处理的问题数')
+        parser.add_argument('--workers', type=int, default=None, help='远程模型的最大并发数，默认为 CLASSIFY_BATCH_CONCURRENCY')
+        parser.add_argument('--min-confidence', type=float, default=0.0, help='低于该置信度的结果不写回')
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不写回数据库')
+
+    def handle(self, *args, **options):
+        queryset = Issue.objects.only('id', 'title', 'description', 'topic_id').order_by('id')
+        if not options['all']:
+            queryset = queryset.filter(topic__isnull=True)
+        topics = {topic.name: topic for topic in Topic.objects.all()}
+
+        last_id = 0
+        changed_total = skipped = 0
+        while True:
+            # 按主键分批，写回 topic 不影响后续批次的范围
+            batch = list(queryset.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            results = classify_service.classify_batch(
+                [(issue.title, issue.description or '') for issue in batch], max_workers=options['workers']
+            )
+            changed = []
+            for issue, result in zip(batch, results):
+                if not result['success'] or float(result['confidence']) < options['min_confidence']:
+                    skipped += 1
+                    continue
+                topic = topics.get(result['category'])
+                if topic is None:
+                    topic = topics[result['category']] = Topic.objects.get_or_create(name=result['category'])[0]
+                if issue.topic_id != topic.id:
+                    issue.topic = topic
+                    changed.append(issue)
+
+            if changed and not options['dry_run']:
+                # bulk_update 不触发 save() 和信号，updated 时间也保持不变；
+                # 相关用户的分类未读计数随后按通知记录重新校正
+                with transaction.atomic():
+                    Issue.objects.bulk_update(changed, ['topic'], batch_size=500)
+                    recipients = Notification.objects.filter(
+                        issue__in=changed, is_read=False
+                    ).values_list('recipient_id', flat=True).distinct()
+                    UnreadCounterService.reconcile(list(recipients))
+            changed_total += len(changed)
+            self.stdout.write(f'已处理至问题 #{last_id}，本批更新 {len(changed)} 个')
+
+        action = '将更新' if options['dry_run'] else '已更新'
+        self.stdout.write(self.style.SUCCESS(f'{action} {changed_total} 个问题的分类，跳过 {skipped} 个低置信度或失败的结果'))
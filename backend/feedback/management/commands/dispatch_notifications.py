@@ -0,0 +1,58 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from feedback.models import NotificationOutbox
+from feedback.outbox import OutboxDispatcher
+
+
+class Command(BaseCommand):
+    help = '消费通知发件箱，批量生成通知（需要常驻运行，或通过 --once 由定时任务调用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='每批抢占的事件数')
+        parser.add_argument('--workers', type=int, default=4, help='线程池大小')
+        parser.add_argument('--max-attempts', type=int, default=5, help='最大重试次数')
+        parser.add_argument('--interval', type=float, default=1.0, help='队列为空时的轮询间隔（秒）')
+        parser.add_argument('--once', action='store_true', help='清空当前队列后退出')
+        parser.add_argument('--stats', action='store_true', help='只输出队列积压指标')
+        parser.add_argument('--purge-days', type=int, default=7, help='清理多少天前已完成的事件，0 表示不清理')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(OutboxDispatcher.stats()))
+            return
+
+        dispatcher = OutboxDispatcher(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            max_attempts=options['max_attempts'],
+        )
+        self.purge(options['purge_days'])
+
+        while True:
+            succeeded, failed = dispatcher.run_once()
+            if succeeded or failed:
+                stats = OutboxDispatcher.stats()
+                self.stdout.write(
+                    f"processed={succeeded} failed={failed} pending={stats['pending']} "
+                    f"lag={stats['lag_seconds']:.1f}s"
+                )
+                continue
+            if options['once']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def purge(self, days):
+        if days <= 0:
+            return
+        deleted, _ = NotificationOutbox.objects.filter(
+            status='done', processed_at__lt=timezone.now() - timedelta(days=days)
+        ).delete()
+        if deleted:
+            self.stdout.write(self.style.SUCCESS(f'已清理 {deleted} 条已完成的事件'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from feedback.chat_sessions import chat_sessions
+
+
+class Command(BaseCommand):
+    help = '删除闲置超过 CHAT_SESSION_TTL 的智能客服会话，建议通过定时任务周期性执行'
+
+    def handle(self, *args, **options):
+        deleted = chat_sessions.purge()
+        self.stdout.write(self.style.SUCCESS(f'已删除 {deleted} 个过期会话'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from feedback.duplicate_index import duplicate_index
+
+
+class Command(BaseCommand):
+    help = '为所有问题重新计算重复检测使用的 MinHash 签名（上线时补全已有问题，或修改分片规则后执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批写入的问题数')
+
+    def handle(self, *args, **options):
+        total = duplicate_index.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'已重新计算 {total} 个问题的签名'))
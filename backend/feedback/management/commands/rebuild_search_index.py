@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from feedback.search_index import search_index
+
+
+class Command(BaseCommand):
+    help = '全量重建全文搜索索引（问题标题、描述、评论和回复），批量导入数据或升级分词规则后执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批写入的文档数')
+
+    def handle(self, *args, **options):
+        if not search_index.available:
+            self.stdout.write(self.style.WARNING('当前数据库不是 SQLite，搜索直接查询问题表，无需建立索引'))
+            return
+        total = search_index.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'搜索索引已重建，共 {total} 条文档'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from feedback.models import Issue, IssueLike, TrendingIssue
+from feedback.trending import recompute_hot_scores
+
+
+class Command(BaseCommand):
+    help = '重建热门榜单（sortBy=trending 使用的前N名问题），建议通过定时任务周期性执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=500, help='榜单保留的问题数量')
+        parser.add_argument('--recompute', action='store_true', help='先根据点赞记录全量重算所有问题的趋势分')
+
+    def handle(self, *args, **options):
+        top = options['top']
+
+        if options['recompute']:
+            recompute_hot_scores(Issue, IssueLike)
+            self.stdout.write(self.style.SUCCESS('已重算全部问题的趋势分'))
+
+        # 趋势分不随时间变化，直接按索引取前N名即可
+        rows = list(
+            Issue.objects.filter(is_public=True)
+            .order_by('-hot_score', '-id')
+            .values_list('id', 'hot_score')[:top]
+        )
+        now = timezone.now()
+        with transaction.atomic():
+            TrendingIssue.objects.all().delete()
+            TrendingIssue.objects.bulk_create([
+                TrendingIssue(issue_id=issue_id, rank=rank, hot_score=hot_score, computed_at=now)
+                for rank, (issue_id, hot_score) in enumerate(rows, start=1)
+            ])
+
+        self.stdout.write(self.style.SUCCESS(f'热门榜单已重建，共 {len(rows)} 个问题'))
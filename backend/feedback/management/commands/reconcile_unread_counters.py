@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from feedback.unread_counters import UnreadCounterService
+
+
+class Command(BaseCommand):
+    help = '根据通知记录重新计算未读计数，修复计数偏差（建议每天通过定时任务执行一次）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='只修复指定用户ID，可重复使用')
+
+    def handle(self, *args, **options):
+        fixed = UnreadCounterService.reconcile(options['users'])
+        self.stdout.write(self.style.SUCCESS(f'未读计数已校正，共修复 {fixed} 条计数'))
@@ -0,0 +1,93 @@
+import time
+import zlib
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from feedback.classify_service import classify_service
+from feedback.keyword_classifier import CATEGORIES, KeywordClassifier
+from feedback.models import Issue
+from feedback.topic_model import TopicModel, topic_model
+
+
+class Command(BaseCommand):
+    help = '根据已分类的问题训练本地分类模型（字符 n-gram TF-IDF + 朴素贝叶斯），并与关键词回退策略对比准确率和耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help='模型文件路径，默认为 CLASSIFY_MODEL_PATH')
+        parser.add_argument('--buckets', type=int, default=1 << 16, help='n-gram 哈希桶数量')
+        parser.add_argument('--holdout', type=float, default=0.2, help='留出用于校准和评估的样本比例')
+        parser.add_argument('--min-samples', type=int, default=20, help='训练所需的最少样本数')
+
+    def handle(self, *args, **options):
+        output = options['output'] or settings.CLASSIFY_MODEL_PATH
+        rows = list(
+            Issue.objects.filter(topic__name__in=CATEGORIES)
+            .order_by('id').values_list('id', 'title', 'description', 'topic__name')
+        )
+        if len(rows) < options['min_samples']:
+            raise CommandError(f'已分类的问题只有 {len(rows)} 个，至少需要 {options["min_samples"]} 个')
+
+        # 按问题ID的哈希稳定地划分训练集和留出集，重复训练结果一致
+        cutoff = int(options['holdout'] * 100)
+        train, holdout, keyword_holdout = [], [], []
+        for issue_id, title, description, topic in rows:
+            sample = (f"{title} {description}", topic)
+            if zlib.crc32(str(issue_id).encode()) % 100 < cutoff:
+                holdout.append(sample)
+                keyword_holdout.append((title, description, topic))
+            else:
+                train.append(sample)
+
+        started = time.perf_counter()
+        model = TopicModel.train(train, CATEGORIES, buckets=options['buckets'])
+        temperature = model.calibrate(holdout)
+        self.stdout.write(
+            f'训练样本 {len(train)} 个，留出样本 {len(holdout)} 个，'
+            f'用时 {time.perf_counter() - started:.1f}s，校准温度 {temperature}'
+        )
+
+        if holdout:
+            self.benchmark(model, holdout)
+            self.calibrate_keywords(keyword_holdout)
+
+        model.save(output)
+        topic_model.reset()
+        self.stdout.write(self.style.SUCCESS(f'模型已保存到 {output}'))
+
+    def benchmark(self, model, samples):
+        """留出集上的准确率和单条平均耗时"""
+        contenders = {
+            'topic_model': lambda text: model.predict(text)['category'],
+            '_fallback_classify': lambda text: classify_service._fallback_classify(text),
+        }
+        for name, predict in contenders.items():
+            started = time.perf_counter()
+            correct = sum(predict(text) == label for text, label in samples)
+            elapsed = (time.perf_counter() - started) / len(samples) * 1000
+            self.stdout.write(f'{name:<20} 准确率 {correct / len(samples):.3f}  平均耗时 {elapsed:.3f}ms')
+
+    def calibrate_keywords(self, samples):
+        """
+        在留出集上拟合关键词分类的置信度常数，并对比拟合前后 CLASSIFY_LOCAL_CONFIDENCE_THRESHOLD
+        放行的本地结果所占比例和准确率；拟合结果需写入设置项才会生效
+        """
+        threshold = getattr(settings, 'CLASSIFY_LOCAL_CONFIDENCE_THRESHOLD', 0.75)
+        classifier = KeywordClassifier()
+        self.report_threshold('关键词分类（当前设置）', classifier, samples, threshold)
+        sharpness, evidence_scale = classifier.calibrate(samples)
+        self.report_threshold('关键词分类（拟合后）', classifier, samples, threshold)
+        self.stdout.write(
+            f'拟合结果：CLASSIFY_KEYWORD_SHARPNESS = {sharpness}，CLASSIFY_KEYWORD_EVIDENCE_SCALE = {evidence_scale}'
+        )
+
+    def report_threshold(self, name, classifier, samples, threshold):
+        accepted = [
+            (result['category'], label) for result, label in (
+                (classifier.classify(title, description), label) for title, description, label in samples
+            ) if result['confidence'] >= threshold
+        ]
+        accuracy = sum(category == label for category, label in accepted) / len(accepted) if accepted else 0.0
+        self.stdout.write(
+            f'{name} 置信度 >= {threshold} 的比例 {len(accepted) / len(samples):.3f}  准确率 {accuracy:.3f}'
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0011_favorite'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['is_public', '-updated', '-id'], name='issue_public_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['is_public', '-popularity', '-updated', '-id'], name='issue_public_popular_idx'),
+        ),
+    ]
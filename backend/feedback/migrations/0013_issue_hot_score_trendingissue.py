@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_hot_score(apps, schema_editor):
+    from feedback.trending import recompute_hot_scores
+    recompute_hot_scores(apps.get_model('feedback', 'Issue'), apps.get_model('feedback', 'IssueLike'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0012_issue_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingIssue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField(unique=True)),
+                ('hot_score', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='hot_score',
+            field=models.FloatField(default=0.0, help_text='随时间衰减的趋势分（对数空间，见 feedback/trending.py）'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['is_public', '-hot_score'], name='issue_public_hot_idx'),
+        ),
+        migrations.AddField(
+            model_name='trendingissue',
+            name='issue',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trending', to='feedback.issue'),
+        ),
+        migrations.RunPython(backfill_hot_score, migrations.RunPython.noop),
+    ]
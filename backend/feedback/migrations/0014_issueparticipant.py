@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_participants(apps, schema_editor):
+    Message = apps.get_model('feedback', 'Message')
+    IssueParticipant = apps.get_model('feedback', 'IssueParticipant')
+    pairs = Message.objects.filter(user__isnull=False).values_list('issue_id', 'user_id').distinct()
+    IssueParticipant.objects.bulk_create(
+        [IssueParticipant(issue_id=issue_id, user_id=user_id) for issue_id, user_id in pairs],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0013_issue_hot_score_trendingissue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('joined', models.DateTimeField(auto_now_add=True)),
+                ('issue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='feedback.issue')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('issue', 'user')},
+            },
+        ),
+        migrations.RunPython(backfill_participants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_unread_counters(apps, schema_editor):
+    Notification = apps.get_model('feedback', 'Notification')
+    UnreadCounter = apps.get_model('feedback', 'UnreadCounter')
+    TopicUnreadCounter = apps.get_model('feedback', 'TopicUnreadCounter')
+    unread = Notification.objects.filter(is_read=False).order_by()
+    UnreadCounter.objects.bulk_create(
+        [
+            UnreadCounter(user_id=user_id, count=total)
+            for user_id, total in unread.values_list('recipient_id').annotate(total=Count('id'))
+        ],
+        batch_size=500,
+    )
+    TopicUnreadCounter.objects.bulk_create(
+        [
+            TopicUnreadCounter(user_id=user_id, topic_id=topic_id, count=total)
+            for user_id, topic_id, total in unread.filter(issue__topic__isnull=False)
+            .values_list('recipient_id', 'issue__topic_id').annotate(total=Count('id'))
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_invitationcode'),
+        ('feedback', '0015_notificationoutbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TopicUnreadCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unread_counters', to='feedback.topic')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topic_unread_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'topic')},
+            },
+        ),
+        migrations.RunPython(backfill_unread_counters, migrations.RunPython.noop),
+    ]
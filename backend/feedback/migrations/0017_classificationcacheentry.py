@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0016_unread_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassificationCacheEntry',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('category', models.CharField(max_length=20)),
+                ('confidence', models.FloatField()),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
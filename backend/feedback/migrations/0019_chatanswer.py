@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:57
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0018_chatsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question', models.CharField(max_length=1000)),
+                ('answer', models.TextField()),
+                ('pinned', models.BooleanField(default=False)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('last_hit', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-pinned', '-hits'],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    # FTS5 虚拟表只在 SQLite 上创建，其他数据库的搜索退化为 icontains 查询（见 feedback/search_index.py）
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS feedback_search USING fts5("
+            "title, body, issue_id UNINDEXED, public UNINDEXED, tokenize = 'unicode61 remove_diacritics 0', prefix = '1')"
+        )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS feedback_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0019_chatanswer'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
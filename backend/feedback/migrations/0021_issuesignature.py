@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0020_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueSignature',
+            fields=[
+                ('issue', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='duplicate_signature', serialize=False, to='feedback.issue')),
+                ('title_signature', models.BinaryField()),
+                ('signature', models.BinaryField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0021_issuesignature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatanswer',
+            name='approved',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,5 +1,9 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+from . import trending
 
 # Create your models here.
 class Topic(models.Model):
@@ -22,19 +26,41 @@ class Issue(models.Model):
     views = models.IntegerField(default=0, help_text="浏览量")
     likes = models.IntegerField(default=0, help_text="点赞量")
     popularity = models.FloatField(default=0.0, help_text="热度值")
+    hot_score = models.FloatField(default=0.0, help_text="随时间衰减的趋势分（对数空间，见 feedback/trending.py）")
 
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-updated','-created']
+        indexes = [
+            # 问题列表游标分页使用的复合索引（sortBy=time / sortBy=popularity）
+            models.Index(fields=['is_public', '-updated', '-id'], name='issue_public_updated_idx'),
+            models.Index(fields=['is_public', '-popularity', '-updated', '-id'], name='issue_public_popular_idx'),
+            # 重建热门榜单时按趋势分取前N名
+            models.Index(fields=['is_public', '-hot_score'], name='issue_public_hot_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.hot_score:
+            # 发布本身作为第一个事件计入趋势分
+            self.hot_score = trending.event_score(trending.CREATE_WEIGHT, self.created or timezone.now())
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def popularity_of(likes, views):
+        """
+        热度公式：热度 = 点赞数 * 2 + 浏览量 * 1
+        参数既可以是数值，也可以是 F() 表达式（用于在 UPDATE 语句中计算）
+        """
+        return likes * 2 + views * 1
 
     def calculate_popularity(self):
         """
         计算热度值：点赞权重=2，浏览权重=1
         公式：热度 = 点赞数 * 2 + 浏览量 * 1
         """
-        return self.likes * 2 + self.views * 1
+        return Issue.popularity_of(likes=self.likes, views=self.views)
     
     def update_popularity(self):
         """更新热度值"""
@@ -56,6 +82,29 @@ class IssueLike(models.Model):
     def __str__(self):
         return f"{self.user.username} liked {self.issue.title}"
 
+class TrendingIssue(models.Model):
+    """热门榜单（物化的前N名，由 rebuild_trending 命令定期重建）"""
+    issue = models.OneToOneField(Issue, on_delete=models.CASCADE, related_name='trending')
+    rank = models.PositiveIntegerField(unique=True)
+    hot_score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['rank']
+
+    def __str__(self):
+        return f"#{self.rank} {self.issue.title}"
+
+
+class IssueSignature(models.Model):
+    """问题文本的 MinHash 签名（见 feedback/duplicate_index.py），进程启动时直接加载，不必重新计算"""
+    issue = models.OneToOneField(Issue, on_delete=models.CASCADE, primary_key=True, related_name='duplicate_signature')
+    title_signature = models.BinaryField()
+    signature = models.BinaryField()
+
+    def __str__(self):
+        return f"Signature of issue {self.issue_id}"
+
 class Message(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     issue = models.ForeignKey(Issue,on_delete=models.CASCADE)
@@ -68,6 +117,18 @@ class Message(models.Model):
     def __str__(self):
         return self.body[0:50]
 
+class IssueParticipant(models.Model):
+    """问题的评论参与者（由 Message 的保存/删除信号维护），用于评论通知的批量扇出"""
+    issue = models.ForeignKey(Issue, on_delete=models.CASCADE, related_name='participants')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='participations')
+    joined = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('issue', 'user')
+
+    def __str__(self):
+        return f"{self.user.username} 参与了 {self.issue.title}"
+
 class Reply(models.Model):
     administrator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     content = models.CharField(max_length=1000)
@@ -130,4 +191,98 @@ class Favorite(models.Model):
         unique_together = ['user', 'issue']  # 每个用户对每个问题只能收藏一次
         
     def __str__(self):
-        return f"{self.user.username} 收藏了 {self.issue.title}"
\ No newline at end of file
+        return f"{self.user.username} 收藏了 {self.issue.title}"
+
+class NotificationOutbox(models.Model):
+    """通知发件箱：写接口只记录事件，由 dispatch_notifications 命令异步生成通知"""
+    STATUS_CHOICES = [
+        ('pending', '等待处理'),
+        ('processing', '处理中'),
+        ('done', '已完成'),
+        ('failed', '失败'),
+    ]
+
+    event_type = models.CharField(max_length=30)
+    payload = models.JSONField(default=dict)
+    idempotency_key = models.CharField(max_length=150, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    claimed_by = models.CharField(max_length=36, blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} ({self.status})"
+
+class UnreadCounter(models.Model):
+    """用户未读通知总数（反规范化计数，由 NotificationService 在同一事务中维护）"""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='unread_counter')
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.count}"
+
+class TopicUnreadCounter(models.Model):
+    """用户在各分类下的未读通知数，内容管理员的 admin_filter 未读数由其负责分类的计数相加得到"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='topic_unread_counters')
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='unread_counters')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['user', 'topic']
+
+    def __str__(self):
+        return f"{self.user_id}/{self.topic_id}: {self.count}"
+
+class ClassificationCacheEntry(models.Model):
+    """智能分类结果的持久化缓存（feedback/classify_cache.py 的数据库层）"""
+    key = models.CharField(max_length=64, primary_key=True)
+    category = models.CharField(max_length=20)
+    confidence = models.FloatField()
+    reason = models.CharField(max_length=255, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.key[:12]} -> {self.category}"
+
+class ChatSession(models.Model):
+    """智能客服会话：最近若干轮对话原文和更早对话的摘要（由 feedback/chat_sessions.py 维护）"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='chat_sessions')
+    summary = models.TextField(blank=True)
+    summary_version = models.PositiveIntegerField(default=0)
+    messages = models.JSONField(default=list)
+    turns = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.id} ({self.turns} turns)"
+
+class ChatAnswer(models.Model):
+    """
+    智能客服答案缓存：管理员维护的常见问题（pinned=True，不会被淘汰）和登录用户问过的问题的模型回答
+    模型回答在管理员审核通过（approved=True）之前不会返回给任何人
+    """
+    question = models.CharField(max_length=1000)
+    answer = models.TextField()
+    pinned = models.BooleanField(default=False)
+    approved = models.BooleanField(default=False)
+    hits = models.PositiveIntegerField(default=0)
+    last_hit = models.DateTimeField(default=timezone.now, db_index=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-pinned', '-hits']
+
+    def __str__(self):
+        return self.question[:50]
@@ -0,0 +1,83 @@
+"""
+进程内通知发布/订阅中心
+通知推送接口（notifications/stream/）为每个连接注册一个订阅，
+NotificationService 在事务提交后调用 publish() 唤醒对应用户的连接，
+没有新通知时连接只在事件循环上等待，不占用线程也不查询数据库。
+"""
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """一个推送连接的订阅，由连接所在的事件循环等待"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def notify(self):
+        """可在任意线程中调用"""
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            # 事件循环已关闭，连接即将被清理
+            pass
+
+    async def wait(self, timeout):
+        """等待新通知，超时返回 False"""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+
+class NotificationHub:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    @property
+    def max_connections_per_user(self):
+        return getattr(settings, 'NOTIFICATION_PUSH_MAX_CONNECTIONS', 3)
+
+    def subscribe(self, user_id):
+        """注册订阅，超过单用户连接数上限时返回 None（需在事件循环中调用）"""
+        with self._lock:
+            if len(self._subscribers[user_id]) >= self.max_connections_per_user:
+                return None
+            subscription = Subscription(user_id)
+            self._subscribers[user_id].add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.user_id]
+
+    def connection_count(self, user_id):
+        with self._lock:
+            return len(self._subscribers.get(user_id, ()))
+
+    def publish(self, user_ids):
+        """唤醒这些用户的全部连接"""
+        with self._lock:
+            targets = [s for user_id in set(user_ids) for s in self._subscribers.get(user_id, ())]
+        for subscription in targets:
+            subscription.notify()
+
+
+# 创建单例实例
+notification_hub = NotificationHub()
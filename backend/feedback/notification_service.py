@@ -1,20 +1,45 @@
 from django.contrib.auth import get_user_model
-from .models import Notification, Issue, Reply, Message
+from django.db import transaction
+from api.authorization import AuthorizationContext
+from .models import Notification, Issue, Reply, Message, IssueParticipant
+from .admin_routing import admin_routing
+from .unread_counters import UnreadCounterService
+from .notification_hub import notification_hub
 
 User = get_user_model()
 
 class NotificationService:
     @staticmethod
     def create_notification(recipient, notification_type, title, message, sender=None, issue=None):
-        """创建通知"""
-        return Notification.objects.create(
-            recipient=recipient,
-            sender=sender,
-            notification_type=notification_type,
-            title=title,
-            message=message,
-            issue=issue
-        )
+        """创建通知，并在同一事务中累加未读计数"""
+        with transaction.atomic():
+            notification = Notification.objects.create(
+                recipient=recipient,
+                sender=sender,
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                issue=issue
+            )
+            UnreadCounterService.record_created([notification])
+            NotificationService.publish([recipient.pk])
+        return notification
+    
+    @staticmethod
+    def bulk_create_notifications(notifications):
+        """批量创建通知，并在同一事务中累加未读计数"""
+        with transaction.atomic():
+            created = Notification.objects.bulk_create(notifications, batch_size=500)
+            UnreadCounterService.record_created(created)
+            NotificationService.publish([n.recipient_id for n in created])
+        return created
+    
+    @staticmethod
+    def publish(user_ids):
+        """事务提交后唤醒这些用户的推送连接"""
+        user_ids = set(user_ids)
+        if user_ids:
+            transaction.on_commit(lambda: notification_hub.publish(user_ids))
     
     @staticmethod
     def notify_status_update(issue, old_status, new_status):
@@ -50,7 +75,7 @@ class NotificationService:
         """新评论通知"""
         issue = message_obj.issue
         # 通知问题发布者（如果评论者不是发布者本人）
-        if issue.host and message_obj.user != issue.host:
+        if issue.host_id and message_obj.user_id != issue.host_id:
             title = f"您的问题有新评论"
             message = f"用户「{message_obj.user.username}」评论了您的问题「{issue.title}」：{message_obj.body[:50]}..."
             NotificationService.create_notification(
@@ -63,29 +88,28 @@ class NotificationService:
             )
         
         # 通知其他评论者（除了当前评论者和问题发布者）
-        other_commenters = Message.objects.filter(
-            issue=issue
-        ).exclude(
-            user=message_obj.user
+        # 参与者集合由信号维护，一次查询取出收件人，再一次批量插入
+        other_commenters = IssueParticipant.objects.filter(
+            issue_id=issue.pk
         ).exclude(
-            user=issue.host
-        ).values_list('user', flat=True).distinct()
+            user_id=message_obj.user_id
+        )
+        if issue.host_id:
+            other_commenters = other_commenters.exclude(user_id=issue.host_id)
         
-        for user_id in other_commenters:
-            try:
-                user = User.objects.get(id=user_id)
-                title = f"您参与的问题有新评论"
-                message = f"用户「{message_obj.user.username}」在问题「{issue.title}」中发表了新评论"
-                NotificationService.create_notification(
-                    recipient=user,
-                    sender=message_obj.user,
-                    notification_type='new_comment',
-                    title=title,
-                    message=message,
-                    issue=issue
-                )
-            except User.DoesNotExist:
-                continue
+        title = f"您参与的问题有新评论"
+        message = f"用户「{message_obj.user.username}」在问题「{issue.title}」中发表了新评论"
+        NotificationService.bulk_create_notifications([
+            Notification(
+                recipient_id=user_id,
+                sender=message_obj.user,
+                notification_type='new_comment',
+                title=title,
+                message=message,
+                issue=issue
+            )
+            for user_id in other_commenters.values_list('user_id', flat=True)
+        ])
     
     @staticmethod
     def notify_issue_liked(issue, liker):
@@ -105,72 +129,49 @@ class NotificationService:
     @staticmethod
     def notify_new_issue_to_admins(issue):
         """新问题通知给相关管理员"""
-        from api.models import Role
-        
-        # 获取所有管理员用户
-        admin_users = User.objects.filter(roles__isnull=False).distinct()
+        # 通过路由索引直接取出收件人，一次批量插入
+        super_admins = admin_routing.super_admins()
+        content_admins = admin_routing.admins_for_topic(issue.topic_id) - super_admins if issue.topic_id else set()
         
-        for admin in admin_users:
-            admin_roles = [role.name for role in admin.roles.all()]
-            admin_topics = [role.topic for role in admin.roles.all() if role.topic]
-            
-            # 如果是超级管理员，直接通知
-            if 'super_admin' in admin_roles:
-                title = f"新问题需要处理"
-                message = f"学生「{issue.host.username}」发布了新问题「{issue.title}」"
-                NotificationService.create_notification(
-                    recipient=admin,
+        title = f"新问题需要处理"
+        notifications = [
+            Notification(
+                recipient_id=admin_id,
+                sender=issue.host,
+                notification_type='system',
+                title=title,
+                message=f"学生「{issue.host.username}」发布了新问题「{issue.title}」",
+                issue=issue
+            )
+            for admin_id in super_admins
+        ]
+        if content_admins:
+            # 内容管理员：只通知负责该分类的管理员
+            message = f"学生「{issue.host.username}」在您负责的「{issue.topic.name}」分类下发布了新问题「{issue.title}」"
+            notifications.extend(
+                Notification(
+                    recipient_id=admin_id,
                     sender=issue.host,
                     notification_type='system',
                     title=title,
                     message=message,
                     issue=issue
                 )
-            else:
-                # 内容管理员：检查问题主题是否匹配管理员负责的主题
-                should_notify = False
-                for topic in admin_topics:
-                    if topic and topic.lower() in issue.topic.name.lower():
-                        should_notify = True
-                        break
-                
-                if should_notify:
-                    title = f"新问题需要处理"
-                    message = f"学生「{issue.host.username}」在您负责的「{issue.topic.name}」分类下发布了新问题「{issue.title}」"
-                    NotificationService.create_notification(
-                        recipient=admin,
-                        sender=issue.host,
-                        notification_type='system',
-                        title=title,
-                        message=message,
-                        issue=issue
-                    )
+                for admin_id in content_admins
+            )
+        NotificationService.bulk_create_notifications(notifications)
     
     @staticmethod
-    def get_user_notifications(user, is_read=None, limit=None, admin_filter=False):
-        """获取用户通知"""
+    def get_user_notifications(user, is_read=None, limit=None, admin_filter=False, auth=None):
+        """获取用户通知，auth 为请求的授权上下文（api/authorization.py）"""
         queryset = Notification.objects.filter(recipient=user)
         
         # 如果是管理员过滤模式，只显示与管理员相关的问题通知
         if admin_filter:
-            from django.db.models import Q
-            from api.models import Role
-            
-            # 获取用户角色和主题
-            user_roles = [role.name for role in user.roles.all()]
-            user_topics = [role.topic for role in user.roles.all() if role.topic]
-            
-            # 如果是超级管理员，显示所有通知
-            if 'super_admin' in user_roles:
-                pass  # 不添加额外过滤
-            else:
-                # 内容管理员只能看到自己负责分类的问题通知
-                topic_query = Q()
-                for topic in user_topics:
-                    topic_query |= Q(issue__topic__name__icontains=topic)
-                
-                # 只显示与管理员负责主题相关的问题通知
-                queryset = queryset.filter(topic_query)
+            auth = auth or AuthorizationContext.for_user(user)
+            if not auth.is_super_admin:
+                # 内容管理员只能看到自己负责分类的问题通知，超级管理员显示所有通知
+                queryset = queryset.filter(issue__topic_id__in=auth.topic_ids)
         
         if is_read is not None:
             queryset = queryset.filter(is_read=is_read)
@@ -183,15 +184,27 @@ class NotificationService:
     @staticmethod
     def mark_as_read(notification_ids, user):
         """标记通知为已读"""
-        return Notification.objects.filter(
+        updated = UnreadCounterService.mark_read(Notification.objects.filter(
             id__in=notification_ids,
             recipient=user
-        ).update(is_read=True)
+        ))
+        # 同一用户的其他标签页同步未读数
+        NotificationService.publish([user.pk])
+        return updated
+    
+    @staticmethod
+    def mark_all_read(user):
+        """标记用户所有通知为已读"""
+        updated = UnreadCounterService.mark_read(Notification.objects.filter(recipient=user))
+        NotificationService.publish([user.pk])
+        return updated
     
     @staticmethod
-    def get_unread_count(user):
-        """获取未读通知数量"""
-        return Notification.objects.filter(
-            recipient=user,
-            is_read=False
-        ).count()
\ No newline at end of file
+    def get_unread_count(user, admin_filter=False, auth=None):
+        """获取未读通知数量（读取反规范化计数），auth 同 get_user_notifications"""
+        if admin_filter:
+            auth = auth or AuthorizationContext.for_user(user)
+            if not auth.is_super_admin:
+                # 内容管理员只统计自己负责分类的通知
+                return UnreadCounterService.get_count(user.id, auth.topic_ids)
+        return UnreadCounterService.get_count(user.id)
\ No newline at end of file
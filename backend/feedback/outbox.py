@@ -0,0 +1,208 @@
+"""
+通知发件箱（outbox）
+NOTIFICATION_DISPATCH_MODE = 'outbox' 时，写接口只向 NotificationOutbox 插入一行事件，通知的生成由
+dispatch_notifications 命令在请求之外批量完成，支持重试、幂等键和队列积压指标
+发件箱需要显式开启：默认 'sync' 仍在请求中直接生成通知（扇出留在请求中），因为 'outbox' 模式必须另外运行 worker
+"""
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import Issue, Message, NotificationOutbox, Reply
+from .notification_service import NotificationService
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+def _handle_new_issue(payload):
+    issue = Issue.objects.select_related('host', 'topic').get(pk=payload['issue_id'])
+    NotificationService.notify_new_issue_to_admins(issue)
+
+
+def _handle_admin_reply(payload):
+    reply = Reply.objects.select_related('issue__host', 'administrator').get(pk=payload['reply_id'])
+    NotificationService.notify_admin_reply(reply)
+
+
+def _handle_new_comment(payload):
+    message = Message.objects.select_related('issue__host', 'user').get(pk=payload['message_id'])
+    NotificationService.notify_new_comment(message)
+
+
+def _handle_issue_liked(payload):
+    issue = Issue.objects.select_related('host').get(pk=payload['issue_id'])
+    NotificationService.notify_issue_liked(issue, User.objects.get(pk=payload['user_id']))
+
+
+def _handle_status_update(payload):
+    issue = Issue.objects.select_related('host').get(pk=payload['issue_id'])
+    NotificationService.notify_status_update(issue, payload['old_status'], payload['new_status'])
+
+
+HANDLERS = {
+    'new_issue': _handle_new_issue,
+    'admin_reply': _handle_admin_reply,
+    'new_comment': _handle_new_comment,
+    'issue_liked': _handle_issue_liked,
+    'status_update': _handle_status_update,
+}
+
+
+def enqueue(event_type, payload, idempotency_key=None):
+    """
+    记录一个通知事件
+    NOTIFICATION_DISPATCH_MODE = 'sync'（默认）时直接在当前请求中处理；'outbox' 时写入发件箱，由 worker 处理
+    相同幂等键的事件只会记录一次
+    """
+    if event_type not in HANDLERS:
+        raise ValueError(f"Unknown notification event: {event_type}")
+    if getattr(settings, 'NOTIFICATION_DISPATCH_MODE', 'sync') != 'outbox':
+        HANDLERS[event_type](payload)
+        return None
+    try:
+        with transaction.atomic():
+            return NotificationOutbox.objects.create(
+                event_type=event_type, payload=payload, idempotency_key=idempotency_key
+            )
+    except IntegrityError:
+        logger.info(f"Duplicate notification event ignored: {idempotency_key}")
+        return None
+
+
+def enqueue_new_issue(issue):
+    enqueue('new_issue', {'issue_id': issue.pk}, f'new_issue:{issue.pk}')
+
+
+def enqueue_admin_reply(reply):
+    enqueue('admin_reply', {'reply_id': reply.pk}, f'admin_reply:{reply.pk}')
+
+
+def enqueue_new_comment(message):
+    enqueue('new_comment', {'message_id': message.pk}, f'new_comment:{message.pk}')
+
+
+def enqueue_issue_liked(issue, liker, like_id):
+    # 幂等键对应这次点赞记录：取消后重新点赞会产生新的记录，发布者会再次收到通知
+    enqueue('issue_liked', {'issue_id': issue.pk, 'user_id': liker.pk}, f'issue_liked:{like_id}')
+
+
+def enqueue_status_update(issue, old_status, new_status):
+    enqueue(
+        'status_update',
+        {'issue_id': issue.pk, 'old_status': old_status, 'new_status': new_status},
+        f'status_update:{issue.pk}:{issue.updated.isoformat()}',
+    )
+
+
+class OutboxDispatcher:
+    """
+    发件箱消费者
+    - claim_batch() 用 UPDATE ... WHERE status='pending' 抢占一批事件，多个 worker 进程可以并行
+    - 每个事件在一个事务中锁住事件行、执行处理函数并标记完成，进程崩溃时不会重复生成通知；
+      超时被回收的事件，原 worker 不会再提交通知，也不会再改写其状态
+    - 失败按指数退避重试，超过 max_attempts 次标记为 failed
+    """
+
+    def __init__(self, batch_size=100, workers=4, max_attempts=5, visibility_timeout=300):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.visibility_timeout = visibility_timeout
+        self.worker_id = str(uuid.uuid4())
+
+    def claim_batch(self):
+        now = timezone.now()
+        # 处理中但超时未完成的事件（worker 异常退出）重新放回队列
+        NotificationOutbox.objects.filter(
+            status='processing', locked_at__lt=now - timedelta(seconds=self.visibility_timeout)
+        ).update(status='pending', claimed_by='')
+
+        ids = list(
+            NotificationOutbox.objects.filter(status='pending', available_at__lte=now)
+            .order_by('id').values_list('id', flat=True)[:self.batch_size]
+        )
+        if not ids:
+            return []
+        NotificationOutbox.objects.filter(id__in=ids, status='pending').update(
+            status='processing', claimed_by=self.worker_id, locked_at=now
+        )
+        return list(NotificationOutbox.objects.filter(
+            id__in=ids, status='processing', claimed_by=self.worker_id
+        ))
+
+    def process(self, event):
+        try:
+            with transaction.atomic():
+                # 锁住仍由本 worker 持有的事件行：超时后已被回收（可能已交给其他 worker）的事件直接放弃；
+                # 持有行锁期间回收会等待本事务结束，同一事件生成的通知只会提交一次
+                if not NotificationOutbox.objects.select_for_update().filter(
+                    pk=event.pk, status='processing', claimed_by=self.worker_id
+                ).values_list('pk', flat=True):
+                    logger.warning(f"Notification event {event.pk} was reclaimed, skipping")
+                    return False
+                try:
+                    HANDLERS[event.event_type](event.payload)
+                except (Issue.DoesNotExist, Message.DoesNotExist, Reply.DoesNotExist, User.DoesNotExist):
+                    # 相关对象已被删除，无需再通知
+                    logger.info(f"Notification event {event.pk} skipped, target no longer exists")
+                NotificationOutbox.objects.filter(pk=event.pk, claimed_by=self.worker_id).update(
+                    status='done', processed_at=timezone.now(), attempts=event.attempts + 1
+                )
+            return True
+        except Exception as e:
+            attempts = event.attempts + 1
+            failed = attempts >= self.max_attempts
+            logger.error(f"Notification event {event.pk} failed (attempt {attempts}): {type(e).__name__} - {str(e)}")
+            # 只更新仍由本 worker 持有的事件，已被回收的事件由新的持有者处理
+            NotificationOutbox.objects.filter(pk=event.pk, claimed_by=self.worker_id).update(
+                status='failed' if failed else 'pending',
+                attempts=attempts,
+                last_error=f"{type(e).__name__}: {e}",
+                available_at=timezone.now() + timedelta(seconds=2 ** attempts),
+                claimed_by='',
+            )
+            return False
+
+    def _process_in_thread(self, event):
+        try:
+            return self.process(event)
+        finally:
+            # 线程池中的每个线程使用独立的数据库连接，处理完毕后关闭
+            connection.close()
+
+    def run_once(self):
+        """处理一批事件，返回 (成功数, 失败数)"""
+        events = self.claim_batch()
+        if not events:
+            return 0, 0
+        if self.workers <= 1:
+            results = [self.process(event) for event in events]
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(self._process_in_thread, events))
+        succeeded = sum(results)
+        return succeeded, len(results) - succeeded
+
+    @staticmethod
+    def stats():
+        """队列指标：各状态数量和最早一条待处理事件的等待时间（秒）"""
+        counts = dict(
+            NotificationOutbox.objects.exclude(status='done')
+            .order_by().values_list('status').annotate(total=Count('id'))
+        )
+        oldest = NotificationOutbox.objects.filter(status='pending').aggregate(oldest=Min('created'))['oldest']
+        return {
+            'pending': counts.get('pending', 0),
+            'processing': counts.get('processing', 0),
+            'failed': counts.get('failed', 0),
+            'lag_seconds': (timezone.now() - oldest).total_seconds() if oldest else 0.0,
+        }
@@ -0,0 +1,136 @@
+"""
+问题列表游标分页
+基于排序键的 keyset 分页，翻页成本与页码无关
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    游标分页（keyset pagination）
+
+    - 只有请求中带有 cursor 或 page_size 参数时才分页，否则返回完整列表（兼容旧前端）
+    - 游标记录上一页最后一行的全部排序键，下一页通过 WHERE (排序键) < (游标值) 定位，
+      可以直接走复合索引，第 N 页与第 1 页成本相同
+    - 查询集的排序必须以唯一字段（id）结尾，保证排序是全序的
+    - 点赞/浏览只会改变当前这一行的位置，不会像 OFFSET 分页那样让后续所有页整体错位
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+
+    invalid_cursor_message = '无效的分页游标'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (self.cursor_query_param not in request.query_params
+                and self.page_size_query_param not in request.query_params):
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        self.ordering = self.get_ordering(queryset)
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.build_position_filter(cursor))
+
+        # 多取一行用于判断是否还有下一页
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        ordering = tuple(queryset.query.order_by)
+        if not ordering or ordering[-1].lstrip('-') != 'id':
+            raise ValueError('KeysetCursorPagination 需要以 id 结尾的排序')
+        return ordering
+
+    def build_position_filter(self, values):
+        """
+        将 (a, b, id) < (va, vb, vid) 展开为
+        a < va OR (a = va AND b < vb) OR (a = va AND b = vb AND id < vid)
+        """
+        position = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            position |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return position
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            if payload['o'] != list(self.ordering) or len(payload['v']) != len(self.ordering):
+                raise ValueError('ordering mismatch')
+            return [
+                self.to_python(field.lstrip('-'), value)
+                for field, value in zip(self.ordering, payload['v'])
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def to_python(self, name, value):
+        """模型字段按字段类型还原，注解字段（如 trending_rank）原样使用"""
+        try:
+            field = self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        return field.to_python(value)
+
+    def encode_cursor(self, instance):
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps({'o': list(self.ordering), 'v': values}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,263 @@
+"""
+问题全文搜索
+使用 SQLite FTS5 虚拟表 feedback_search 索引问题标题、描述、评论和管理员回复。
+FTS5 自带的分词器不切分中文，这里在写入和查询前自行分词：连续的中文字符切成相邻两字的二元组
+（"热水器" → "热水 水器"），其他文字按词切分并统一大小写，表中保存的是空格分隔的词元。
+每条文档一行，rowid 由主键和文档类型（问题/评论/回复）决定，信号处理函数据此增量更新；
+批量更新等不触发信号的修改之后可用 `python manage.py rebuild_search_index` 重建。
+查询时只取最新的 SEARCH_CANDIDATES 条匹配文档（FTS5 按 rowid 倒序遍历，取够即停止，
+常见词匹配数万条文档时耗时也不随匹配数增长），在其中按 BM25 的词频饱和与长度归一化打分，
+标题的权重高于正文；候选文档都包含全部查询词，因此不计 IDF。结果按问题聚合，取其最相关文档的得分。
+匹配数不超过候选数时（少见的词）全部匹配文档都参与排序；超过时结果偏向较新的文档：
+此时再取最新的一部分标题匹配的文档一并打分，标题命中的较早问题仍能排在前面，
+但只在较早的正文、评论或回复中命中的问题不会出现在结果中，结果最多 SEARCH_CANDIDATES 个问题。
+"""
+import logging
+import re
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Q
+
+from .keyword_classifier import normalize
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'feedback_search'
+# 文档类型 → rowid 的余数
+KINDS = {'issue': 0, 'message': 1, 'reply': 2}
+
+# SQL 只在 SQLite 上执行，占位符直接写 ?，基准测试也可以在 sqlite3 连接上复用
+# prefix='1' 为单个字符的前缀建立索引，单个汉字的前缀查询不必遍历所有以它开头的词元
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "title, body, issue_id UNINDEXED, public UNINDEXED, tokenize = 'unicode61 remove_diacritics 0', prefix = '1')"
+)
+INSERT_SQL = f"INSERT INTO {TABLE}(rowid, title, body, issue_id, public) VALUES (?, ?, ?, ?, ?)"
+DELETE_SQL = f"DELETE FROM {TABLE} WHERE rowid = ?"
+CANDIDATES_SQL = (
+    f"SELECT rowid, issue_id, title, body FROM {TABLE} WHERE {TABLE} MATCH ? AND public = 1 "
+    "ORDER BY rowid DESC LIMIT ?"
+)
+
+# 参与打分的候选文档数
+CANDIDATES = 500
+# 匹配数超过候选数时补充的标题命中文档数为候选数的 1/TITLE_CANDIDATES_DIVISOR
+# （只在标题列中匹配需要遍历更多文档，全部补充时常见词的查询耗时约为原来的 3 倍）
+TITLE_CANDIDATES_DIVISOR = 5
+# 标题中的一次命中相当于正文中的 TITLE_WEIGHT 次
+TITLE_WEIGHT = 4
+# BM25 参数
+K1 = 1.2
+B = 0.75
+
+# 查询最多使用的片段数，过长的输入截断
+MAX_QUERY_TERMS = 8
+
+_CJK = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+# 连续的中文字符，或连续的其他字母数字
+_RUNS = re.compile(f'([{_CJK}]+)|([^\\W_{_CJK}]+)')
+
+
+def _runs(text):
+    """文本 → [(是否中文, 片段)]"""
+    return [(match.group(1) is not None, match.group()) for match in _RUNS.finditer(normalize(text))]
+
+
+def bigrams(run):
+    """中文片段 → 相邻两字的二元组，单个汉字原样保留"""
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(text):
+    """写入索引的文本：空格分隔的词元"""
+    tokens = []
+    for cjk, run in _runs(text):
+        tokens.extend(bigrams(run) if cjk else [run])
+    return ' '.join(tokens)
+
+
+def query_terms(query):
+    """用户输入 → [(词元短语, 是否前缀匹配)]，中文片段的二元组组成短语，单个汉字按前缀匹配"""
+    return [
+        (' '.join(bigrams(run)) if cjk else run, cjk and len(run) == 1)
+        for cjk, run in _runs(query)[:MAX_QUERY_TERMS]
+    ]
+
+
+def build_query(terms):
+    """
+    FTS5 查询表达式：每个短语的词元必须相邻出现，短语之间为 AND
+    词元只含字母数字，不会被解释为 FTS5 语法
+    """
+    return ' AND '.join(f'"{phrase}"*' if prefix else f'"{phrase}"' for phrase, prefix in terms)
+
+
+def title_query(terms):
+    """只在标题列中匹配的查询表达式"""
+    return f'title : ({build_query(terms)})'
+
+
+def rowid(kind, pk):
+    return pk * len(KINDS) + KINDS[kind]
+
+
+def issue_row(issue_id, title, description, is_public):
+    return (rowid('issue', issue_id), tokenize(title), tokenize(description), issue_id, int(is_public))
+
+
+def message_row(message_id, body, issue_id, is_public):
+    return (rowid('message', message_id), '', tokenize(body), issue_id, int(is_public))
+
+
+def reply_row(reply_id, content, issue_id, is_public):
+    return (rowid('reply', reply_id), '', tokenize(content), issue_id, int(is_public))
+
+
+def write_rows(cursor, rows):
+    """写入（或替换）若干行"""
+    cursor.executemany(DELETE_SQL, [(row[0],) for row in rows])
+    cursor.executemany(INSERT_SQL, rows)
+
+
+def _length(tokens):
+    return tokens.count(' ') + 1 if tokens else 0
+
+
+def search(cursor, query, limit, offset=0, candidates=CANDIDATES):
+    """
+    Returns:
+        list: [(问题ID, 得分)]，按得分从高到低排序，最多 candidates 个问题；查询中没有可检索的文字时返回空列表
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    cursor.execute(CANDIDATES_SQL, (build_query(terms), candidates))
+    rows = cursor.fetchall()
+    if not rows:
+        return []
+    if len(rows) >= candidates:
+        # 匹配数超过候选数：补充较早的标题命中，去掉已在候选中的文档
+        seen = {row[0] for row in rows}
+        cursor.execute(CANDIDATES_SQL, (title_query(terms), max(candidates // TITLE_CANDIDATES_DIVISOR, 1)))
+        rows += [row for row in cursor.fetchall() if row[0] not in seen]
+    rows = [row[1:] for row in rows]
+
+    lengths = [TITLE_WEIGHT * _length(title) + _length(body) for _, title, body in rows]
+    average = sum(lengths) / len(lengths) or 1
+    # 短语前后加空格按整词计数，前缀匹配只要求词元开头相同
+    needles = [f' {phrase}' if prefix else f' {phrase} ' for phrase, prefix in terms]
+    best = {}
+    for (issue_id, title, body), length in zip(rows, lengths):
+        title, body = f' {title} ', f' {body} '
+        saturation = K1 * (1 - B + B * length / average)
+        score = 0.0
+        for needle in needles:
+            frequency = TITLE_WEIGHT * title.count(needle) + body.count(needle)
+            score += frequency * (K1 + 1) / (frequency + saturation)
+        if score > best.get(issue_id, -1.0):
+            best[issue_id] = score
+    ranked = sorted(best.items(), key=lambda item: (-item[1], -item[0]))
+    return ranked[offset:min(offset + limit, candidates)]
+
+
+class SearchIndex:
+    """绑定 Django 默认数据库连接的搜索索引，非 SQLite 数据库上退化为标题、描述的 icontains 查询"""
+
+    @property
+    def available(self):
+        return connection.vendor == 'sqlite'
+
+    @property
+    def candidates(self):
+        return getattr(settings, 'SEARCH_CANDIDATES', CANDIDATES)
+
+    def _write(self, rows):
+        if not self.available:
+            return
+        try:
+            with connection.cursor() as cursor:
+                write_rows(cursor, rows)
+        except DatabaseError as e:
+            logger.error(f"Search index update failed: {str(e)}")
+
+    def index_issue(self, issue, include_children=False):
+        """
+        索引问题本身；include_children 为 True 时同时重写其评论和回复（公开状态变化后使用）
+        """
+        rows = [issue_row(issue.pk, issue.title, issue.description, issue.is_public)]
+        if include_children:
+            from .models import Message, Reply
+            rows += [
+                message_row(pk, body, issue.pk, issue.is_public)
+                for pk, body in Message.objects.filter(issue_id=issue.pk).values_list('id', 'body')
+            ]
+            rows += [
+                reply_row(pk, content, issue.pk, issue.is_public)
+                for pk, content in Reply.objects.filter(issue_id=issue.pk).values_list('id', 'content')
+            ]
+        self._write(rows)
+
+    def index_message(self, message):
+        self._write([message_row(message.pk, message.body, message.issue_id, message.issue.is_public)])
+
+    def index_reply(self, reply):
+        self._write([reply_row(reply.pk, reply.content, reply.issue_id, reply.issue.is_public)])
+
+    def remove(self, kind, pk):
+        if not self.available:
+            return
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(DELETE_SQL, (rowid(kind, pk),))
+        except DatabaseError as e:
+            logger.error(f"Search index update failed: {str(e)}")
+
+    def rebuild(self, batch_size=1000):
+        """清空后按问题、评论、回复全量重建，返回写入的文档数"""
+        from .models import Issue, Message, Reply
+        sources = [
+            (issue_row, Issue.objects.values_list('id', 'title', 'description', 'is_public')),
+            (message_row, Message.objects.values_list('id', 'body', 'issue_id', 'issue__is_public')),
+            (reply_row, Reply.objects.values_list('id', 'content', 'issue_id', 'issue__is_public')),
+        ]
+        total = 0
+        with connection.cursor() as cursor:
+            # 重建表而不是逐行删除，同时应用最新的表定义
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            cursor.execute(CREATE_SQL)
+            for make_row, values in sources:
+                batch = []
+                for values_row in values.order_by('id').iterator(chunk_size=batch_size):
+                    batch.append(make_row(*values_row))
+                    if len(batch) >= batch_size:
+                        cursor.executemany(INSERT_SQL, batch)
+                        total += len(batch)
+                        batch = []
+                cursor.executemany(INSERT_SQL, batch)
+                total += len(batch)
+            # 合并 FTS5 的索引段，加快之后的查询
+            cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+        return total
+
+    def search_issue_ids(self, query, limit, offset=0):
+        """返回按相关度排序的公开问题ID列表"""
+        if not self.available:
+            query = query.strip()
+            if not query:
+                return []
+            from .models import Issue
+            return list(
+                Issue.objects.filter(is_public=True)
+                .filter(Q(title__icontains=query) | Q(description__icontains=query))
+                .order_by('-updated', '-id')
+                .values_list('id', flat=True)[offset:offset + limit]
+            )
+        with connection.cursor() as cursor:
+            return [issue_id for issue_id, _ in search(cursor, query, limit, offset, self.candidates)]
+
+
+# 创建单例实例
+search_index = SearchIndex()
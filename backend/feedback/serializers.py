@@ -1,8 +1,11 @@
 from django.contrib.auth.models import User
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
 from .models import Issue, Reply, Message, Topic, Notification, ViewHistory, Favorite
+from .counters import counter_buffer
+from .validation_utils import contains_dangerous_tag, escape_html
 import re
-import html
 
 class TopicSerializer(serializers.ModelSerializer):
     
@@ -20,9 +23,7 @@ class TopicSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("分类名称只能包含字母、数字、中文、空格和常见标点符号")
         
         # HTML转义防护
-        value = html.escape(value)
-        
-        return value.strip()
+        return escape_html(value)
     
     class Meta:
         model = Topic
@@ -57,15 +58,11 @@ class MessageSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("评论内容不能超过1000个字符")
         
         # 基本HTML标签过滤
-        dangerous_tags = ['<script', '<iframe', '<object', '<embed', '<form', '<input', '<button']
-        for tag in dangerous_tags:
-            if tag in value.lower():
-                raise serializers.ValidationError("评论内容中不能包含危险的HTML标签")
+        if contains_dangerous_tag(value):
+            raise serializers.ValidationError("评论内容中不能包含危险的HTML标签")
         
         # HTML转义防护
-        value = html.escape(value)
-        
-        return value.strip()
+        return escape_html(value)
 
     class Meta:
         model = Message
@@ -106,15 +103,11 @@ class ReplySerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("回复内容不能超过1000个字符")
         
         # 基本HTML标签过滤
-        dangerous_tags = ['<script', '<iframe', '<object', '<embed', '<form', '<input', '<button']
-        for tag in dangerous_tags:
-            if tag in value.lower():
-                raise serializers.ValidationError("回复内容中不能包含危险的HTML标签")
+        if contains_dangerous_tag(value):
+            raise serializers.ValidationError("回复内容中不能包含危险的HTML标签")
         
         # HTML转义防护
-        value = html.escape(value)
-        
-        return value.strip()
+        return escape_html(value)
     
     class Meta:
         model = Reply
@@ -150,9 +143,7 @@ class IssueSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("标题只能包含字母、数字、中文、空格和常见标点符号")
         
         # HTML转义防护
-        value = html.escape(value)
-        
-        return value.strip()
+        return escape_html(value)
     
     def validate_description(self, value):
         """验证问题描述"""
@@ -165,15 +156,11 @@ class IssueSerializer(serializers.ModelSerializer):
         
         # 基本HTML标签过滤（允许一些安全的标签）
         # 移除危险标签
-        dangerous_tags = ['<script', '<iframe', '<object', '<embed', '<form', '<input', '<button']
-        for tag in dangerous_tags:
-            if tag in value.lower():
-                raise serializers.ValidationError("描述中不能包含危险的HTML标签")
+        if contains_dangerous_tag(value):
+            raise serializers.ValidationError("描述中不能包含危险的HTML标签")
         
         # HTML转义防护
-        value = html.escape(value)
-        
-        return value.strip()
+        return escape_html(value)
 
     def get_attachment(self, obj):
         """获取附件的完整URL"""
@@ -191,6 +178,18 @@ class IssueSerializer(serializers.ModelSerializer):
             return Favorite.objects.filter(user=request.user, issue=obj).exists()
         return False
 
+    def to_representation(self, instance):
+        """叠加写回缓冲中尚未写入数据库的浏览量/点赞量"""
+        data = super().to_representation(instance)
+        pending = self.context.get('pending_counters')
+        if pending is None:
+            pending = counter_buffer.pending([instance.pk])
+        if instance.pk in pending:
+            data['views'], data['likes'], data['popularity'] = counter_buffer.merge(
+                instance.pk, instance.views, instance.likes, pending
+            )
+        return data
+
     class Meta:
         model = Issue
         fields = [
@@ -214,6 +213,84 @@ class IssueSerializer(serializers.ModelSerializer):
             ]
         read_only_fields = ['host_name', 'is_favorited']
 
+def _count_subquery(model):
+    """按问题统计关联行数的相关子查询，避免多表JOIN后COUNT导致行数膨胀"""
+    counts = (
+        model.objects.filter(issue=OuterRef('pk'))
+        .order_by()
+        .values('issue')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+class IssueListResultSerializer(serializers.ListSerializer):
+    """列表序列化：整页只用一次查询确定收藏状态，并一次性取出未写回的计数增量"""
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        request = self.context.get('request')
+        favorited_ids = set()
+        if request and request.user.is_authenticated and items:
+            favorited_ids = set(
+                Favorite.objects.filter(
+                    user=request.user,
+                    issue_id__in=[item.pk for item in items]
+                ).values_list('issue_id', flat=True)
+            )
+        self.context['favorited_ids'] = favorited_ids
+        self.context['pending_counters'] = counter_buffer.pending([item.pk for item in items])
+        return super().to_representation(items)
+
+
+class IssueListSerializer(IssueSerializer):
+    """
+    问题列表轻量序列化器
+    不嵌套评论和回复，只返回数量；配合 setup_queryset 使用时整页查询数为常数
+    """
+    messages = None
+    replies = None
+    message_count = serializers.IntegerField(read_only=True)
+    reply_count = serializers.IntegerField(read_only=True)
+
+    @staticmethod
+    def setup_queryset(queryset):
+        """为列表查询预加载关联对象并注解评论/回复数量"""
+        return queryset.select_related('topic', 'host').annotate(
+            message_count=_count_subquery(Message),
+            reply_count=_count_subquery(Reply),
+        )
+
+    def get_is_favorited(self, obj):
+        """优先使用整页预先查询的收藏集合"""
+        favorited_ids = self.context.get('favorited_ids')
+        if favorited_ids is None:
+            return super().get_is_favorited(obj)
+        return obj.pk in favorited_ids
+
+    class Meta(IssueSerializer.Meta):
+        fields = [
+            field for field in IssueSerializer.Meta.fields
+            if field not in ('messages', 'replies')
+        ] + ['message_count', 'reply_count']
+        list_serializer_class = IssueListResultSerializer
+
+
+class AdminIssueListSerializer(IssueListSerializer):
+    """管理员问题列表：卡片上需要展示回复，回复通过一次预取加载"""
+    replies = ReplySerializer(many=True, read_only=True, source='reply_set')
+
+    @staticmethod
+    def setup_queryset(queryset):
+        return IssueListSerializer.setup_queryset(queryset).prefetch_related(
+            Prefetch('reply_set', queryset=Reply.objects.select_related('administrator'))
+        )
+
+    class Meta(IssueListSerializer.Meta):
+        fields = IssueListSerializer.Meta.fields + ['replies']
+
+
 class NotificationSerializer(serializers.ModelSerializer):
     sender_name = serializers.SerializerMethodField()
     issue_title = serializers.SerializerMethodField()
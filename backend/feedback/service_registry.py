@@ -0,0 +1,151 @@
+"""
+服务注册表
+OpenAI SDK 的导入（约 0.8 s）和客户端的创建推迟到第一次使用时，manage.py 命令、测试和进程启动
+不再为此等待，未配置 OPENAI_API_KEY 时也不会在导入阶段失败。
+- 按名称注册工厂函数，第一次 get() 时创建实例，之后在进程内共享
+- ClassifyService、ChatService 共用同一个同步 OpenAI 客户端（同一个连接池）
+- classify_service、chat_service 等模块级名称是 LazyService 代理，第一次访问属性时才创建服务
+- warmup() 在后台线程中提前创建，ASGI/WSGI 入口在启动后调用，第一个请求不必等待
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, factory):
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name):
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        # RLock：工厂函数中可以再 get() 其他服务
+        with self._lock:
+            if name not in self._instances:
+                started = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                logger.info(f"Service '{name}' initialized in {(time.perf_counter() - started) * 1000:.0f} ms")
+            return self._instances[name]
+
+    def loaded(self, name):
+        return name in self._instances
+
+    def reset(self, name=None):
+        """丢弃已创建的实例（修改配置后或测试中使用），下次 get() 时重新创建"""
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+    def lazy(self, name):
+        return LazyService(self, name)
+
+    def warmup(self, names=None):
+        """
+        在后台线程中依次创建服务，返回该线程；SERVICE_WARMUP 为 False 时不预热，返回 None
+        预热失败只记录日志，第一次使用时会再次尝试
+        """
+        if not getattr(settings, 'SERVICE_WARMUP', True):
+            return None
+        names = list(names or self._factories)
+
+        def run():
+            started = time.perf_counter()
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logger.error(f"Service '{name}' warmup failed: {type(e).__name__} - {str(e)}")
+            logger.info(f"Service warmup finished in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        thread = threading.Thread(target=run, name='service-warmup', daemon=True)
+        thread.start()
+        return thread
+
+
+class LazyService:
+    """
+    模块级的服务名称：读写属性时才从注册表取得实例
+    写和删除属性同样转发给实例，mock.patch.object(classify_service, 'client') 等用法不受影响
+    """
+    __slots__ = ('_registry', '_name')
+
+    def __init__(self, registry, name):
+        object.__setattr__(self, '_registry', registry)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._registry.get(self._name), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._registry.get(self._name), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._registry.loaded(self._name) else 'not loaded'
+        return f"<LazyService '{self._name}' ({state})>"
+
+
+class SharedService:
+    """
+    服务类上的共享依赖（如 client = SharedService('openai')），每次访问从注册表取得
+    非数据描述符：实例上赋值的同名属性优先，测试可以替换单个服务的客户端
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return services.get(self.name)
+
+
+def openai_configured():
+    api_key = getattr(settings, 'OPENAI_API_KEY', None)
+    return bool(api_key) and api_key != "your_openai_api_key_here"
+
+
+def create_openai_client():
+    """同步 OpenAI 客户端，未配置 API 密钥时返回 None"""
+    if not openai_configured():
+        logger.warning("OpenAI API密钥未配置，智能分类将使用本地分类，智能客服功能将不可用")
+        return None
+    from openai import OpenAI
+    return OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        timeout=60.0,  # 设置60秒超时
+        max_retries=2   # 失败后重试2次
+    )
+
+
+def import_openai():
+    """只导入 SDK：异步视图的 AsyncOpenAI 客户端按事件循环创建（见 llm_client.py），预热时先完成导入"""
+    if not openai_configured():
+        return None
+    import openai
+    return openai
+
+
+# 创建单例实例
+services = ServiceRegistry()
+services.register('openai', create_openai_client)
+services.register('openai_sdk', import_openai)
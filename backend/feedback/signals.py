@@ -1,15 +1,24 @@
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
-from .models import Issue
-from .notification_service import NotificationService
+from api.models import CustomUser, Role
+from .models import Issue, Message, Reply, IssueParticipant, Topic, ChatAnswer
+from .admin_routing import admin_routing
+from .answer_cache import answer_cache
+from .search_index import search_index
+from .duplicate_index import duplicate_index
+from . import outbox
+from .unread_counters import UnreadCounterService
 
 @receiver(pre_save, sender=Issue)
 def track_status_change(sender, instance, **kwargs):
-    """跟踪问题状态变化"""
+    """跟踪问题状态、分类和公开状态的变化"""
     if instance.pk:  # 只有更新时才处理
         try:
             old_instance = Issue.objects.get(pk=instance.pk)
             instance._old_status = old_instance.status
+            instance._old_topic_id = old_instance.topic_id
+            instance._old_is_public = old_instance.is_public
+            instance._old_duplicate_state = duplicate_index.state(old_instance)
         except Issue.DoesNotExist:
             instance._old_status = None
     else:
@@ -23,4 +32,83 @@ def notify_status_update(sender, instance, created, **kwargs):
         new_status = instance.status
         
         if old_status and old_status != new_status:
-            NotificationService.notify_status_update(instance, old_status, new_status)
\ No newline at end of file
+            outbox.enqueue_status_update(instance, old_status, new_status)
+
+@receiver(post_save, sender=Issue)
+def move_unread_counters(sender, instance, created, **kwargs):
+    """问题更换分类后迁移未读通知的分类计数"""
+    old_topic_id = getattr(instance, '_old_topic_id', None)
+    if not created and hasattr(instance, '_old_topic_id') and old_topic_id != instance.topic_id:
+        UnreadCounterService.move_topic(instance.pk, old_topic_id, instance.topic_id)
+        instance._old_topic_id = instance.topic_id
+
+@receiver(pre_delete, sender=Issue)
+def discard_unread_counters(sender, instance, **kwargs):
+    """问题删除前扣减随之级联删除的未读通知计数"""
+    UnreadCounterService.discard_issue(instance)
+
+@receiver(post_save, sender=Message)
+def add_participant(sender, instance, created, **kwargs):
+    """评论发布后将评论者加入问题参与者集合"""
+    if created and instance.user_id:
+        IssueParticipant.objects.bulk_create(
+            [IssueParticipant(issue_id=instance.issue_id, user_id=instance.user_id)],
+            ignore_conflicts=True
+        )
+
+@receiver(post_delete, sender=Message)
+def remove_participant(sender, instance, **kwargs):
+    """评论删除后，如果评论者在该问题下已没有其他评论，则移出参与者集合"""
+    if instance.user_id and not Message.objects.filter(
+        issue_id=instance.issue_id, user_id=instance.user_id
+    ).exists():
+        IssueParticipant.objects.filter(issue_id=instance.issue_id, user_id=instance.user_id).delete()
+
+# 角色、分类、用户角色变化或管理员账号删除时使路由索引失效
+for model in (Role, Topic):
+    post_save.connect(admin_routing.invalidate, sender=model, dispatch_uid=f'admin_routing_save_{model.__name__}')
+    post_delete.connect(admin_routing.invalidate, sender=model, dispatch_uid=f'admin_routing_delete_{model.__name__}')
+post_delete.connect(admin_routing.invalidate, sender=CustomUser, dispatch_uid='admin_routing_delete_user')
+m2m_changed.connect(admin_routing.invalidate, sender=CustomUser.roles.through, dispatch_uid='admin_routing_user_roles')
+
+# 答案缓存条目变化时通知各进程重新加载索引
+post_save.connect(answer_cache.invalidate, sender=ChatAnswer, dispatch_uid='answer_cache_save')
+post_delete.connect(answer_cache.invalidate, sender=ChatAnswer, dispatch_uid='answer_cache_delete')
+
+# 问题、评论、回复变化时增量更新全文搜索索引
+@receiver(post_save, sender=Issue)
+def index_issue(sender, instance, created, **kwargs):
+    """问题公开状态变化时连同评论、回复一起重写，它们的可见性跟随问题"""
+    visibility_changed = not created and getattr(instance, '_old_is_public', instance.is_public) != instance.is_public
+    search_index.index_issue(instance, include_children=visibility_changed)
+    instance._old_is_public = instance.is_public
+
+@receiver(post_save, sender=Message)
+def index_message(sender, instance, **kwargs):
+    search_index.index_message(instance)
+
+@receiver(post_save, sender=Reply)
+def index_reply(sender, instance, **kwargs):
+    search_index.index_reply(instance)
+
+@receiver(post_delete, sender=Issue)
+def unindex_issue(sender, instance, **kwargs):
+    search_index.remove('issue', instance.pk)
+
+@receiver(post_delete, sender=Message)
+def unindex_message(sender, instance, **kwargs):
+    search_index.remove('message', instance.pk)
+
+@receiver(post_delete, sender=Reply)
+def unindex_reply(sender, instance, **kwargs):
+    search_index.remove('reply', instance.pk)
+
+# 问题新增、修改或删除时更新重复检测的签名和索引（只在相关字段变化时）
+@receiver(post_save, sender=Issue)
+def update_duplicate_index(sender, instance, created, **kwargs):
+    duplicate_index.update(instance, None if created else getattr(instance, '_old_duplicate_state', None))
+    instance._old_duplicate_state = duplicate_index.state(instance)
+
+@receiver(post_delete, sender=Issue)
+def remove_from_duplicate_index(sender, instance, **kwargs):
+    duplicate_index.remove(instance.pk)
@@ -0,0 +1,556 @@
+"""
+智能分类测试
+"""
+
+import asyncio
+import datetime
+import json
+import time
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.models import Role
+from .classify_cache import ClassificationCache, cache_key, classification_cache
+from .answer_cache import answer_cache
+from .chat_sessions import message_tokens
+from .chat_service import chat_service
+from .classify_service import classify_service
+from .keyword_classifier import AhoCorasick, KeywordClassifier, keyword_classifier
+from .llm_client import CircuitBreaker, UpstreamUnavailable, llm_client
+from .models import ChatAnswer, ChatSession, ClassificationCacheEntry, Issue, Topic
+from .service_registry import ServiceRegistry, services
+from .topic_model import TopicModel, topic_model
+
+User = get_user_model()
+
+
+def fake_completion(category='生活', confidence=0.9):
+    """模拟远程模型的返回"""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(
+            content=json.dumps({'category': category, 'confidence': confidence, 'reason': '测试'})
+        ))],
+        usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15),
+    )
+
+
+@override_settings(CLASSIFY_LOCAL_CONFIDENCE_THRESHOLD=2)
+class ClassificationCacheTest(TestCase):
+    """分类结果缓存测试类（关闭本地优先分类，每次都走远程模型）"""
+
+    def setUp(self):
+        classification_cache.clear()
+        patcher = mock.patch.object(classify_service, 'client')
+        self.client_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.create = self.client_mock.chat.completions.create
+        self.create.return_value = fake_completion()
+
+    def test_near_identical_inputs_hit_cache(self):
+        """空白、标点、全半角和大小写不同的输入共用一个缓存项"""
+        first = classify_service.classify_issue('宿舍WiFi太慢', '晚上经常断线。')
+        second = classify_service.classify_issue(' 宿舍 ｗｉｆｉ 太慢！', '晚上经常断线')
+        self.assertEqual(self.create.call_count, 1)
+        self.assertNotIn('cached', first)
+        self.assertTrue(second['cached'])
+        self.assertEqual((second['category'], second['confidence']), ('生活', 0.9))
+        self.assertNotEqual(cache_key('宿舍太冷'), cache_key('宿舍太热'))
+        self.assertEqual(classification_cache.stats()['memory_hits'], 1)
+
+    def test_failures_are_not_cached(self):
+        self.create.side_effect = RuntimeError('timeout')
+        classify_service.classify_issue('宿舍热水')
+        self.create.side_effect = None
+        result = classify_service.classify_issue('宿舍热水')
+        self.assertTrue(result['success'])
+        self.assertEqual(self.create.call_count, 2)
+
+    @override_settings(CLASSIFY_CACHE_DB=True)
+    def test_db_tier(self):
+        """内存层失效后从数据库层读取"""
+        classify_service.classify_issue('食堂饭菜太贵')
+        self.assertEqual(ClassificationCacheEntry.objects.count(), 1)
+        classification_cache.clear()
+        result = classify_service.classify_issue('食堂饭菜太贵')
+        self.assertTrue(result['cached'])
+        self.assertEqual(self.create.call_count, 1)
+        self.assertEqual(classification_cache.stats()['db_hits'], 1)
+
+    def test_lru_and_ttl(self):
+        cache = ClassificationCache(maxsize=2, ttl=60)
+        for key in 'abc':
+            cache.set(key, '生活', 0.9, '')
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('b'))
+
+        with mock.patch('feedback.classify_cache.time.monotonic', return_value=1e12):
+            self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['size'], 1)
+
+
+class KeywordClassifierTest(TestCase):
+    """本地关键词分类测试类"""
+
+    def setUp(self):
+        classification_cache.clear()
+        patcher = mock.patch.object(classify_service, 'client')
+        self.create = patcher.start().chat.completions.create
+        self.addCleanup(patcher.stop)
+        self.create.return_value = fake_completion('其他', 0.6)
+
+    def test_automaton_finds_overlapping_matches(self):
+        automaton = AhoCorasick([(word, word) for word in ('he', 'she', 'his', 'hers')])
+        self.assertEqual(
+            [(end, word) for end, word, _ in automaton.iter_matches('ushers')],
+            [(3, 'she'), (3, 'he'), (5, 'hers')],
+        )
+
+    def test_confidence_grows_with_evidence(self):
+        strong = keyword_classifier.classify('宿舍热水不够', '晚上洗澡没有热水')
+        weak = keyword_classifier.classify('有个建议')
+        self.assertEqual(strong['category'], '生活')
+        self.assertGreater(strong['confidence'], 0.9)
+        self.assertLess(weak['confidence'], 0.5)
+        self.assertEqual(keyword_classifier.classify('今天天气不错')['confidence'], 0.0)
+
+    def test_calibrate_on_labelled_samples(self):
+        """拟合后置信度反映本地结果的实际准确率：命中宽泛词但常常分错的结果置信度降低"""
+        samples = [('宿舍热水不够', '晚上洗澡没有热水', '生活')] * 5 + [('有个建议', '', '管理')] * 5
+        classifier = KeywordClassifier()
+        default_weak = classifier.classify('有个建议')['confidence']
+        fitted = classifier.calibrate(samples)
+        self.assertNotEqual(fitted, (KeywordClassifier.SHARPNESS, KeywordClassifier.EVIDENCE_SCALE))
+        self.assertLess(classifier.classify('有个建议')['confidence'], default_weak)
+        self.assertGreater(classifier.classify('宿舍热水不够', '晚上洗澡没有热水')['confidence'], 0.9)
+
+        with override_settings(CLASSIFY_KEYWORD_SHARPNESS=fitted[0], CLASSIFY_KEYWORD_EVIDENCE_SCALE=fitted[1]):
+            self.assertEqual(
+                keyword_classifier.classify('有个建议')['confidence'], classifier.classify('有个建议')['confidence']
+            )
+
+    def test_remote_model_only_below_threshold(self):
+        local = classify_service.classify_issue('数学课程太难', '考试经常挂科')
+        self.assertEqual((local['category'], local['source']), ('学业', 'local'))
+        self.create.assert_not_called()
+
+        remote = classify_service.classify_issue('有个想法想说一下')
+        self.assertEqual(remote['category'], '其他')
+        self.assertIn('usage', remote)
+        self.assertEqual(self.create.call_count, 1)
+
+
+class TopicModelTest(TestCase):
+    """离线分类模型测试类"""
+
+    PHRASES = {
+        '学业': ['高数课听不懂', '期末周复习资料', '实验报告太多', '老师讲课太快'],
+        '生活': ['楼道灯坏了', '外卖柜不够用', '洗衣机经常坏', '晚上太吵睡不着'],
+        '管理': ['盖章要跑三个部门', '学费发票开不出来', '评优名额不公开', '请假审批太慢'],
+    }
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'model.bin')
+        self.addCleanup(topic_model.reset)
+        for name, phrases in self.PHRASES.items():
+            topic = Topic.objects.create(name=name)
+            for i in range(10):
+                Issue.objects.create(
+                    title=phrases[i % len(phrases)], description=f'{phrases[(i + 1) % len(phrases)]}，第{i}次反馈',
+                    topic=topic, date=datetime.date.today(),
+                )
+
+    def train(self):
+        output = StringIO()
+        call_command('train_classifier', output=self.path, min_samples=10, stdout=output)
+        return output.getvalue()
+
+    def test_train_and_load(self):
+        report = self.train()
+        self.assertIn('_fallback_classify', report)
+        self.assertIn('CLASSIFY_KEYWORD_SHARPNESS', report)
+        model = TopicModel.load(self.path)
+        self.assertEqual(model.predict('洗衣机又坏了')['category'], '生活')
+        self.assertEqual(model.predict('盖章流程')['category'], '管理')
+        # 内存中训练的模型与 mmap 读取的模型结果一致
+        trained = TopicModel.train([('高数课听不懂', '学业'), ('楼道灯坏了', '生活')], ['学业', '生活'], buckets=1024)
+        trained.save(self.path)
+        loaded = TopicModel.load(self.path)
+        for text in ('高数课', '灯坏了'):
+            self.assertAlmostEqual(trained.predict(text)['confidence'], loaded.predict(text)['confidence'], places=4)
+
+    @override_settings(CLASSIFY_LOCAL_CONFIDENCE_THRESHOLD=2, CLASSIFY_MODEL_CONFIDENCE_THRESHOLD=0.5)
+    def test_classify_uses_trained_model(self):
+        with override_settings(CLASSIFY_MODEL_PATH=self.path):
+            self.train()
+            classification_cache.clear()
+            with mock.patch.object(classify_service, 'client') as client:
+                result = classify_service.classify_issue('请假审批太慢了')
+            client.chat.completions.create.assert_not_called()
+        self.assertEqual((result['category'], result['source']), ('管理', 'model'))
+
+
+class BatchClassifyTest(TestCase):
+    """批量分类测试类"""
+
+    def setUp(self):
+        classification_cache.clear()
+        patcher = mock.patch.object(classify_service, 'client')
+        self.create = patcher.start().chat.completions.create
+        self.addCleanup(patcher.stop)
+        self.create.return_value = fake_completion('管理', 0.9)
+
+    def test_dedup_and_local_first(self):
+        results = classify_service.classify_batch([
+            ('宿舍热水不够', '晚上洗澡没有热水'),
+            ('有个想法想说一下', ''),
+            ('有个想法，想说一下！', ''),
+            ('', ''),
+        ])
+        self.assertEqual([r['category'] for r in results[:3]], ['生活', '管理', '管理'])
+        self.assertFalse(results[3]['success'])
+        # 只有去重后无法本地分类的一条调用了远程模型
+        self.assertEqual(self.create.call_count, 1)
+
+    def test_command_writes_topics(self):
+        life = Topic.objects.create(name='生活')
+        issues = [
+            Issue.objects.create(title=title, description='', date=datetime.date.today())
+            for title in ('食堂饭菜太贵', '有个想法想说一下', '有个想法想说一下')
+        ]
+        call_command('classify_issues', batch_size=2, stdout=StringIO())
+        topics = [Issue.objects.get(pk=issue.pk).topic.name for issue in issues]
+        self.assertEqual(topics, ['生活', '管理', '管理'])
+        self.assertEqual(self.create.call_count, 1)
+        self.assertEqual(Topic.objects.get(name='生活'), life)
+
+    def test_batch_endpoint_requires_admin(self):
+        client = APIClient()
+        payload = {'issues': [{'title': '食堂饭菜太贵'}]}
+        self.assertEqual(client.post('/feedback/classify/batch/', payload, format='json').status_code, 401)
+        admin = User.objects.create(username='admin')
+        admin.roles.add(Role.objects.create(name='super_admin'))
+        client.force_authenticate(admin)
+        response = client.post('/feedback/classify/batch/', payload, format='json')
+        self.assertEqual(response.data['results'][0]['category'], '生活')
+
+
+class FakeAsyncClient:
+    """模拟 AsyncOpenAI：按顺序返回结果或抛出异常，可设置延迟"""
+
+    def __init__(self, delay=0, error=None, category='管理'):
+        self.calls = 0
+        self.requests = []
+        self.delay = delay
+        self.error = error
+        self.category = category
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    closed = False
+
+    async def close(self):
+        self.closed = True
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.requests.append(kwargs)
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return fake_completion(self.category, 0.9)
+
+
+@override_settings(OPENAI_API_KEY='test-key', CLASSIFY_LOCAL_CONFIDENCE_THRESHOLD=2)
+class AsyncLLMTest(TestCase):
+    """异步视图、截止时间和熔断器测试类"""
+
+    def setUp(self):
+        classification_cache.clear()
+        answer_cache.invalidate()
+        llm_client.breaker.reset()
+        self.addCleanup(llm_client.breaker.reset)
+
+    def use_client(self, fake):
+        llm_client._loop_state.clear()
+        patcher = mock.patch.object(llm_client, '_create_client', return_value=fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return fake
+
+    async def post(self, path, payload):
+        return await self.async_client.post(path, payload, content_type='application/json')
+
+    async def test_classify_view_uses_async_client(self):
+        fake = self.use_client(FakeAsyncClient())
+        response = await self.post('/feedback/classify/', {'title': '有个想法想说一下'})
+        self.assertEqual(response.json()['category'], '管理')
+        self.assertEqual(fake.calls, 1)
+
+    @override_settings(LLM_CLASSIFY_DEADLINE_SECONDS=0.05)
+    async def test_deadline_falls_back_to_keywords(self):
+        self.use_client(FakeAsyncClient(delay=5))
+        started = time.monotonic()
+        response = await self.post('/feedback/classify/', {'title': '食堂饭菜太贵'})
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response.json()['category'], '生活')
+        self.assertIn('warning', response.json())
+
+    async def test_breaker_fails_fast(self):
+        fake = self.use_client(FakeAsyncClient(error=RuntimeError('upstream 502')))
+        for _ in range(llm_client.breaker.failure_threshold):
+            await self.post('/feedback/chat/', {'message': '怎么提交问题'})
+        self.assertEqual(llm_client.breaker.state, 'open')
+
+        response = await self.post('/feedback/chat/', {'message': '怎么提交问题'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(fake.calls, llm_client.breaker.failure_threshold)
+
+    def test_client_closed_with_event_loop(self):
+        """每个请求的临时事件循环（WSGI 下的 async_to_sync）结束时关闭并移除其客户端"""
+        for _ in range(2):
+            fake = self.use_client(FakeAsyncClient())
+            asyncio.run(llm_client.chat_completion(time.monotonic() + 5, model='test', messages=[]))
+            self.assertTrue(fake.closed)
+            self.assertEqual(llm_client._loop_state, {})
+
+    def test_concurrency_limit_shared_across_loops(self):
+        """并发名额由整个进程共享，不随事件循环重建"""
+        self.use_client(FakeAsyncClient())
+        with mock.patch.object(llm_client, '_limiter', threading.BoundedSemaphore(1)):
+            llm_client.limiter.acquire()  # 另一个事件循环中正在进行的请求
+            with self.assertRaisesMessage(UpstreamUnavailable, 'too many concurrent requests'):
+                asyncio.run(llm_client.chat_completion(time.monotonic() + 0.05, model='test', messages=[]))
+            llm_client.limiter.release()
+            asyncio.run(llm_client.chat_completion(time.monotonic() + 5, model='test', messages=[]))
+
+    async def test_chat_validation(self):
+        self.use_client(FakeAsyncClient())
+        response = await self.post('/feedback/chat/', {'message': ''})
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.post('/feedback/chat/', 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    async def test_chat_stream(self):
+        chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+            for text in ('您好，', '请点击', '提交问题')
+        ] + [SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=10, completion_tokens=6, total_tokens=16))]
+
+        class FakeStream:
+            closed = False
+
+            def __aiter__(self):
+                return self.iterate()
+
+            async def iterate(self):
+                for chunk in chunks:
+                    yield chunk
+
+            async def close(self):
+                self.closed = True
+
+        stream = FakeStream()
+
+        async def create(**kwargs):
+            self.assertTrue(kwargs['stream'])
+            return stream
+
+        self.use_client(SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+        response = await self.post('/feedback/chat/stream/', {'message': '怎么提交问题'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = [
+            dict(line.split(': ', 1) for line in chunk.decode().strip().split('\n'))
+            async for chunk in response.streaming_content
+        ]
+        self.assertEqual(
+            ''.join(json.loads(e['data'])['content'] for e in events if e['event'] == 'delta'), '您好，请点击提交问题'
+        )
+        self.assertEqual(events[-1]['event'], 'done')
+        self.assertEqual(json.loads(events[-1]['data'])['usage']['total_tokens'], 16)
+        session = await ChatSession.objects.aget(pk=json.loads(events[-1]['data'])['session_id'])
+        self.assertEqual(session.messages[-1]['content'], '您好，请点击提交问题')
+        self.assertTrue(stream.closed)
+
+        # 输入校验与非流式接口一致
+        response = await self.post('/feedback/chat/stream/', {'message': 'x' * 1001})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(CHAT_HISTORY_TOKEN_BUDGET=200, CHAT_SUMMARY_MAX_TOKENS=100)
+    async def test_chat_session_window_and_summary(self):
+        fake = self.use_client(FakeAsyncClient())
+        response = await self.post('/feedback/chat/', {'message': '怎么提交问题'})
+        session_id = response.json()['session_id']
+
+        # 历史由服务端提供，客户端发送的 history 被忽略
+        response = await self.post('/feedback/chat/', {
+            'message': '提交后多久处理', 'session_id': session_id, 'history': [{'role': 'user', 'content': '伪造'}]
+        })
+        self.assertEqual(response.json()['session_id'], session_id)
+        sent = fake.requests[-1]['messages']
+        self.assertEqual([m['role'] for m in sent], ['system', 'user', 'assistant', 'user'])
+        self.assertEqual(sent[1]['content'], '怎么提交问题')
+
+        for i in range(6):
+            await self.post('/feedback/chat/', {'message': f'第{i}个问题：' + '宿舍热水' * 20, 'session_id': session_id})
+        session = await ChatSession.objects.aget(pk=session_id)
+        self.assertEqual(session.turns, 8)
+        self.assertTrue(session.summary)
+        self.assertLessEqual(message_tokens(session.messages), 200)
+
+        # 再次请求时最早的轮次只以摘要形式出现，请求大小有上限
+        await self.post('/feedback/chat/', {'message': '还有别的办法吗', 'session_id': session_id})
+        sent = fake.requests[-1]['messages']
+        self.assertTrue(sent[1]['content'].startswith('此前对话的摘要'))
+        self.assertLessEqual(message_tokens(sent[1:-1]), 100 + 200 + 8)
+
+        # 无效的会话ID会得到新会话
+        response = await self.post('/feedback/chat/', {'message': '你好', 'session_id': 'not-a-uuid'})
+        self.assertNotEqual(response.json()['session_id'], session_id)
+
+    @override_settings(CHAT_ANSWER_CACHE_SIZE=1)
+    async def test_answer_cache(self):
+        fake = self.use_client(FakeAsyncClient())
+        await ChatAnswer.objects.acreate(question='“已处理”是什么意思', answer='管理员已处理您的问题。', pinned=True)
+        user = await User.objects.acreate(username='student')
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+        async def post_as_user(payload):
+            return await self.async_client.post(
+                '/feedback/chat/', payload, content_type='application/json', headers=headers
+            )
+
+        # 匿名提问的回答不会被记录
+        await self.post('/feedback/chat/', {'message': '怎么提交问题'})
+        self.assertFalse(await ChatAnswer.objects.filter(pinned=False).aexists())
+
+        # 登录用户提问的回答进入待审核队列（上限 1 条），审核通过前不会返回
+        await post_as_user({'message': '怎么提交问题'})
+        self.assertEqual(fake.calls, 2)
+        await post_as_user({'message': '请问如何提交问题？'})
+        self.assertEqual(fake.calls, 3)
+
+        # 审核通过后，换一种问法仍命中缓存，不调用模型
+        entry = await ChatAnswer.objects.aget(pinned=False)
+        self.assertEqual(entry.question, '请问如何提交问题？')
+        entry.approved = True
+        await entry.asave()
+        response = await self.post('/feedback/chat/', {'message': '怎么提交问题'})
+        self.assertEqual(fake.calls, 3)
+        self.assertEqual(response.json()['usage']['total_tokens'], 0)
+
+        # 置顶的常见问题命中；只差一个字、含义不同的问题不命中
+        response = await self.post('/feedback/chat/', {'message': '已处理是什么意思'})
+        self.assertEqual(response.json()['message'], '管理员已处理您的问题。')
+        self.assertEqual(fake.calls, 3)
+        await post_as_user({'message': '未处理是什么意思'})
+        self.assertEqual(fake.calls, 4)
+
+        # 同一会话中的后续问题依赖上下文，不查缓存
+        await self.post('/feedback/chat/', {'message': '怎么提交问题', 'session_id': response.json()['session_id']})
+        self.assertEqual(fake.calls, 5)
+
+        # 待审核的条目超出上限时淘汰最早的，置顶和审核通过的条目保留
+        await post_as_user({'message': '问题被驳回了怎么办'})
+        questions = [question async for question in ChatAnswer.objects.values_list('question', flat=True)]
+        self.assertCountEqual(questions, ['“已处理”是什么意思', '请问如何提交问题？', '问题被驳回了怎么办'])
+
+    @override_settings(OPENAI_API_KEY=None)
+    def test_cached_answer_without_api_key(self):
+        """未配置 API 密钥时仍返回置顶的常见问题"""
+        ChatAnswer.objects.create(question='怎么提交问题', answer='点击“提交问题”按钮。', pinned=True)
+        result = chat_service.get_response('请问如何提交问题？')
+        self.assertTrue(result['cached'])
+        self.assertFalse(chat_service.get_response('未处理是什么意思')['success'])
+
+    def test_breaker_half_open_probe(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        # 冷却时间为 0，立即进入半开状态，只放行一个探测请求
+        self.assertEqual(breaker.state, 'half-open')
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+
+class ServiceRegistryTest(TestCase):
+    """服务注册表测试类"""
+
+    def setUp(self):
+        # 测试中修改了 API 密钥，结束后丢弃共享客户端
+        services.reset('openai')
+        self.addCleanup(services.reset, 'openai')
+
+    def test_lazy_creation_and_warmup(self):
+        """第一次访问时才创建，并发访问只创建一次；预热在后台完成，失败不影响其他服务"""
+        registry = ServiceRegistry()
+        created = []
+
+        def factory():
+            time.sleep(0.05)
+            created.append(SimpleNamespace(name='svc'))
+            return created[-1]
+
+        registry.register('svc', factory)
+        proxy = registry.lazy('svc')
+        self.assertEqual(created, [])
+        threads = [threading.Thread(target=lambda: proxy.name) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(created), 1)
+        proxy.name = 'changed'
+        self.assertEqual(registry.get('svc').name, 'changed')
+
+        registry.reset()
+        registry.register('broken', lambda: 1 / 0)
+        with self.assertLogs('feedback.service_registry', level='ERROR'):
+            registry.warmup(['broken', 'svc']).join()
+        self.assertTrue(registry.loaded('svc'))
+        self.assertFalse(registry.loaded('broken'))
+        with override_settings(SERVICE_WARMUP=False):
+            self.assertIsNone(registry.warmup())
+
+    @override_settings(OPENAI_API_KEY=None)
+    def test_without_api_key(self):
+        """未配置 API 密钥时分类回退到关键词匹配，客服返回未配置的提示"""
+        classification_cache.clear()
+        with override_settings(CLASSIFY_LOCAL_CONFIDENCE_THRESHOLD=2):
+            result = classify_service.classify_issue('有个想法想说一下')
+        self.assertFalse(result['success'])
+        self.assertEqual(result['category'], keyword_classifier.classify('有个想法想说一下')['category'])
+        self.assertFalse(chat_service.get_response('你好')['success'])
+
+    @override_settings(OPENAI_API_KEY='test-key')
+    def test_shared_client(self):
+        """两个服务共用同一个 OpenAI 客户端"""
+        self.assertIsNotNone(classify_service.client)
+        self.assertIs(classify_service.client, chat_service.client)
+
+    def test_startup_does_not_import_sdk(self):
+        """加载 URL 配置（导入所有视图和服务）时不导入 OpenAI SDK，未配置 API 密钥也不会失败"""
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'backend.settings', 'OPENAI_API_KEY': ''}
+        script = (
+            "import sys, django; django.setup(); import backend.urls; "
+            "print('openai' in sys.modules)"
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', script], env=env, capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout
+        self.assertEqual(output.strip().splitlines()[-1], 'False')
+
@@ -0,0 +1,97 @@
+"""
+浏览量/点赞量写回缓冲测试
+"""
+
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .counters import CacheCounterBackend, counter_buffer
+from .models import Issue, Topic
+
+User = get_user_model()
+
+
+@override_settings(ISSUE_COUNTER_FLUSH_INTERVAL=0)
+class IssueCounterBufferTest(TestCase):
+    """写回缓冲测试类"""
+
+    def setUp(self):
+        topic = Topic.objects.create(name='生活')
+        self.issues = [
+            Issue.objects.create(title=f'问题{i}', topic=topic, date=datetime.date.today(), description='描述')
+            for i in range(3)
+        ]
+        self.user = User.objects.create_user(username='student', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        counter_buffer.backend.drain()
+
+    def test_view_is_buffered_and_merged_on_read(self):
+        """浏览请求不写数据库，读取时叠加未写回的增量"""
+        issue = self.issues[0]
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                response = self.client.post(f'/feedback/issues/{issue.pk}/view/')
+        self.assertFalse(any(q['sql'].startswith('UPDATE') for q in queries))
+        self.assertEqual(response.data, {'views': 3, 'popularity': 3})
+
+        issue.refresh_from_db()
+        self.assertEqual(issue.views, 0)
+        detail = self.client.get(f'/feedback/issues/{issue.pk}/')
+        self.assertEqual(detail.data['views'], 3)
+        listing = self.client.get('/feedback/issues/')
+        self.assertEqual({row['id']: row['views'] for row in listing.data}[issue.pk], 3)
+
+    def test_flush_coalesces_deltas(self):
+        """相同增量的问题合并为一条UPDATE，并同时重算热度值"""
+        for issue in self.issues:
+            counter_buffer.add(issue.pk, views=2)
+            counter_buffer.add(issue.pk, likes=1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(counter_buffer.flush(), 3)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 1)
+
+        for issue in self.issues:
+            issue.refresh_from_db()
+            self.assertEqual((issue.views, issue.likes, issue.popularity), (2, 1, 4))
+        self.assertEqual(counter_buffer.pending([i.pk for i in self.issues]), {})
+
+
+@override_settings(
+    ISSUE_COUNTER_FLUSH_INTERVAL=0,
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'counters': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'counters'},
+    },
+)
+class CacheCounterBackendTest(TestCase):
+    """共享缓存增量存储测试类"""
+
+    def setUp(self):
+        # 两个实例共用同一个缓存，模拟两个工作进程
+        self.first = CacheCounterBackend('counters')
+        self.second = CacheCounterBackend('counters')
+        self.first.cache.clear()
+
+    def test_other_process_drains_deltas(self):
+        """一个进程累加的增量可由另一个进程取出，且只取出一次"""
+        self.first.add(1, 2, 1)
+        self.first.add(2, 1, 0)
+        self.assertEqual(self.second.drain(), {1: (2, 1), 2: (1, 0)})
+        self.assertEqual(self.first.drain(), {})
+        self.assertEqual(self.first.get_many([1, 2]), {1: (0, 0), 2: (0, 0)})
+
+    def test_deltas_after_drain_are_kept(self):
+        """取出之后新增的增量留到下一轮"""
+        self.first.add(1, 1, 0)
+        self.second.drain()
+        self.first.add(1, 3, 1)
+        self.assertEqual(self.second.drain(), {1: (3, 1)})
+        self.assertEqual(self.first.get_many([1]), {1: (0, 0)})
@@ -0,0 +1,116 @@
+"""
+重复问题检测测试
+"""
+
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .duplicate_index import DuplicateIndex, duplicate_index, overlap, minhash, pack, unpack
+from .models import Issue, IssueSignature, Topic
+
+User = get_user_model()
+
+
+class DuplicateIndexTest(TestCase):
+    """重复问题检测测试类"""
+
+    def setUp(self):
+        cache.clear()
+        self.topic = Topic.objects.create(name='生活')
+        self.student = User.objects.create_user(username='student', password='pass12345')
+        self.client = APIClient()
+
+    def create_issue(self, title, description='描述', **fields):
+        return Issue.objects.create(
+            host=self.student, title=title, topic=self.topic, date=datetime.date.today(),
+            description=description, **fields,
+        )
+
+    def similar_ids(self, title, description=''):
+        response = self.client.get('/feedback/issues/similar/', {'title': title, 'description': description})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_signature(self):
+        """签名可以序列化；字数差别较大的同一问题按重合系数打分"""
+        signature = minhash('宿舍没有热水')
+        self.assertEqual(unpack(pack(signature)), signature)
+        self.assertEqual(signature[0], 5)
+        self.assertEqual(overlap(signature, signature), 1.0)
+        self.assertGreater(overlap(minhash('宿舍空调坏了没人修'), minhash('空调坏了')), 0.6)
+        self.assertIsNone(minhash('！？'))
+
+    def test_find_similar(self):
+        """找到说法不同的同一问题，已解决和不公开的问题不出现"""
+        duplicate = self.create_issue('宿舍空调坏了没人修', description='三楼的空调一直不制冷')
+        self.create_issue('图书馆自习座位太少')
+        self.create_issue('空调坏了', status='已解决')
+        self.create_issue('空调坏了怎么办', is_public=False)
+
+        response = self.client.get('/feedback/issues/similar/', {'title': '空调坏了'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['results']], [duplicate.pk])
+        result = response.data['results'][0]
+        self.assertEqual(result['title'], '宿舍空调坏了没人修')
+        self.assertEqual(result['status'], duplicate.status)
+        self.assertGreaterEqual(result['similarity'], 0.4)
+
+        self.assertEqual(self.similar_ids('食堂饭菜太贵'), [])
+        self.assertEqual(self.similar_ids('  '), [])
+        # 太短的输入不做检测
+        self.assertEqual(self.similar_ids('空调'), [])
+
+    def test_index_follows_changes(self):
+        """新增、修改、解决和删除通过信号同步；其他进程按版本号重新加载"""
+        issue = self.create_issue('洗衣机坏了')
+        other_process = DuplicateIndex()
+        self.assertEqual([issue_id for issue_id, _ in other_process.find_similar('宿舍楼洗衣机坏了')], [issue.pk])
+        self.assertTrue(IssueSignature.objects.filter(issue=issue).exists())
+
+        issue.title = '快递站排队太久'
+        issue.save()
+        self.assertEqual(self.similar_ids('宿舍楼洗衣机坏了'), [])
+        self.assertEqual(other_process.find_similar('宿舍楼洗衣机坏了'), [])
+        self.assertEqual(self.similar_ids('快递站排队时间太长'), [issue.pk])
+
+        issue.status = '已解决'
+        issue.save()
+        self.assertEqual(self.similar_ids('快递站排队时间太长'), [])
+        issue.status = '处理中'
+        issue.save()
+        self.assertEqual(other_process.find_similar('快递站排队时间太长')[0][0], issue.pk)
+
+        issue.delete()
+        self.assertEqual(self.similar_ids('快递站排队时间太长'), [])
+        self.assertFalse(IssueSignature.objects.exists())
+
+    def test_unrelated_save_keeps_version(self):
+        """只修改与检测无关的字段时不换版本号，其他进程不重新加载"""
+        issue = self.create_issue('洗衣机坏了')
+        duplicate_index.find_similar('洗衣机坏了')
+        version = cache.get(DuplicateIndex.version_key)
+        issue.views = 10
+        issue.save()
+        issue.refresh_from_db()
+        issue.likes = 3
+        issue.save()
+        self.assertEqual(cache.get(DuplicateIndex.version_key), version)
+        issue.description = '三楼的洗衣机不能脱水'
+        issue.save()
+        self.assertNotEqual(cache.get(DuplicateIndex.version_key), version)
+
+    def test_rebuild(self):
+        """不触发信号的批量更新在重新计算签名后生效"""
+        issue = self.create_issue('校园网经常断网')
+        duplicate_index.find_similar('校园网经常断网')
+        Issue.objects.filter(pk=issue.pk).update(title='食堂饭菜价格太贵')
+        IssueSignature.objects.all().delete()
+        call_command('rebuild_issue_signatures', stdout=StringIO())
+        self.assertEqual(self.similar_ids('食堂的饭菜太贵了'), [issue.pk])
+        self.assertEqual(self.similar_ids('校园网经常断网'), [])
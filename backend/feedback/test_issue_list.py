@@ -0,0 +1,66 @@
+"""
+问题列表查询数测试
+"""
+
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import Role
+from .models import Favorite, Issue, Message, Reply, Topic
+
+User = get_user_model()
+
+
+class IssueListQueryCountTest(TestCase):
+    """列表接口查询数不随问题数和评论数增长"""
+
+    def create_issues(self, count):
+        for _ in range(count):
+            issue = Issue.objects.create(
+                host=self.student, title='宿舍热水', topic=self.topic,
+                date=datetime.date.today(), description='没有热水',
+            )
+            Message.objects.create(user=self.student, issue=issue, body='同问')
+            Message.objects.create(user=self.admin, issue=issue, body='收到')
+            Reply.objects.create(administrator=self.admin, issue=issue, content='已处理')
+            Favorite.objects.create(user=self.student, issue=issue)
+
+    def setUp(self):
+        self.topic = Topic.objects.create(name='生活')
+        self.student = User.objects.create_user(username='student', password='pass12345')
+        self.admin = User.objects.create_user(username='admin', password='pass12345')
+        self.admin.roles.add(Role.objects.create(name='super_admin'))
+        self.client = APIClient()
+
+    def assertConstantQueries(self, url, user):
+        self.client.force_authenticate(user)
+        self.create_issues(2)
+        # 预热进程内缓存（如管理员路由索引）
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        self.create_issues(10)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+        self.assertEqual(len(small), len(large))
+        return response
+
+    def test_issue_list(self):
+        response = self.assertConstantQueries('/feedback/issues/', self.student)
+        first = response.data[0]
+        self.assertEqual(first['message_count'], 2)
+        self.assertEqual(first['reply_count'], 1)
+        self.assertTrue(first['is_favorited'])
+        self.assertNotIn('replies', first)
+
+    def test_admin_issue_list(self):
+        response = self.assertConstantQueries('/api/admin/issues/', self.admin)
+        first = response.data[0]
+        self.assertEqual(first['reply_count'], 1)
+        self.assertEqual(first['replies'][0]['administrator_name'], 'admin')
+        self.assertFalse(first['is_favorited'])
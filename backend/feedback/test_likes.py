@@ -0,0 +1,66 @@
+"""
+点赞原子切换测试
+"""
+
+import datetime
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase
+
+from .like_service import LikeService
+from .models import Issue, IssueLike, Topic
+
+User = get_user_model()
+
+
+class LikeToggleTest(TransactionTestCase):
+    """点赞切换测试类"""
+
+    def setUp(self):
+        topic = Topic.objects.create(name='生活')
+        self.issue = Issue.objects.create(
+            title='宿舍热水', topic=topic, date=datetime.date.today(), description='没有热水', views=3,
+        )
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass12345') for i in range(8)]
+
+    def test_toggle_returns_new_counts(self):
+        """点赞/取消点赞返回最新的点赞数和热度值"""
+        self.assertEqual(LikeService.toggle(self.users[0], self.issue)[:4], (True, 1, 3, 5))
+        self.assertEqual(LikeService.toggle(self.users[1], self.issue)[:4], (True, 2, 3, 7))
+        self.assertEqual(LikeService.toggle(self.users[0], self.issue)[:4], (False, 1, 3, 5))
+
+    def test_concurrent_toggles_keep_counts_exact(self):
+        """多个线程同时对同一问题反复点赞/取消，最终点赞数与点赞记录一致"""
+        rounds = 9
+        errors = []
+
+        def worker(user):
+            try:
+                for _ in range(rounds):
+                    while True:
+                        try:
+                            LikeService.toggle(user, self.issue)
+                            break
+                        except OperationalError:
+                            # SQLite 写锁冲突时整个事务已回滚，稍后重试即可
+                            time.sleep(0.001)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.issue.refresh_from_db()
+        # 每个用户切换奇数次，最终都处于已点赞状态
+        self.assertEqual(IssueLike.objects.filter(issue=self.issue).count(), len(self.users))
+        self.assertEqual(self.issue.likes, len(self.users))
+        self.assertEqual(self.issue.popularity, Issue.popularity_of(likes=len(self.users), views=3))
@@ -0,0 +1,386 @@
+"""
+通知服务测试
+"""
+
+import datetime
+import json
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import authenticate_stream_ticket, issue_stream_ticket
+from api.models import Role
+from .admin_routing import admin_routing
+from .notification_hub import notification_hub
+from .models import Issue, IssueParticipant, Message, Notification, NotificationOutbox, Topic, UnreadCounter
+from .notification_service import NotificationService
+from .outbox import OutboxDispatcher, enqueue_new_comment
+from .unread_counters import UnreadCounterService
+
+User = get_user_model()
+
+
+@override_settings(NOTIFICATION_DISPATCH_MODE='outbox')
+class CommentFanOutTest(TestCase):
+    """评论通知扇出测试类"""
+
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', password='pass12345')
+        self.issue = Issue.objects.create(
+            host=self.host, title='宿舍热水', topic=Topic.objects.create(name='生活'),
+            date=datetime.date.today(), description='没有热水',
+        )
+        self.client = APIClient()
+
+    def add_commenters(self, count, offset=0):
+        users = []
+        for i in range(offset, offset + count):
+            user = User.objects.create(username=f'commenter{i}')
+            Message.objects.create(user=user, issue=self.issue, body='同问')
+            users.append(user)
+        return users
+
+    def post_comment(self, user):
+        """发布评论，返回发件箱处理该评论通知所用的查询数"""
+        self.client.force_authenticate(user)
+        response = self.client.post(f'/feedback/issues/{self.issue.pk}/messages/', {'body': '还是没有热水'})
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Notification.objects.filter(sender=user).exists())
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(OutboxDispatcher(workers=1).run_once(), (1, 0))
+        return len(queries)
+
+    def test_participants_follow_messages(self):
+        """参与者集合随评论的创建和删除更新"""
+        user = self.add_commenters(1)[0]
+        second = Message.objects.create(user=user, issue=self.issue, body='再问')
+        self.assertEqual(IssueParticipant.objects.filter(issue=self.issue).count(), 1)
+        second.delete()
+        self.assertTrue(IssueParticipant.objects.filter(issue=self.issue, user=user).exists())
+        Message.objects.filter(user=user).get().delete()
+        self.assertFalse(IssueParticipant.objects.filter(issue=self.issue, user=user).exists())
+
+    def test_comment_fan_out_constant_queries(self):
+        """评论通知的查询数与参与人数无关"""
+        self.add_commenters(3)
+        small = self.post_comment(self.add_commenters(1, offset=100)[0])
+        self.add_commenters(30, offset=3)
+        large = self.post_comment(self.add_commenters(1, offset=200)[0])
+        self.assertEqual(small, large)
+
+        latest = Message.objects.order_by('-id').first()
+        recipients = set(Notification.objects.filter(
+            notification_type='new_comment', sender=latest.user
+        ).values_list('recipient__username', flat=True))
+        # 发布者 + 全部其他评论者，不包含评论者本人
+        self.assertEqual(len(recipients), 1 + 34)
+        self.assertIn('host', recipients)
+        self.assertNotIn(latest.user.username, recipients)
+
+
+class AdminRoutingTest(TestCase):
+    """新问题通知路由测试类"""
+
+    def setUp(self):
+        admin_routing.invalidate()
+        self.life = Topic.objects.create(name='生活')
+        self.study = Topic.objects.create(name='学业')
+        self.super_admin = User.objects.create(username='admin')
+        self.super_admin.roles.add(Role.objects.create(name='super_admin'))
+        self.life_admin = User.objects.create(username='life_admin')
+        self.life_role = Role.objects.create(name='生活_admin', topic='生活')
+        self.life_admin.roles.add(self.life_role)
+        self.student = User.objects.create(username='student')
+        self.student.roles.add(Role.objects.create(name='student'))
+
+    def create_issue(self, topic):
+        issue = Issue.objects.create(
+            host=self.student, title='问题', topic=topic, date=datetime.date.today(), description='描述'
+        )
+        NotificationService.notify_new_issue_to_admins(issue)
+        return set(Notification.objects.filter(issue=issue).values_list('recipient__username', flat=True))
+
+    def test_routing_by_topic(self):
+        self.assertEqual(self.create_issue(self.life), {'admin', 'life_admin'})
+        self.assertEqual(self.create_issue(self.study), {'admin'})
+
+    def test_role_changes_invalidate_index(self):
+        self.create_issue(self.life)
+        self.life_admin.roles.remove(self.life_role)
+        self.assertEqual(self.create_issue(self.life), {'admin'})
+        self.life_role.topic = '学业'
+        self.life_role.save()
+        self.life_admin.roles.add(self.life_role)
+        self.assertEqual(self.create_issue(self.study), {'admin', 'life_admin'})
+
+    def test_admin_views_filter_by_topic(self):
+        self.create_issue(self.life)
+        self.create_issue(self.study)
+        client = APIClient()
+        client.force_authenticate(self.life_admin)
+        response = client.get('/api/admin/issues/')
+        self.assertEqual({row['topic'] for row in response.data}, {'生活'})
+        response = client.get('/feedback/notifications/', {'admin_filter': 'true'})
+        self.assertEqual(len(response.data), 1)
+
+    def test_revoked_topic_not_authorized_with_stale_index(self):
+        """其他进程中的路由索引尚未失效时，撤销的分类也立即失去权限（不触发信号的修改模拟其他进程）"""
+        issue = Issue.objects.create(
+            host=self.student, title='问题', topic=self.life, date=datetime.date.today(), description='描述'
+        )
+        client = APIClient()
+        client.force_authenticate(self.life_admin)
+        self.assertEqual(len(client.get('/api/admin/issues/').data), 1)
+        Role.objects.filter(pk=self.life_role.pk).update(topic='学业')
+        self.assertEqual(admin_routing.topics_for_admin(self.life_admin.id), {self.life.id})
+        self.assertEqual(client.get('/api/admin/issues/').data, [])
+        response = client.post(f'/api/admin/issues/{issue.pk}/reply/', {'content': '收到'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_authorization_queries_per_request(self):
+        """管理员请求中的权限类和视图共用授权上下文，角色只查询一次；角色撤销后下一个请求即生效"""
+        issue = Issue.objects.create(
+            host=self.student, title='问题', topic=self.life, date=datetime.date.today(), description='描述'
+        )
+        client = APIClient()
+        client.force_authenticate(self.life_admin)
+        admin_routing.get()
+        requests = [
+            lambda: client.get('/api/admin/issues/'),
+            lambda: client.post(f'/api/admin/issues/{issue.pk}/reply/', {'content': '收到'}),
+            lambda: client.get('/feedback/notifications/', {'admin_filter': 'true'}),
+            lambda: client.get('/feedback/notifications/unread-count/', {'admin_filter': 'true'}),
+            lambda: client.get('/feedback/classify/cache-stats/'),
+        ]
+        for request in requests:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertLess(request().status_code, 300)
+            role_queries = [query['sql'] for query in queries if '"api_role"' in query['sql']]
+            self.assertEqual(len(role_queries), 1, role_queries)
+
+        # 不按分类过滤时不需要角色
+        for params in [{}, {'is_read': 'false'}]:
+            for path in ['/feedback/notifications/', '/feedback/notifications/unread-count/']:
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(client.get(path, params).status_code, 200)
+                self.assertFalse([query for query in queries if '"api_role"' in query['sql']], path)
+
+        self.life_admin.roles.remove(self.life_role)
+        self.assertEqual(client.get('/api/admin/issues/').status_code, 403)
+
+
+@override_settings(NOTIFICATION_DISPATCH_MODE='outbox')
+class OutboxDispatcherTest(TestCase):
+    """通知发件箱测试类"""
+
+    def setUp(self):
+        self.host = User.objects.create(username='host')
+        self.commenter = User.objects.create(username='commenter')
+        self.issue = Issue.objects.create(
+            host=self.host, title='宿舍热水', topic=Topic.objects.create(name='生活'),
+            date=datetime.date.today(), description='没有热水',
+        )
+        self.message = Message.objects.create(user=self.commenter, issue=self.issue, body='同问')
+
+    def test_idempotency_key(self):
+        """相同幂等键的事件只记录一次"""
+        enqueue_new_comment(self.message)
+        enqueue_new_comment(self.message)
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+        OutboxDispatcher(workers=1).run_once()
+        self.assertEqual(Notification.objects.filter(recipient=self.host).count(), 1)
+        self.assertEqual(OutboxDispatcher.stats()['pending'], 0)
+
+    def test_relike_enqueues_again(self):
+        """取消后重新点赞是一次新的点赞，发件箱中记录新的事件"""
+        client = APIClient()
+        client.force_authenticate(self.commenter)
+        for _ in range(3):
+            client.post(f'/feedback/issues/{self.issue.pk}/like/')
+        self.assertEqual(NotificationOutbox.objects.filter(event_type='issue_liked').count(), 2)
+
+    def test_retry_and_fail(self):
+        """处理失败时退避重试，超过次数标记为失败"""
+        event = NotificationOutbox.objects.create(event_type='new_comment', payload={})
+        dispatcher = OutboxDispatcher(workers=1, max_attempts=2)
+        self.assertEqual(dispatcher.run_once(), (0, 1))
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('pending', 1))
+        self.assertIn('KeyError', event.last_error)
+
+        NotificationOutbox.objects.filter(pk=event.pk).update(available_at=event.created)
+        dispatcher.run_once()
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('failed', 2))
+        self.assertEqual(OutboxDispatcher.stats()['failed'], 1)
+
+    def test_reclaimed_event_not_committed_by_slow_worker(self):
+        """超时被回收的事件，原 worker 处理完成后既不生成通知，也不改写状态"""
+        enqueue_new_comment(self.message)
+        slow, fast = OutboxDispatcher(workers=1), OutboxDispatcher(workers=1)
+        event = slow.claim_batch()[0]
+        # 模拟超时回收后被另一个 worker 抢占
+        NotificationOutbox.objects.filter(pk=event.pk).update(status='pending', claimed_by='')
+        self.assertEqual([e.pk for e in fast.claim_batch()], [event.pk])
+
+        self.assertFalse(slow.process(event))
+        self.assertFalse(Notification.objects.exists())
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.claimed_by), ('processing', fast.worker_id))
+
+        self.assertTrue(fast.process(event))
+        self.assertEqual(Notification.objects.filter(recipient=self.host).count(), 1)
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'done')
+
+    def test_status_update_signal_enqueues(self):
+        """问题状态变化写入发件箱而不是直接生成通知"""
+        self.issue.status = '已处理'
+        self.issue.save()
+        self.assertFalse(Notification.objects.exists())
+        stats = OutboxDispatcher.stats()
+        self.assertEqual(stats['pending'], 1)
+        self.assertGreaterEqual(stats['lag_seconds'], 0)
+        OutboxDispatcher(workers=1).run_once()
+        self.assertTrue(Notification.objects.filter(recipient=self.host, notification_type='status_update').exists())
+
+
+class UnreadCounterTest(TestCase):
+    """未读计数测试类"""
+
+    def setUp(self):
+        admin_routing.invalidate()
+        self.life = Topic.objects.create(name='生活')
+        self.study = Topic.objects.create(name='学业')
+        self.admin = User.objects.create(username='life_admin')
+        self.admin.roles.add(Role.objects.create(name='生活_admin', topic='生活'))
+        self.issues = [
+            Issue.objects.create(title=f'问题{i}', topic=topic, date=datetime.date.today(), description='描述')
+            for i, topic in enumerate([self.life, self.life, self.study])
+        ]
+        for issue in self.issues:
+            NotificationService.create_notification(self.admin, 'system', '新问题', '描述', issue=issue)
+        NotificationService.create_notification(self.admin, 'system', '系统', '描述')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def unread(self, admin_filter=False):
+        response = self.client.get('/feedback/notifications/unread-count/', {'admin_filter': str(admin_filter).lower()})
+        return response.data['unread_count']
+
+    def test_counts_follow_reads(self):
+        """创建、标记已读、全部已读时计数与实际未读数一致"""
+        self.assertEqual((self.unread(), self.unread(admin_filter=True)), (4, 2))
+        life_ids = list(Notification.objects.filter(issue__topic=self.life).values_list('id', flat=True))
+        self.client.post('/feedback/notifications/mark-read/', {'notification_ids': life_ids}, format='json')
+        # 重复标记不会多扣
+        self.client.post('/feedback/notifications/mark-read/', {'notification_ids': life_ids}, format='json')
+        self.assertEqual((self.unread(), self.unread(admin_filter=True)), (2, 0))
+        self.client.post('/feedback/notifications/mark-all-read/')
+        self.assertEqual(self.unread(), 0)
+        self.assertEqual(UnreadCounterService.reconcile(), 0)
+
+    def test_unread_count_single_query(self):
+        """未读数接口只读取计数表"""
+        self.unread()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.unread(), 4)
+        self.assertEqual(len([q for q in queries if 'notification' in q['sql'].lower()]), 0)
+
+    def test_topic_change_and_delete(self):
+        """问题更换分类或删除时计数随之调整"""
+        self.issues[2].topic = self.life
+        self.issues[2].save()
+        self.assertEqual(self.unread(admin_filter=True), 3)
+        self.issues[0].delete()
+        self.assertEqual((self.unread(), self.unread(admin_filter=True)), (3, 2))
+        self.assertEqual(UnreadCounterService.reconcile(), 0)
+
+    def test_reconcile_repairs_drift(self):
+        UnreadCounter.objects.filter(user=self.admin).update(count=42)
+        Notification.objects.filter(issue__isnull=True).delete()
+        self.assertEqual(UnreadCounterService.reconcile(), 1)
+        self.assertEqual(self.unread(), 3)
+
+
+@override_settings(
+    NOTIFICATION_PUSH_MAX_CONNECTIONS=1,
+    NOTIFICATION_PUSH_HEARTBEAT_SECONDS=0.1,
+    NOTIFICATION_PUSH_CATCHUP_SECONDS=None,
+    NOTIFICATION_PUSH_MAX_SECONDS=0.5,
+)
+class NotificationStreamTest(TestCase):
+    """通知推送测试类"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='student')
+        self.first = NotificationService.create_notification(self.user, 'system', '通知一', '内容')
+        self.token = str(AccessToken.for_user(self.user))
+        self.ticket = issue_stream_ticket(self.user)
+
+    @staticmethod
+    def parse(chunk):
+        fields = dict(line.split(': ', 1) for line in chunk.decode().strip().split('\n'))
+        return fields.get('event'), json.loads(fields['data']) if 'data' in fields else None
+
+    async def test_stream_pushes_new_notifications(self):
+        response = await self.async_client.get('/feedback/notifications/stream/', {'ticket': self.ticket, 'since': 0})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        event, data = self.parse(await anext(stream))
+        self.assertEqual((event, data['id']), ('notification', self.first.pk))
+        self.assertEqual(self.parse(await anext(stream)), ('unread_count', {'unread_count': 1}))
+
+        # 超过单用户连接数上限
+        second = await self.async_client.get('/feedback/notifications/stream/', {'ticket': self.ticket})
+        self.assertEqual(second.status_code, 429)
+
+        created = await sync_to_async(NotificationService.create_notification)(self.user, 'system', '通知二', '内容')
+        notification_hub.publish([self.user.pk])
+        event, data = self.parse(await anext(stream))
+        self.assertEqual((event, data['id']), ('notification', created.pk))
+        self.assertEqual(self.parse(await anext(stream)), ('unread_count', {'unread_count': 2}))
+
+        # 空闲时只发心跳，到达最长时间后关闭并释放连接
+        rest = [chunk async for chunk in stream]
+        self.assertIn(b': heartbeat\n\n', rest)
+        self.assertEqual(notification_hub.connection_count(self.user.pk), 0)
+
+    async def test_stream_requires_token(self):
+        response = await self.async_client.get('/feedback/notifications/stream/')
+        self.assertEqual(response.status_code, 401)
+        # 访问令牌不能放在 URL 中
+        response = await self.async_client.get('/feedback/notifications/stream/', {'token': self.token})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_ticket(self):
+        """票据由登录用户获取，过期或令牌版本变化后失效"""
+        response = await self.async_client.post(
+            '/feedback/notifications/stream-ticket/', headers={'Authorization': f'Bearer {self.token}'}
+        )
+        ticket = response.json()['ticket']
+        self.assertEqual(await sync_to_async(authenticate_stream_ticket)(ticket), self.user)
+        self.assertIsNone(await sync_to_async(authenticate_stream_ticket)(self.token))
+        with override_settings(STREAM_TICKET_SECONDS=-1):
+            self.assertIsNone(await sync_to_async(authenticate_stream_ticket)(ticket))
+        await User.objects.filter(pk=self.user.pk).aupdate(token_version=F('token_version') + 1)
+        self.assertIsNone(await sync_to_async(authenticate_stream_ticket)(ticket))
+
+    async def test_unstarted_stream_does_not_subscribe(self):
+        """客户端在响应开始前断开时不留下订阅"""
+        response = await self.async_client.get('/feedback/notifications/stream/', {'ticket': self.ticket})
+        self.assertEqual(notification_hub.connection_count(self.user.pk), 0)
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        await anext(stream)
+        self.assertEqual(notification_hub.connection_count(self.user.pk), 1)
+        [chunk async for chunk in stream]
+        self.assertEqual(notification_hub.connection_count(self.user.pk), 0)
@@ -0,0 +1,71 @@
+"""
+问题列表游标分页测试
+"""
+
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Issue, Topic
+
+
+class IssueCursorPaginationTest(TestCase):
+    """游标分页测试类"""
+
+    def setUp(self):
+        self.client = APIClient()
+        topic = Topic.objects.create(name='生活')
+        base = timezone.now()
+        for i in range(25):
+            issue = Issue.objects.create(
+                title=f'问题{i}', topic=topic, date=datetime.date.today(),
+                description='描述', popularity=i % 5,
+            )
+            # 使用update避免auto_now覆盖，制造相同updated的并列情况
+            Issue.objects.filter(pk=issue.pk).update(updated=base - datetime.timedelta(minutes=i // 3))
+
+    def collect(self, params):
+        ids = []
+        response = self.client.get('/feedback/issues/', params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_legacy_list_without_params(self):
+        """不带分页参数时仍返回完整列表"""
+        response = self.client.get('/feedback/issues/')
+        self.assertEqual(len(response.data), 25)
+
+    def test_pages_match_full_ordering(self):
+        """逐页拼接的结果与完整排序一致，无重复无遗漏"""
+        for sort_by, ordering in (
+            ('time', ('-updated', '-id')),
+            ('popularity', ('-popularity', '-updated', '-id')),
+        ):
+            with self.subTest(sort_by=sort_by):
+                expected = list(Issue.objects.order_by(*ordering).values_list('id', flat=True))
+                self.assertEqual(self.collect({'sortBy': sort_by, 'page_size': 4}), expected)
+
+    def test_cursor_stable_when_other_rows_change(self):
+        """翻页过程中其他问题热度变化不影响后续页面"""
+        expected = list(Issue.objects.order_by('-popularity', '-updated', '-id').values_list('id', flat=True))
+        first = self.client.get('/feedback/issues/', {'sortBy': 'popularity', 'page_size': 5})
+        seen = [item['id'] for item in first.data['results']]
+        # 已读过的问题热度上涨，不应让后续页面整体错位
+        Issue.objects.filter(pk__in=seen).update(popularity=100)
+        second = self.client.get(first.data['next'])
+        self.assertEqual([item['id'] for item in second.data['results']], expected[5:10])
+
+    def test_invalid_cursor(self):
+        """伪造或与排序不匹配的游标返回404"""
+        response = self.client.get('/feedback/issues/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+        first = self.client.get('/feedback/issues/', {'sortBy': 'time', 'page_size': 5})
+        cursor = first.data['next'].split('cursor=')[1]
+        response = self.client.get('/feedback/issues/', {'sortBy': 'popularity', 'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
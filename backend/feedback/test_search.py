@@ -0,0 +1,121 @@
+"""
+全文搜索测试
+"""
+
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .models import Issue, Message, Reply, Topic
+from .search_index import build_query, query_terms, tokenize
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    """搜索测试类"""
+
+    def setUp(self):
+        self.topic = Topic.objects.create(name='生活')
+        self.student = User.objects.create_user(username='student', password='pass12345')
+        self.client = APIClient()
+
+    def create_issue(self, title, description='描述', is_public=True):
+        return Issue.objects.create(
+            host=self.student, title=title, topic=self.topic, date=datetime.date.today(),
+            description=description, is_public=is_public,
+        )
+
+    def search(self, query, **params):
+        response = self.client.get('/feedback/issues/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def result_ids(self, query, **params):
+        return [item['id'] for item in self.search(query, **params)['results']]
+
+    def test_tokenize(self):
+        """中文切成相邻二元组，其他文字按词切分并统一大小写"""
+        self.assertEqual(tokenize('热水器坏了，WiFi 也连不上'), '热水 水器 器坏 坏了 wifi 也连 连不 不上')
+        self.assertEqual(build_query(query_terms('热水器 WiFi 水')), '"热水 水器" AND "wifi" AND "水"*')
+        # 引号等 FTS5 语法字符不会进入查询
+        self.assertEqual(build_query(query_terms('" OR *')), '"or"')
+
+    def test_ranked_search(self):
+        """标题命中排在只有正文命中的前面，评论和回复的命中归到所属问题，不公开的问题不出现"""
+        in_body = self.create_issue('宿舍问题', description='三楼的热水器坏了')
+        in_title = self.create_issue('热水器坏了', description='一直没有热水')
+        in_reply = self.create_issue('宿舍设施')
+        Reply.objects.create(issue=in_reply, content='热水器已经报修')
+        in_message = self.create_issue('浴室')
+        Message.objects.create(user=self.student, issue=in_message, body='我们楼的热水器也坏了')
+        self.create_issue('热水器漏水', is_public=False)
+        self.create_issue('食堂', description='热的水不够')
+
+        ids = self.result_ids('热水器')
+        self.assertEqual(ids[0], in_title.pk)
+        self.assertEqual(set(ids), {in_title.pk, in_body.pk, in_reply.pk, in_message.pk})
+        self.assertEqual(self.result_ids('宿舍 热水器'), [in_body.pk])
+
+        response = self.client.get('/feedback/issues/search/', {'q': '  '})
+        self.assertEqual(response.status_code, 400)
+
+    def test_index_follows_changes(self):
+        """修改、删除和公开状态变化通过信号同步到索引"""
+        issue = self.create_issue('空调不制冷')
+        message = Message.objects.create(user=self.student, issue=issue, body='教室的投影仪也坏了')
+        self.assertEqual(self.result_ids('投影仪'), [issue.pk])
+
+        issue.title = '空调漏水'
+        issue.save()
+        self.assertEqual(self.result_ids('制冷'), [])
+        self.assertEqual(self.result_ids('漏水'), [issue.pk])
+
+        issue.is_public = False
+        issue.save()
+        self.assertEqual(self.result_ids('投影仪'), [])
+        issue.is_public = True
+        issue.save()
+        self.assertEqual(self.result_ids('投影仪'), [issue.pk])
+
+        message.delete()
+        self.assertEqual(self.result_ids('投影仪'), [])
+        issue.delete()
+        self.assertEqual(self.result_ids('漏水'), [])
+
+    def test_pagination_and_rebuild(self):
+        """分页链接可以翻到最后一页；不触发信号的批量更新在重建后可以搜到"""
+        issues = [self.create_issue(f'图书馆座位{i}') for i in range(5)]
+        first = self.search('图书馆', page_size=2)
+        self.assertEqual(len(first['results']), 2)
+        self.assertIn('page=2', first['next'])
+        last = self.search('图书馆', page_size=2, page=3)
+        self.assertEqual(len(last['results']), 1)
+        self.assertIsNone(last['next'])
+        seen = [item['id'] for item in first['results']] + self.result_ids('图书馆', page_size=2, page=2)
+        self.assertEqual(len(set(seen + [item['id'] for item in last['results']])), 5)
+
+        Issue.objects.filter(pk=issues[0].pk).update(title='自习室')
+        self.assertEqual(self.result_ids('自习室'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.result_ids('自习室'), [issues[0].pk])
+        self.assertEqual(len(self.result_ids('图书馆')), 4)
+
+    @override_settings(SEARCH_CANDIDATES=3)
+    def test_candidate_window(self):
+        """匹配数超过候选数时，较早的标题命中仍参与排序；页码不超出候选数对应的页数"""
+        old_title = self.create_issue('热水器坏了')
+        old_body = self.create_issue('宿舍', description='热水器坏了')
+        recent = [self.create_issue('浴室', description=f'热水器坏了{i}') for i in range(3)]
+
+        ids = self.result_ids('热水器')
+        self.assertEqual(ids[0], old_title.pk)
+        self.assertNotIn(old_body.pk, ids)
+        self.assertEqual(len(ids), 3)
+        self.assertIsNone(self.search('热水器', page_size=2, page=2)['next'])
+        self.assertEqual(self.result_ids('热水器', page_size=2, page=3), [])
+        self.assertEqual(self.result_ids('热水器 坏了1'), [recent[1].pk])
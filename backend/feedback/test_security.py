@@ -5,7 +5,13 @@
 
 from django.test import TestCase
 from django.core.exceptions import ValidationError
-from .validation_utils import InputValidator, SQLInjectionDetector
+import html
+import random
+
+from .validation_utils import DANGEROUS_TAGS, InputValidator, SQLInjectionDetector, contains_dangerous_tag
+from .test_validation_reference import (
+    CHINESE, FRAGMENTS, HTML, HTML_FRAGMENTS, random_text, reference_detect_sql_injection, reference_sanitize_input,
+)
 
 
 class SecurityTest(TestCase):
@@ -126,6 +132,52 @@ class SecurityTest(TestCase):
                     # 这是预期的行为
                     pass
 
+    def test_single_pass_detector_matches_reference(self):
+        """单次扫描的SQL注入检测与原逐条匹配实现的结论一致"""
+        corpus = [
+            "数学课程问题", "数学课'; DROP TABLE users; --", "SELECT * FROM users WHERE username = 'admin'",
+            "1' OR '1'='1", "UNION SELECT username, password FROM users", "'; WAITFOR DELAY '00:00:10' --",
+            "INSERT INTO issues (title) VALUES ('test')", "UPDATE users SET password = 'hacked'",
+            "DELETE FROM issues WHERE id = 1", "CREATE TABLE malicious (data text)",
+            "ALTER TABLE users ADD COLUMN hacked text", "数学课' OR '1'='1' --", "admin'--",
+            "x' AND 1=(SELECT COUNT(*) FROM tabname) --", "'; EXEC sp_configure 'show advanced options', 1; --",
+            "学业", "SELECT * FROM users", "<script>alert('xss')</script>", "A" * 200, "",
+            # 单引号外 / 分号后的 UNION、大小写和 Unicode 大小写折叠
+            "it's a union", "'x' union", "a; union", "x'union'", "ſelect", "unİon ſleep(1)", "Kx", "sp_who",
+        ]
+        rng = random.Random(0)
+        corpus += [random_text(rng, rng.randint(1, 80), FRAGMENTS + ["ſ", "İ", "ı", "K"]) for _ in range(3000)]
+        for text in corpus:
+            self.assertEqual(
+                SQLInjectionDetector.detect_sql_injection(text), reference_detect_sql_injection(text), repr(text)
+            )
+
+    def test_single_pass_sanitizer_matches_reference(self):
+        """单次扫描的输入清理：片段互不嵌套时与原逐个模式移除的实现结果一致"""
+        corpus = [
+            "数学课程问题", "<script>alert('xss')</script>正文", "<SCRIPT src=x>未闭合", "<b>加粗</b> & 'quote'",
+            "<form><input></form>", "<script>a</script></script>", "<iframe>\n</iframe>  ", "  <embed>",
+            "<ſcript>a</script>", "<button>提交</button>" * 3, "",
+        ]
+        rng = random.Random(0)
+        corpus += [random_text(rng, rng.randint(1, 300), CHINESE + HTML) for _ in range(2000)]
+        for text in corpus:
+            self.assertEqual(InputValidator.sanitize_input(text), reference_sanitize_input(text), repr(text))
+
+    def test_sanitizer_output_is_escaped(self):
+        """任意拼接的标签片段（嵌套、缺少结束标签、移除后拼接出标签）：输出都已转义，只删除、不改写原有文字"""
+        corpus = ["<scr<script>x</script>ipt>alert(1)</script>", "<input <script>a</script>>", "<form>a<script>b</script>"]
+        rng = random.Random(0)
+        corpus += [random_text(rng, rng.randint(1, 120), HTML_FRAGMENTS + ["<scr", "ipt>", "ſ"]) for _ in range(3000)]
+        for text in corpus:
+            safe = InputValidator.sanitize_input(text)
+            self.assertFalse(set(safe) & set('<>"\''), repr(text))
+            remaining = iter(text)
+            self.assertTrue(all(char in remaining for char in html.unescape(safe)), repr(text))
+            self.assertEqual(
+                contains_dangerous_tag(text), any(f'<{tag}' in text.lower() for tag in DANGEROUS_TAGS), repr(text)
+            )
+
 
 # 创建测试示例函数
 def demonstrate_security_features():
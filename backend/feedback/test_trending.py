@@ -0,0 +1,74 @@
+"""
+趋势分与热门榜单测试
+"""
+
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import trending
+from .like_service import LikeService
+from .models import Issue, IssueLike, Topic
+
+User = get_user_model()
+
+
+class TrendingTest(TestCase):
+    """趋势分测试类"""
+
+    def setUp(self):
+        self.topic = Topic.objects.create(name='生活')
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass12345') for i in range(4)]
+
+    def create_issue(self, title, days_ago):
+        created = timezone.now() - datetime.timedelta(days=days_ago)
+        issue = Issue.objects.create(title=title, topic=self.topic, date=datetime.date.today(), description='描述')
+        Issue.objects.filter(pk=issue.pk).update(created=created)
+        issue.refresh_from_db()
+        return issue
+
+    def test_recent_activity_beats_old_popularity(self):
+        """旧问题的大量历史点赞会随时间衰减，不会永远压过新问题"""
+        old = self.create_issue('旧问题', days_ago=30)
+        new = self.create_issue('新问题', days_ago=1)
+        for user in self.users:
+            like = IssueLike.objects.create(user=user, issue=old)
+            IssueLike.objects.filter(pk=like.pk).update(created=old.created)
+        IssueLike.objects.create(user=self.users[0], issue=new)
+        trending.recompute_hot_scores(Issue, IssueLike)
+
+        old.refresh_from_db()
+        new.refresh_from_db()
+        self.assertGreater(new.hot_score, old.hot_score)
+
+    def test_incremental_matches_recompute(self):
+        """点赞/取消点赞的增量维护结果与全量重算一致"""
+        issue = self.create_issue('问题', days_ago=2)
+        trending.recompute_hot_scores(Issue, IssueLike)
+        issue.refresh_from_db()
+        for user in self.users:
+            LikeService.toggle(user, issue)
+        LikeService.toggle(self.users[0], issue)
+
+        issue.refresh_from_db()
+        incremental = issue.hot_score
+        trending.recompute_hot_scores(Issue, IssueLike)
+        issue.refresh_from_db()
+        self.assertAlmostEqual(incremental, issue.hot_score, places=6)
+
+    def test_trending_list_served_from_ranking(self):
+        """sortBy=trending 按榜单名次返回并支持游标分页"""
+        issues = [self.create_issue(f'问题{i}', days_ago=i) for i in range(5)]
+        call_command('rebuild_trending', top=4, recompute=True, stdout=StringIO())
+
+        client = APIClient()
+        first = client.get('/feedback/issues/', {'sortBy': 'trending', 'page_size': 2})
+        second = client.get(first.data['next'])
+        ids = [row['id'] for row in first.data['results'] + second.data['results']]
+        self.assertEqual(ids, [issue.pk for issue in issues[:4]])
+        self.assertIsNone(second.data['next'])
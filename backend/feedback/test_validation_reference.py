@@ -0,0 +1,80 @@
+"""
+输入校验的对照实现和随机输入生成
+逐条匹配的 SQL 注入检测和逐个 re.sub 的输入清理是优化前的实现，测试（test_security.py）用它们
+验证新实现的结果，benchmark_validation 命令用它们对比耗时
+"""
+import html
+import re
+
+from .validation_utils import DANGEROUS_TAG_PATTERNS, SQLInjectionDetector
+
+
+def reference_detect_sql_injection(input_text):
+    """原逐条匹配的实现，作为对照：13 个模式依次 re.search，再按单引号、分号切分后逐段检查"""
+    if not input_text:
+        return False
+
+    input_text = str(input_text)
+
+    for pattern in SQLInjectionDetector.SQL_INJECTION_PATTERNS:
+        if re.search(pattern, input_text):
+            return True
+
+    if "'" in input_text:
+        quote_parts = input_text.split("'")
+        for i, part in enumerate(quote_parts):
+            if i % 2 == 1:
+                continue
+            if re.search(r'(?i)\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|UNION)\b', part):
+                return True
+
+    if ';' in input_text:
+        statements = input_text.split(';')
+        if len(statements) > 1:
+            for stmt in statements[1:]:
+                if re.search(r'(?i)\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|UNION)\b', stmt.strip()):
+                    return True
+
+    return False
+
+
+def reference_sanitize_input(input_text, max_length=1000):
+    """原 sanitize_input 的实现，作为对照：7 个模式依次 re.sub 后再转义"""
+    if not input_text:
+        return ""
+    if len(input_text) > max_length:
+        input_text = input_text[:max_length]
+    for pattern in DANGEROUS_TAG_PATTERNS:
+        input_text = re.sub(pattern, '', input_text, flags=re.IGNORECASE | re.DOTALL)
+    return html.escape(input_text.strip())
+
+
+# 生成测试输入用的片段：普通中文反馈、英文句子和常见的注入片段
+CHINESE = [
+    "宿舍的热水经常不够用，希望学校尽快安排维修。", "图书馆自习座位太少，考试周一座难求。",
+    "食堂的饭菜价格最近涨了不少，", "请问奖学金的申请流程是什么？",
+]
+ENGLISH = ["The wifi in building 3 is unstable. ", "Please open the lab on weekends, ", "it's great; thanks "]
+INJECTION = [
+    "union of student clubs ", "'", ";", "(", ")", " or ", " union ", "--", "#", "1=1", "select", "sleep(", "sys.", "\"",
+]
+FRAGMENTS = CHINESE + ENGLISH + INJECTION
+# 用户粘贴的网页片段：标签成对出现，夹杂普通标签和需要转义的字符
+HTML = [
+    "<b>加粗</b>", "<script>alert(1)</script>", "<iframe src='a'></iframe>", "<input type=\"text\">",
+    "<button>提交</button>", "<p>段落</p>", " & ", "a < b", "\n",
+]
+# 模糊测试用的零散片段：缺少结束标签、嵌套、被拆开后可能重新拼成标签的片段
+HTML_FRAGMENTS = HTML + [
+    "<SCRIPT src=x>", "</script>", "<form>", "</form>", "<embed>", "</embed>", "<obj", "ect>", "</object>",
+    "<", ">", "&", "  ",
+]
+
+
+def random_text(rng, length, fragments=FRAGMENTS):
+    parts = []
+    size = 0
+    while size < length:
+        parts.append(rng.choice(fragments))
+        size += len(parts[-1])
+    return ''.join(parts)[:length]
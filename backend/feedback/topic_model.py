@@ -0,0 +1,220 @@
+"""
+离线训练的分类模型
+字符 n-gram 经哈希映射到固定数量的桶，按 TF-IDF 加权后用多项式朴素贝叶斯打分。
+模型由 `python manage.py train_classifier` 根据已分类的 Issue 训练，
+保存为定长的二进制文件，推理时通过 mmap 按需读取，多个 worker 进程共享操作系统页缓存。
+
+文件格式（小端）：
+    b'FBNB' | uint32 头部长度 | JSON 头部 | 补齐到 4 字节
+    float32 idf[buckets] | float32 class_log_prior[classes] | float32 feature_log_prob[classes][buckets]
+"""
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import zlib
+from array import array
+from collections import Counter
+
+from django.conf import settings
+
+from .keyword_classifier import normalize
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'FBNB'
+FLOAT_SIZE = 4
+
+
+def extract_features(text, buckets, ngram_range=(1, 3)):
+    """字符 n-gram（忽略空白）→ {桶编号: 次数}"""
+    text = ''.join(normalize(text).split())
+    counts = Counter()
+    low, high = ngram_range
+    for n in range(low, high + 1):
+        for i in range(len(text) - n + 1):
+            counts[zlib.crc32(text[i:i + n].encode('utf-8')) % buckets] += 1
+    return counts
+
+
+def tfidf(counts, idf):
+    """次数 → 次线性 TF × IDF（不做长度归一化，较长的文本提供更多证据）"""
+    return {b: (1 + math.log(c)) * idf[b] for b, c in counts.items()}
+
+
+class TopicModel:
+    """已加载的模型，idf 和概率表可以是 array 或 mmap 上的 memoryview"""
+
+    def __init__(self, header, idf, class_log_prior, feature_log_prob, source=None):
+        self.classes = header['classes']
+        self.buckets = header['buckets']
+        self.ngram_range = tuple(header['ngram_range'])
+        self.header = header
+        self.idf = idf
+        self.class_log_prior = class_log_prior
+        self.feature_log_prob = feature_log_prob
+        self.temperature = header.get('temperature', 1.0)
+        self._source = source
+
+    @classmethod
+    def train(cls, samples, classes, buckets=1 << 16, ngram_range=(1, 3), alpha=0.1):
+        """samples: [(文本, 分类)]，返回训练好的模型"""
+        class_index = {name: i for i, name in enumerate(classes)}
+        docs = [(extract_features(text, buckets, ngram_range), class_index[label]) for text, label in samples]
+
+        df = Counter()
+        for counts, _ in docs:
+            df.update(counts.keys())
+        total = len(docs)
+        idf = array('f', [0.0]) * buckets
+        for b in range(buckets):
+            idf[b] = math.log((1 + total) / (1 + df.get(b, 0))) + 1
+
+        class_docs = Counter(label for _, label in docs)
+        feature_mass = [array('d', [0.0]) * buckets for _ in classes]
+        for counts, label in docs:
+            row = feature_mass[label]
+            for b, w in tfidf(counts, idf).items():
+                row[b] += w
+
+        class_log_prior = array('f', [
+            math.log((class_docs.get(i, 0) + 1) / (total + len(classes))) for i in range(len(classes))
+        ])
+        feature_log_prob = array('f')
+        for row in feature_mass:
+            denominator = math.log(sum(row) + alpha * buckets)
+            feature_log_prob.extend(math.log(w + alpha) - denominator for w in row)
+
+        header = {
+            'version': 1,
+            'classes': list(classes),
+            'buckets': buckets,
+            'ngram_range': list(ngram_range),
+            'samples': total,
+            'temperature': 1.0,
+        }
+        return cls(header, idf, class_log_prior, feature_log_prob)
+
+    def save(self, path):
+        header = json.dumps(self.header, ensure_ascii=False).encode('utf-8')
+        padding = -(len(MAGIC) + 4 + len(header)) % FLOAT_SIZE
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<I', len(header)) + header + b'\0' * padding)
+            for table in (self.idf, self.class_log_prior, self.feature_log_prob):
+                array('f', table).tofile(f)
+        # 原子替换，正在读取旧文件的进程不受影响
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """以只读 mmap 打开模型文件"""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:4] != MAGIC:
+            mapped.close()
+            raise ValueError(f"{path} is not a topic model file")
+        header_length = struct.unpack('<I', mapped[4:8])[0]
+        header = json.loads(mapped[8:8 + header_length].decode('utf-8'))
+        offset = 8 + header_length
+        offset += -offset % FLOAT_SIZE
+
+        floats = memoryview(mapped)[offset:].cast('f')
+        buckets, n_classes = header['buckets'], len(header['classes'])
+        idf = floats[:buckets]
+        class_log_prior = floats[buckets:buckets + n_classes]
+        feature_log_prob = floats[buckets + n_classes:buckets + n_classes + n_classes * buckets]
+        return cls(header, idf, class_log_prior, feature_log_prob, source=mapped)
+
+    def log_scores(self, text):
+        weights = tfidf(extract_features(text, self.buckets, self.ngram_range), self.idf)
+        scores = []
+        for i in range(len(self.classes)):
+            base = i * self.buckets
+            scores.append(
+                self.class_log_prior[i] + sum(w * self.feature_log_prob[base + b] for b, w in weights.items())
+            )
+        return scores
+
+    @staticmethod
+    def _softmax(log_scores, temperature):
+        top = max(log_scores)
+        exps = [math.exp((s - top) / temperature) for s in log_scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def calibrate(self, samples, temperatures=(1, 2, 4, 8, 16, 32, 64, 128)):
+        """
+        温度缩放：朴素贝叶斯的概率普遍过于自信，
+        在留出集上选取使对数损失最小的温度，写入模型头部
+        """
+        class_index = {name: i for i, name in enumerate(self.classes)}
+        scored = [(self.log_scores(text), class_index[label]) for text, label in samples]
+        if not scored:
+            return self.temperature
+
+        def log_loss(temperature):
+            return -sum(
+                math.log(max(self._softmax(scores, temperature)[label], 1e-12)) for scores, label in scored
+            ) / len(scored)
+
+        self.temperature = min(temperatures, key=log_loss)
+        self.header['temperature'] = self.temperature
+        return self.temperature
+
+    def predict(self, title, description=""):
+        """
+        Returns:
+            dict: {"category": 分类, "confidence": 0.0-1.0, "scores": {分类: 概率}}
+        """
+        log_scores = self.log_scores(f"{title} {description}")
+        probabilities = dict(zip(self.classes, self._softmax(log_scores, self.temperature)))
+        category = self.classes[log_scores.index(max(log_scores))]
+        return {"category": category, "confidence": round(probabilities[category], 4), "scores": probabilities}
+
+
+class LazyTopicModel:
+    """每个进程在第一次使用时加载一次模型文件，文件不存在时返回 None"""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._model = None
+
+    @property
+    def path(self):
+        return self._path or getattr(settings, 'CLASSIFY_MODEL_PATH', None)
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._model = self._load()
+                    self._loaded = True
+        return self._model
+
+    def _load(self):
+        path = self.path
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            model = TopicModel.load(path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load topic model from {path}: {str(e)}")
+            return None
+        logger.info(f"Topic model loaded from {path} ({model.header['samples']} samples)")
+        return model
+
+    def reset(self):
+        """下次使用时重新加载（训练命令写入新模型后调用）"""
+        with self._lock:
+            self._loaded = False
+            self._model = None
+
+
+# 创建单例实例
+topic_model = LazyTopicModel()
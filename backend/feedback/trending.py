@@ -0,0 +1,90 @@
+"""
+问题热度趋势分（随时间衰减的 hot score）
+
+每个事件（发布=1、点赞=2、浏览=1）的贡献按半衰期指数衰减：
+    当前热度 = Σ 权重 × 2^(-(现在 - 事件时间) / 半衰期)
+
+直接存储这个值需要不断随时间重算。这里改为存储它相对固定纪元的自然对数：
+    hot_score = ln Σ 权重 × e^((事件时间 - 纪元) / τ)，τ = 半衰期 / ln2
+
+两者只差一个所有问题共同的因子，排序完全一致，而 hot_score 本身不随时间变化，
+新事件只需做一次 log-sum-exp 累加即可增量维护（类似 Reddit 的 hot 排序）。
+"""
+import datetime
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+
+EPOCH = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+CREATE_WEIGHT = 1
+LIKE_WEIGHT = 2
+VIEW_WEIGHT = 1
+
+
+def time_constant():
+    """τ（秒），由半衰期（小时）换算"""
+    half_life_hours = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24)
+    return half_life_hours * 3600 / math.log(2)
+
+
+def event_score(weight, at):
+    """单个事件在对数空间中的贡献 ln(weight) + (at - EPOCH) / τ"""
+    return math.log(weight) + (at - EPOCH).total_seconds() / time_constant()
+
+
+def combine(scores):
+    """对若干事件贡献求 log-sum-exp，用于全量重算"""
+    scores = list(scores)
+    if not scores:
+        return 0.0
+    top = max(scores)
+    return top + math.log(sum(math.exp(score - top) for score in scores))
+
+
+def add_event_expression(score, field='hot_score'):
+    """
+    数据库端累加一个事件：ln(e^a + e^b) = max(a, b) + ln(1 + e^-|a - b|)
+    写成这种形式可以避免 e^a 溢出
+    """
+    current = F(field)
+    score = Value(float(score), output_field=FloatField())
+    return Greatest(current, score) + Ln(Value(1.0) + Exp(-Abs(current - score)))
+
+
+def remove_event_expression(score, floor, field='hot_score'):
+    """
+    数据库端移除一个事件：ln(e^a - e^b) = a + ln(1 - e^(b - a))
+    a 与 b 非常接近时存在浮点抵消误差，结果不低于 floor（通常为发布事件本身的贡献）
+    """
+    current = F(field)
+    score = Value(float(score), output_field=FloatField())
+    remaining = Greatest(Value(1.0) - Exp(score - current), Value(1e-300))
+    return Greatest(current + Ln(remaining), Value(float(floor), output_field=FloatField()))
+
+
+def recompute_hot_scores(issue_model, like_model, batch_size=500):
+    """
+    根据发布时间、点赞记录时间和浏览量全量重算趋势分
+    浏览量没有逐条时间戳，按发布时间计入。传入模型类以便在数据迁移中使用历史模型。
+    """
+    like_times = defaultdict(list)
+    for issue_id, created in like_model.objects.values_list('issue_id', 'created').iterator():
+        like_times[issue_id].append(created)
+
+    batch = []
+    for issue in issue_model.objects.only('id', 'created', 'views').iterator(chunk_size=batch_size):
+        scores = [event_score(CREATE_WEIGHT, issue.created)]
+        if issue.views > 0:
+            scores.append(event_score(VIEW_WEIGHT * issue.views, issue.created))
+        scores.extend(event_score(LIKE_WEIGHT, at) for at in like_times.get(issue.id, ()))
+        issue.hot_score = combine(scores)
+        batch.append(issue)
+        if len(batch) >= batch_size:
+            issue_model.objects.bulk_update(batch, ['hot_score'])
+            batch = []
+    if batch:
+        issue_model.objects.bulk_update(batch, ['hot_score'])
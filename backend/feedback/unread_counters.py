@@ -0,0 +1,152 @@
+"""
+未读通知计数
+UnreadCounter 保存用户的未读总数，TopicUnreadCounter 按分类拆分，
+通知的创建和已读标记在同一事务中调整计数，未读数接口不再对 Notification 做 COUNT(*)。
+计数出现偏差（例如在后台直接删除通知）时运行 reconcile_unread_counters 命令修复。
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+
+from .models import Notification, TopicUnreadCounter, UnreadCounter
+
+
+class UnreadCounterService:
+
+    @staticmethod
+    def _apply(model, deltas, **scope):
+        """按 {user_id: delta} 调整计数，delta 相同的用户合并为一条 UPDATE"""
+        deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        # 先确保计数行存在，再用 F() 原子地累加，并发创建时不会丢失增量
+        model.objects.bulk_create(
+            [model(user_id=user_id, **scope) for user_id in deltas], ignore_conflicts=True
+        )
+        by_delta = defaultdict(list)
+        for user_id, delta in deltas.items():
+            by_delta[delta].append(user_id)
+        for delta, user_ids in by_delta.items():
+            model.objects.filter(user_id__in=user_ids, **scope).update(
+                count=Greatest(F('count') + delta, 0)
+            )
+
+    @staticmethod
+    def adjust(pairs, sign=1):
+        """
+        按 (recipient_id, topic_id) 列表调整计数
+        每条通知对应一个元素，sign=1 表示新增未读，sign=-1 表示变为已读
+        """
+        totals = Counter()
+        by_topic = defaultdict(Counter)
+        for recipient_id, topic_id in pairs:
+            totals[recipient_id] += sign
+            if topic_id:
+                by_topic[topic_id][recipient_id] += sign
+        UnreadCounterService._apply(UnreadCounter, totals)
+        for topic_id, deltas in by_topic.items():
+            UnreadCounterService._apply(TopicUnreadCounter, deltas, topic_id=topic_id)
+
+    @staticmethod
+    def record_created(notifications):
+        """新建的通知计入未读数（调用方已处于事务中）"""
+        UnreadCounterService.adjust(
+            (n.recipient_id, n.issue.topic_id if n.issue_id else None)
+            for n in notifications if not n.is_read
+        )
+
+    @staticmethod
+    def mark_read(queryset):
+        """
+        将查询集中的未读通知标记为已读并扣减计数，返回实际更新的条数
+        按分类分组更新，以 UPDATE 的返回行数扣减，并发重复标记时不会多扣
+        """
+        with transaction.atomic():
+            unread = queryset.filter(is_read=False)
+            groups = list(
+                unread.order_by().values_list('recipient_id', 'issue__topic_id').annotate(total=Count('id'))
+            )
+            pairs = []
+            for recipient_id, topic_id, _ in groups:
+                if topic_id is None:
+                    group = unread.filter(recipient_id=recipient_id, issue__topic__isnull=True)
+                else:
+                    group = unread.filter(recipient_id=recipient_id, issue__topic_id=topic_id)
+                updated = group.update(is_read=True)
+                pairs.extend([(recipient_id, topic_id)] * updated)
+            UnreadCounterService.adjust(pairs, sign=-1)
+        return len(pairs)
+
+    @staticmethod
+    def move_topic(issue_id, old_topic_id, new_topic_id):
+        """问题更换分类时，把其未读通知的分类计数迁移到新分类"""
+        rows = Notification.objects.filter(issue_id=issue_id, is_read=False).order_by() \
+            .values_list('recipient_id').annotate(total=Count('id'))
+        for topic_id, sign in ((old_topic_id, -1), (new_topic_id, 1)):
+            if topic_id:
+                UnreadCounterService._apply(
+                    TopicUnreadCounter, {user_id: sign * total for user_id, total in rows}, topic_id=topic_id
+                )
+
+    @staticmethod
+    def discard_issue(issue):
+        """问题删除前扣减其未读通知的计数（通知随问题级联删除）"""
+        rows = Notification.objects.filter(issue_id=issue.pk, is_read=False).order_by() \
+            .values_list('recipient_id').annotate(total=Count('id'))
+        deltas = {user_id: -total for user_id, total in rows}
+        UnreadCounterService._apply(UnreadCounter, deltas)
+        if issue.topic_id:
+            UnreadCounterService._apply(TopicUnreadCounter, deltas, topic_id=issue.topic_id)
+
+    @staticmethod
+    def get_count(user_id, topic_ids=None):
+        """
+        未读数：topic_ids 为 None 时按主键读取总数，
+        否则只统计给定分类（内容管理员的 admin_filter 视图）
+        """
+        if topic_ids is None:
+            return UnreadCounter.objects.filter(pk=user_id).values_list('count', flat=True).first() or 0
+        if not topic_ids:
+            return 0
+        return TopicUnreadCounter.objects.filter(
+            user_id=user_id, topic_id__in=topic_ids
+        ).aggregate(total=Sum('count'))['total'] or 0
+
+    @staticmethod
+    def reconcile(user_ids=None):
+        """根据 Notification 重新计算计数，返回被修正的计数行数"""
+        notifications = Notification.objects.filter(is_read=False).order_by()
+        totals = UnreadCounter.objects.all()
+        topics = TopicUnreadCounter.objects.all()
+        if user_ids is not None:
+            notifications = notifications.filter(recipient_id__in=user_ids)
+            totals = totals.filter(user_id__in=user_ids)
+            topics = topics.filter(user_id__in=user_ids)
+
+        expected_totals = dict(notifications.values_list('recipient_id').annotate(total=Count('id')))
+        expected_topics = {
+            (user_id, topic_id): total
+            for user_id, topic_id, total in notifications.filter(issue__topic__isnull=False)
+            .values_list('recipient_id', 'issue__topic_id').annotate(total=Count('id'))
+        }
+        actual_totals = dict(totals.values_list('user_id', 'count'))
+        actual_topics = {(user_id, topic_id): count for user_id, topic_id, count in topics.values_list('user_id', 'topic_id', 'count')}
+
+        fixed_totals = {
+            user_id: expected_totals.get(user_id, 0)
+            for user_id in expected_totals.keys() | actual_totals.keys()
+            if expected_totals.get(user_id, 0) != actual_totals.get(user_id, 0)
+        }
+        fixed_topics = {
+            key: expected_topics.get(key, 0)
+            for key in expected_topics.keys() | actual_topics.keys()
+            if expected_topics.get(key, 0) != actual_topics.get(key, 0)
+        }
+        with transaction.atomic():
+            for user_id, count in fixed_totals.items():
+                UnreadCounter.objects.update_or_create(user_id=user_id, defaults={'count': count})
+            for (user_id, topic_id), count in fixed_topics.items():
+                TopicUnreadCounter.objects.update_or_create(user_id=user_id, topic_id=topic_id, defaults={'count': count})
+        return len(fixed_totals) + len(fixed_topics)
@@ -6,6 +6,8 @@ from . import views
 urlpatterns = [
     path('topics/', views.TopicListCreate.as_view(), name='topic-list-create'),
     path('issues/', views.IssueListCreate.as_view(), name='issue-list-create'),
+    path('issues/search/', views.search_issues, name='issue-search'),
+    path('issues/similar/', views.similar_issues, name='issue-similar'),
     path('issues/<int:pk>/', views.IssueDetailView.as_view(), name='issue-detail'),
     path('issues/<int:pk>/messages/', views.MessageListCreate.as_view(), name='message-list-create'),
     path('issues/<int:pk>/Replies/', views.ReplyListCreate.as_view(), name='reply-list-create'), 
@@ -20,6 +22,8 @@ urlpatterns = [
     path('notifications/unread-count/', views.get_unread_count, name='unread-count'),
     path('notifications/mark-read/', views.mark_notifications_read, name='mark-notifications-read'),
     path('notifications/mark-all-read/', views.mark_all_read, name='mark-all-read'),
+    path('notifications/stream/', views.notification_stream, name='notification-stream'),
+    path('notifications/stream-ticket/', views.notification_stream_ticket, name='notification-stream-ticket'),
     
     # 历史记录相关路由
     path('view-history/', views.ViewHistoryListCreate.as_view(), name='view-history-list'),
@@ -33,9 +37,12 @@ urlpatterns = [
     
     # 智能客服聊天路由
     path('chat/', views.chat, name='chat'),
+    path('chat/stream/', views.chat_stream, name='chat-stream'),
     
     # 智能分类路由
     path('classify/', views.classify_issue_view, name='classify-issue'),
+    path('classify/batch/', views.classify_batch_view, name='classify-batch'),
+    path('classify/cache-stats/', views.classify_cache_stats, name='classify-cache-stats'),
     
     # 用户确认结案相关路由
     path('issues/<int:issue_id>/confirm-resolved/', views.confirm_issue_resolved, name='confirm-issue-resolved'),
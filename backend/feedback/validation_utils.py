@@ -5,10 +5,50 @@
 
 import re
 import html
+from functools import lru_cache
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
 
+# 危险HTML标签：描述、评论等内容中出现时直接拒绝，sanitize_input 中连同标签内容一起移除
+DANGEROUS_TAGS = ('script', 'iframe', 'object', 'embed', 'form', 'input', 'button')
+
+DANGEROUS_TAG_PATTERNS = [
+    r'<script[^>]*>.*?</script>',
+    r'<iframe[^>]*>.*?</iframe>',
+    r'<object[^>]*>.*?</object>',
+    r'<embed[^>]*>.*?</embed>',
+    r'<form[^>]*>.*?</form>',
+    r'<input[^>]*>',
+    r'<button[^>]*>.*?</button>'
+]
+
+# 在小写文本中查找，与逐个判断 tag in value.lower() 等价
+_LOWERCASE_TAG_OPENER = re.compile('<(?:' + '|'.join(DANGEROUS_TAGS) + ')')
+# 所有危险标签片段合成一个正则：一次扫描中在每个位置按 DANGEROUS_TAG_PATTERNS 的顺序尝试匹配
+_TAG_FRAGMENT = re.compile('|'.join(DANGEROUS_TAG_PATTERNS), re.IGNORECASE | re.DOTALL)
+
+
+def contains_dangerous_tag(text):
+    """文本中是否含有危险HTML标签的开头（不区分大小写）"""
+    return _LOWERCASE_TAG_OPENER.search(text.lower()) is not None
+
+
+@lru_cache(maxsize=1024)
+def _sanitize(text):
+    """
+    一次从左到右扫描：按出现的先后切掉危险标签片段，片段之间的文字各转义一次后拼接
+    原实现按模式顺序逐个 re.sub（7 遍扫描）后再整体转义；嵌套、交错的片段，或移除后前后文字拼接出的标签，
+    留下的文字可能与原实现不同，但都已转义，不会成为有效的标签
+    """
+    return ''.join(map(html.escape, _TAG_FRAGMENT.split(text))).strip()
+
+
+def escape_html(text):
+    """转义并去掉首尾空白（序列化器校验通过后的处理）"""
+    return html.escape(text).strip()
+
+
 class InputValidator:
     """输入验证工具类"""
     
@@ -61,10 +101,8 @@ class InputValidator:
             raise ValidationError(_("描述不能超过1000个字符"))
         
         # 基本HTML标签过滤
-        dangerous_tags = ['<script', '<iframe', '<object', '<embed', '<form', '<input', '<button']
-        for tag in dangerous_tags:
-            if tag in description.lower():
-                raise ValidationError(_("描述中不能包含危险的HTML标签"))
+        if contains_dangerous_tag(description):
+            raise ValidationError(_("描述中不能包含危险的HTML标签"))
         
         # HTML转义防护
         safe_description = html.escape(description.strip())
@@ -82,10 +120,8 @@ class InputValidator:
             raise ValidationError(_("内容不能超过1000个字符"))
         
         # 基本HTML标签过滤
-        dangerous_tags = ['<script', '<iframe', '<object', '<embed', '<form', '<input', '<button']
-        for tag in dangerous_tags:
-            if tag in content.lower():
-                raise ValidationError(_("内容中不能包含危险的HTML标签"))
+        if contains_dangerous_tag(content):
+            raise ValidationError(_("内容中不能包含危险的HTML标签"))
         
         # HTML转义防护
         safe_content = html.escape(content.strip())
@@ -121,24 +157,25 @@ class InputValidator:
         if len(input_text) > max_length:
             input_text = input_text[:max_length]
         
-        # 移除危险HTML标签
-        dangerous_patterns = [
-            r'<script[^>]*>.*?</script>',
-            r'<iframe[^>]*>.*?</iframe>',
-            r'<object[^>]*>.*?</object>',
-            r'<embed[^>]*>.*?</embed>',
-            r'<form[^>]*>.*?</form>',
-            r'<input[^>]*>',
-            r'<button[^>]*>.*?</button>'
-        ]
-        
-        for pattern in dangerous_patterns:
-            input_text = re.sub(pattern, '', input_text, flags=re.IGNORECASE | re.DOTALL)
-        
-        # HTML转义
-        safe_text = html.escape(input_text.strip())
-        
-        return safe_text
+        # 移除危险HTML标签并转义（一次扫描，重复的输入直接返回缓存结果）
+        return _sanitize(input_text)
+
+
+def _candidate_pattern(patterns):
+    """
+    生成扫描起点的正则：关键词前两个字母组成的前缀树（如 a[ln]|be|c[horu]|...），或可能开始一个攻击模式的标点
+    以 (?i)\b( 开头的模式形如 (?i)\b(关键词...|关键词...)，每个分支至少以两个字母开头
+    """
+    prefixes = {'u': {'n'}}  # 单独的 UNION
+    for pattern in patterns:
+        if pattern.startswith(r'(?i)\b('):
+            for branch in pattern[len(r'(?i)\b('):].split('|'):
+                prefixes.setdefault(branch[0].lower(), set()).add(branch[1].lower())
+    trie = '|'.join(
+        first + (f"[{''.join(sorted(seconds))}]" if len(seconds) > 1 else seconds.pop())
+        for first, seconds in sorted(prefixes.items())
+    )
+    return rf"(?P<word>\b(?=(?i:[{''.join(sorted(prefixes))}]))(?i:{trie}))|['\";`)\]#*/-]"
 
 
 class SQLInjectionDetector:
@@ -174,6 +211,21 @@ class SQLInjectionDetector:
         r'\)\s*;|\]\s*;',
     ]
     
+    # 以上模式按首字符分成两组，各自合并为一个预编译的正则，一次从左到右扫描完成检测：
+    # - 以 (?i)\b 开头的模式只可能从英文单词的开头开始匹配，且单词的前两个字母是某个关键词的前两个字母
+    # - 其余模式只可能从单引号、分号、注释符号、括号等标点开始匹配
+    # 扫描时先用 _CANDIDATES 跳到下一个可能的起点，再在该位置尝试对应一组模式；
+    # 两组中另外加入单引号、分号和 UNION，用于在同一次扫描中完成“单引号外 / 分号后出现 UNION”的判断
+    _WORD_SCANNER = re.compile(
+        '|'.join(f'(?i:{p[4:]})' for p in SQL_INJECTION_PATTERNS if p.startswith(r'(?i)\b'))
+        + r'|(?P<union>(?i:\bUNION\b))'
+    )
+    _SYMBOL_SCANNER = re.compile(
+        '|'.join(f'(?:{p})' for p in SQL_INJECTION_PATTERNS if not p.startswith(r'(?i)\b'))
+        + r"|(?P<quote>')|(?P<semicolon>;)"
+    )
+    _CANDIDATES = re.compile(_candidate_pattern(SQL_INJECTION_PATTERNS))
+    
     @staticmethod
     def detect_sql_injection(input_text):
         """检测SQL注入攻击"""
@@ -182,31 +234,42 @@ class SQLInjectionDetector:
         
         input_text = str(input_text)
         
-        # 检查常见SQL注入模式
-        for pattern in SQLInjectionDetector.SQL_INJECTION_PATTERNS:
-            if re.search(pattern, input_text):
-                return True
+        find_candidate = SQLInjectionDetector._CANDIDATES.search
+        match_word = SQLInjectionDetector._WORD_SCANNER.match
+        match_symbol = SQLInjectionDetector._SYMBOL_SCANNER.match
         
-        # 检测单引号注入
-        if "'" in input_text:
-            # 检查单引号后的SQL关键词
-            quote_parts = input_text.split("'")
-            for i, part in enumerate(quote_parts):
-                if i % 2 == 1:  # 单引号内的内容
-                    continue
-                # 检查单引号外的SQL关键词
-                if re.search(r'(?i)\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|UNION)\b', part):
+        quotes = 0
+        after_semicolon = False
+        union_outside_quotes = False
+        position = 0
+        while True:
+            candidate = find_candidate(input_text, position)
+            if candidate is None:
+                break
+            start = candidate.start()
+            match = (match_word if candidate.lastgroup else match_symbol)(input_text, start)
+            if match is None:
+                position = start + 1
+                continue
+            position = match.end()
+            
+            token = match.lastgroup
+            if token is None:
+                # 命中常见SQL注入模式
+                return True
+            if token == 'quote':
+                quotes += 1
+            elif token == 'semicolon':
+                after_semicolon = True
+            else:
+                # 分号之后的 UNION 视为多语句注入
+                if after_semicolon:
                     return True
+                # 单引号外的 UNION（文本中需要至少有一个单引号）
+                if quotes % 2 == 0:
+                    union_outside_quotes = True
         
-        # 检测分号分隔的多个SQL语句
-        if ';' in input_text:
-            statements = input_text.split(';')
-            if len(statements) > 1:
-                for stmt in statements[1:]:  # 跳过第一个语句
-                    if re.search(r'(?i)\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|UNION)\b', stmt.strip()):
-                        return True
-        
-        return False
+        return union_outside_quotes and quotes > 0
     
     @staticmethod
     def safe_query_param(param_value):
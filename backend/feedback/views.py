@@ -4,19 +4,38 @@ from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from django.middleware.csrf import get_token
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db.models import F
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework import status
 from .models import Issue, Reply, Message, Topic, IssueLike, Notification, ViewHistory, Favorite
-from .serializers import IssueSerializer, ReplySerializer, MessageSerializer, TopicSerializer, NotificationSerializer, ViewHistorySerializer, FavoriteSerializer
+from .serializers import IssueSerializer, IssueListSerializer, ReplySerializer, MessageSerializer, TopicSerializer, NotificationSerializer, ViewHistorySerializer, FavoriteSerializer
 from .notification_service import NotificationService
 from .classify_service import classify_service
+from .classify_cache import classification_cache
 from .chat_service import chat_service
+from .chat_sessions import chat_sessions
 from .validation_utils import InputValidator, SQLInjectionDetector
+from .pagination import KeysetCursorPagination
+from .search_index import search_index
+from .duplicate_index import duplicate_index
+from .counters import counter_buffer
+from .like_service import LikeService
+from .notification_hub import notification_hub
+from . import outbox
+from api.authentication import CachedJWTAuthentication, authenticate_stream_ticket, issue_stream_ticket
+from api.authorization import AuthorizationContext, get_authorization
+from api.permissions import IsAnyAdmin
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+import asyncio
 import json
+import math
 
 
 class TopicListCreate(generics.ListCreateAPIView):
@@ -27,6 +46,18 @@ class TopicListCreate(generics.ListCreateAPIView):
 class IssueListCreate(generics.ListCreateAPIView):
     serializer_class = IssueSerializer
     permission_classes = [AllowAny]  # 允许查看问题列表，但创建需要认证
+    pagination_class = KeysetCursorPagination  # 携带 cursor/page_size 参数时启用游标分页
+
+    # 排序均以 id 结尾，保证游标分页的排序是全序的（与 Issue.Meta.indexes 对应）
+    TIME_ORDERING = ('-updated', '-id')
+    POPULARITY_ORDERING = ('-popularity', '-updated', '-id')
+    TRENDING_ORDERING = ('trending_rank', '-id')
+
+    def get_serializer_class(self):
+        # 列表使用轻量序列化器，创建仍使用完整的 IssueSerializer 做校验
+        if self.request.method == 'GET':
+            return IssueListSerializer
+        return IssueSerializer
 
     def get_queryset(self):
         # 初始查询集：所有公开的问题
@@ -59,21 +90,26 @@ class IssueListCreate(generics.ListCreateAPIView):
                 safe_sort_by = InputValidator.validate_url_param('sortBy', sort_by, max_length=20)
                 if safe_sort_by == 'time':
                     # 默认排序（按更新时间）
-                    queryset = queryset.order_by('-updated')
+                    queryset = queryset.order_by(*self.TIME_ORDERING)
                 elif safe_sort_by == 'popularity':
                     # 按热度值排序，热度值高的在前
-                    queryset = queryset.order_by('-popularity', '-updated')
+                    queryset = queryset.order_by(*self.POPULARITY_ORDERING)
+                elif safe_sort_by == 'trending':
+                    # 按趋势分排序：直接读取定期重建的热门榜单，只包含榜单内的问题
+                    queryset = queryset.filter(trending__isnull=False).annotate(
+                        trending_rank=F('trending__rank')
+                    ).order_by(*self.TRENDING_ORDERING)
                 else:
                     # 默认排序
-                    queryset = queryset.order_by('-updated')
+                    queryset = queryset.order_by(*self.TIME_ORDERING)
             except ValidationError:
                 # 参数验证失败，使用默认排序
-                queryset = queryset.order_by('-updated')
+                queryset = queryset.order_by(*self.TIME_ORDERING)
         else:
             # 默认排序
-            queryset = queryset.order_by('-updated')
+            queryset = queryset.order_by(*self.TIME_ORDERING)
         
-        return queryset
+        return IssueListSerializer.setup_queryset(queryset)
 
     def perform_create(self, serializer):
         # 从请求数据中获取 topic 的名称
@@ -87,9 +123,8 @@ class IssueListCreate(generics.ListCreateAPIView):
             # 将 host 和 topic 实例传递给序列化器的 save 方法
             issue = serializer.save(host=self.request.user, topic=topic_instance)
             
-            # 通知相关管理员有新问题
-            from .notification_service import NotificationService
-            NotificationService.notify_new_issue_to_admins(issue)
+            # 通知相关管理员有新问题（写入发件箱，由 dispatch_notifications 异步处理）
+            outbox.enqueue_new_issue(issue)
         else:
             raise PermissionDenied("你必须登录才能发布。")
 
@@ -116,7 +151,7 @@ class ReplyListCreate(generics.ListCreateAPIView):
                 issue=issue
             )
             # 触发管理员回复通知
-            NotificationService.notify_admin_reply(reply)
+            outbox.enqueue_admin_reply(reply)
         else:
             # 如果未认证用户尝试创建，抛出权限拒绝异常
             raise PermissionDenied("你必须登录才能发布。")
@@ -138,7 +173,7 @@ class MessageListCreate(generics.ListCreateAPIView):
                 issue=issue
             )
             # 触发新评论通知
-            NotificationService.notify_new_comment(message)
+            outbox.enqueue_new_comment(message)
         else:
             # 如果未认证用户尝试创建，抛出权限拒绝异常
             raise PermissionDenied("你必须登录才能发布。")
@@ -147,33 +182,19 @@ class MessageListCreate(generics.ListCreateAPIView):
 @permission_classes([IsAuthenticated])
 def like_issue(request, issue_id):
     try:
-        issue = get_object_or_404(Issue, pk=issue_id)
+        issue = get_object_or_404(Issue.objects.only('id', 'created'), pk=issue_id)
         
-        # 检查用户是否已经点过赞
-        like_exists = IssueLike.objects.filter(user=request.user, issue=issue).exists()
-        
-        if like_exists:
-            # 如果已经点过赞，则取消点赞
-            IssueLike.objects.filter(user=request.user, issue=issue).delete()
-            new_likes = max(0, issue.likes - 1)
-            # 计算新的热度值（点赞权重=2，浏览权重=1）
-            new_popularity = new_likes * 2 + issue.views * 1
-            # 使用update()方法更新likes和popularity字段，避免触发auto_now
-            Issue.objects.filter(pk=issue_id).update(likes=new_likes, popularity=new_popularity)
-            issue.refresh_from_db()  # 刷新实例以获取最新值
-            return Response({'likes': issue.likes, 'popularity': issue.popularity, 'liked': False, 'message': '取消点赞'})
-        else:
-            # 如果没有点过赞，则添加点赞
-            IssueLike.objects.create(user=request.user, issue=issue)
-            new_likes = issue.likes + 1
-            # 计算新的热度值（点赞权重=2，浏览权重=1）
-            new_popularity = new_likes * 2 + issue.views * 1
-            # 使用update()方法更新likes和popularity字段，避免触发auto_now
-            Issue.objects.filter(pk=issue_id).update(likes=new_likes, popularity=new_popularity)
-            issue.refresh_from_db()  # 刷新实例以获取最新值
-            # 触发点赞通知
-            NotificationService.notify_issue_liked(issue, request.user)
-            return Response({'likes': issue.likes, 'popularity': issue.popularity, 'liked': True, 'message': '点赞成功'})
+        # 原子切换点赞状态，点赞数和热度值在同一事务中用 F() 表达式更新
+        liked, likes, views, popularity, like_id = LikeService.toggle(request.user, issue)
+        # 叠加写回缓冲中尚未写入的浏览量
+        views, likes, popularity = counter_buffer.merge(issue.pk, views, likes)
+        
+        if not liked:
+            return Response({'likes': likes, 'popularity': popularity, 'liked': False, 'message': '取消点赞'})
+        
+        # 触发点赞通知
+        outbox.enqueue_issue_liked(issue, request.user, like_id)
+        return Response({'likes': likes, 'popularity': popularity, 'liked': True, 'message': '点赞成功'})
             
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -181,14 +202,11 @@ def like_issue(request, issue_id):
 @api_view(['POST'])
 def view_issue(request, issue_id):
     try:
-        issue = get_object_or_404(Issue, pk=issue_id)
-        new_views = issue.views + 1
-        # 计算新的热度值（点赞权重=2，浏览权重=1）
-        new_popularity = issue.likes * 2 + new_views * 1
-        # 使用update()方法更新views和popularity字段，避免触发auto_now
-        Issue.objects.filter(pk=issue_id).update(views=new_views, popularity=new_popularity)
-        issue.refresh_from_db()  # 刷新实例以获取最新值
-        return Response({'views': issue.views, 'popularity': issue.popularity})
+        issue = get_object_or_404(Issue.objects.only('id', 'views', 'likes'), pk=issue_id)
+        # 浏览量增量交给写回缓冲，由后台线程批量写回（写回时同时更新热度值）
+        counter_buffer.add(issue.pk, views=1)
+        views, likes, popularity = counter_buffer.merge(issue.pk, issue.views, issue.likes)
+        return Response({'views': views, 'popularity': popularity})
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
@@ -196,8 +214,9 @@ def get_csrf_token(request):
     token = get_token(request)
     return JsonResponse({'csrfToken': token})
 
-def can_delete_issue(user, issue):
+def can_delete_issue(request, issue):
     """检查用户是否有权限删除问题"""
+    user = request.user
     if not user.is_authenticated:
         return False
     
@@ -210,7 +229,7 @@ def can_delete_issue(user, issue):
         return True
     
     # 检查用户是否有管理员角色
-    if hasattr(user, 'roles') and user.roles.filter(name__icontains='管理员').exists():
+    if get_authorization(request).has_role_containing('管理员'):
         return True
     
     return False
@@ -223,7 +242,7 @@ def delete_issue(request, issue_id):
         issue = get_object_or_404(Issue, pk=issue_id)
         
         # 检查权限
-        if not can_delete_issue(request.user, issue):
+        if not can_delete_issue(request, issue):
             return Response({'error': '您没有权限删除此问题'}, status=status.HTTP_403_FORBIDDEN)
         
         issue.delete()
@@ -237,7 +256,7 @@ def check_delete_permission(request, issue_id):
     """检查用户是否有删除权限"""
     try:
         issue = get_object_or_404(Issue, pk=issue_id)
-        can_delete = can_delete_issue(request.user, issue)
+        can_delete = can_delete_issue(request, issue)
         return Response({'can_delete': can_delete})
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -252,6 +271,75 @@ def check_like_status(request, issue_id):
     liked = IssueLike.objects.filter(user=request.user, issue=issue).exists()
     return Response({'liked': liked})
 
+# 搜索接口的分页：按相关度排序只能用偏移量分页，限制每页数量和可翻的页数
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 50
+SEARCH_MAX_PAGES = 50
+SEARCH_MAX_QUERY_LENGTH = 100
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_issues(request):
+    """
+    全文搜索公开问题（标题、描述、评论和回复），按相关度排序
+    参数：q 关键词，page 页码（从 1 开始），page_size 每页数量
+    返回格式与问题列表的分页结果一致：{'next': 下一页链接或 null, 'results': [...]}
+    只对最新的 SEARCH_CANDIDATES 条匹配文档和最新的一部分标题匹配文档排序（见 feedback/search_index.py），
+    常见词的结果偏向较新的问题，结果总数不超过候选数，页码也不会超出候选数对应的页数
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return Response({'error': '请输入搜索关键词'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(query) > SEARCH_MAX_QUERY_LENGTH:
+        query = query[:SEARCH_MAX_QUERY_LENGTH]
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+        page_size = min(max(int(request.GET.get('page_size', SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': '分页参数不正确'}, status=status.HTTP_400_BAD_REQUEST)
+    # 结果最多 SEARCH_CANDIDATES 个问题，之后的页码一定为空
+    max_pages = min(SEARCH_MAX_PAGES, math.ceil(search_index.candidates / page_size))
+    if page > max_pages:
+        return Response({'next': None, 'results': []})
+
+    # 多取一条用于判断是否还有下一页
+    ids = search_index.search_issue_ids(query, page_size + 1, (page - 1) * page_size)
+    has_next = len(ids) > page_size and page < max_pages
+    ids = ids[:page_size]
+    issues = IssueListSerializer.setup_queryset(Issue.objects.filter(pk__in=ids, is_public=True)).in_bulk()
+    results = [issues[pk] for pk in ids if pk in issues]
+    serializer = IssueListSerializer(results, many=True, context={'request': request})
+    next_link = replace_query_param(request.build_absolute_uri(), 'page', page + 1) if has_next else None
+    return Response({'next': next_link, 'results': serializer.data})
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def similar_issues(request):
+    """
+    提交问题时查找可能重复的未解决公开问题（前端随输入调用）
+    参数：title 标题，description 描述（可选）
+    """
+    title = request.GET.get('title', '')[:50]
+    description = request.GET.get('description', '')[:1000]
+    if not (title.strip() or description.strip()):
+        return Response({'results': []})
+
+    matches = duplicate_index.find_similar(title, description)
+    issues = Issue.objects.select_related('topic').filter(
+        pk__in=[issue_id for issue_id, _ in matches], is_public=True
+    ).in_bulk()
+    return Response({'results': [
+        {
+            'id': issue_id,
+            'title': issues[issue_id].title,
+            'topic': issues[issue_id].topic.name if issues[issue_id].topic else None,
+            'status': issues[issue_id].status,
+            'likes': issues[issue_id].likes,
+            'similarity': round(score, 2),
+        }
+        for issue_id, score in matches if issue_id in issues
+    ]})
+
 class NotificationListView(generics.ListAPIView):
     """获取用户通知列表"""
     serializer_class = NotificationSerializer
@@ -261,26 +349,25 @@ class NotificationListView(generics.ListAPIView):
         user = self.request.user
         is_read = self.request.query_params.get('is_read', None)
         admin_filter = self.request.query_params.get('admin_filter', 'false').lower() == 'true'
+        # 只有按负责的分类过滤时才需要角色
+        auth = get_authorization(self.request) if admin_filter else None
         
         if is_read is not None:
             is_read = is_read.lower() == 'true'
-            return NotificationService.get_user_notifications(user, is_read=is_read, admin_filter=admin_filter)
+            return NotificationService.get_user_notifications(
+                user, is_read=is_read, admin_filter=admin_filter, auth=auth
+            )
         
-        return NotificationService.get_user_notifications(user, admin_filter=admin_filter)
+        return NotificationService.get_user_notifications(user, admin_filter=admin_filter, auth=auth)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_unread_count(request):
     """获取未读通知数量"""
     admin_filter = request.query_params.get('admin_filter', 'false').lower() == 'true'
-    
-    if admin_filter:
-        # 使用过滤后的通知查询集计算未读数量
-        notifications = NotificationService.get_user_notifications(request.user, admin_filter=True)
-        count = notifications.filter(is_read=False).count()
-    else:
-        count = NotificationService.get_unread_count(request.user)
-    
+    count = NotificationService.get_unread_count(
+        request.user, admin_filter=admin_filter, auth=get_authorization(request) if admin_filter else None
+    )
     return Response({'unread_count': count})
 
 @api_view(['POST'])
@@ -299,13 +386,134 @@ def mark_notifications_read(request):
 @permission_classes([IsAuthenticated])
 def mark_all_read(request):
     """标记所有通知为已读"""
-    updated_count = Notification.objects.filter(
-        recipient=request.user,
-        is_read=False
-    ).update(is_read=True)
-    
+    updated_count = NotificationService.mark_all_read(request.user)
     return Response({'updated_count': updated_count})
 
+def _authenticate_jwt(request):
+    """异步视图中的 JWT 认证（Authorization 请求头），未提供或无效时返回 None"""
+    authenticator = CachedJWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header else None
+    if not raw_token:
+        return None
+    try:
+        return authenticator.get_user(authenticator.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+def _authenticate_stream(request):
+    """推送接口的认证：EventSource 无法设置请求头，接受 ?ticket= 短期推送票据代替访问令牌"""
+    user = _authenticate_jwt(request)
+    if user is None and request.GET.get('ticket'):
+        user = authenticate_stream_ticket(request.GET['ticket'])
+    return user
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def notification_stream_ticket(request):
+    """签发通知推送票据，客户端每次建立推送连接前获取"""
+    return Response({
+        'ticket': issue_stream_ticket(request.user),
+        'expires_in': getattr(settings, 'STREAM_TICKET_SECONDS', 60),
+    })
+
+def _fetch_stream_updates(user, last_id, admin_filter, auth):
+    """读取 last_id 之后的新通知和当前未读数"""
+    rows = list(
+        NotificationService.get_user_notifications(user, admin_filter=admin_filter, auth=auth)
+        .filter(id__gt=last_id).select_related('sender', 'issue').order_by('id')[:50]
+    )
+    notifications = NotificationSerializer(rows, many=True).data
+    return notifications, NotificationService.get_unread_count(user, admin_filter=admin_filter, auth=auth)
+
+def _sse(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data, ensure_ascii=False)}"]
+    return "\n".join(lines) + "\n\n"
+
+async def _notification_events(user, last_id, admin_filter, auth=None):
+    """
+    SSE 事件流：被 notification_hub 唤醒时推送新通知和未读数，空闲时只发送心跳
+    订阅在开始输出之后注册并在 finally 中注销：客户端在响应开始前断开时生成器不会运行，不会留下订阅
+    其他进程（如 dispatch_notifications）生成的通知无法唤醒本进程，按 catch-up 间隔补查一次
+    连接保持 NOTIFICATION_PUSH_MAX_SECONDS 后关闭，客户端带 Last-Event-ID 自动重连
+    """
+    heartbeat = getattr(settings, 'NOTIFICATION_PUSH_HEARTBEAT_SECONDS', 15)
+    catchup = getattr(settings, 'NOTIFICATION_PUSH_CATCHUP_SECONDS', 60)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + getattr(settings, 'NOTIFICATION_PUSH_MAX_SECONDS', 300)
+    next_catchup = loop.time() + catchup if catchup else None
+    fetch = sync_to_async(_fetch_stream_updates)
+    yield "retry: 3000\n\n"
+    subscription = notification_hub.subscribe(user.id)
+    if subscription is None:
+        # 视图检查之后其他连接抢先占满了名额
+        yield _sse('error', {'error': '连接数过多，请关闭其他标签页后重试'})
+        return
+    try:
+        woken = True
+        while True:
+            if woken:
+                notifications, unread_count = await fetch(user, last_id, admin_filter, auth)
+                for notification in notifications:
+                    last_id = notification['id']
+                    yield _sse('notification', notification, event_id=last_id)
+                yield _sse('unread_count', {'unread_count': unread_count}, event_id=last_id)
+
+            now = loop.time()
+            if now >= deadline:
+                break
+            timeout = min(heartbeat, deadline - now)
+            if next_catchup is not None:
+                timeout = max(min(timeout, next_catchup - now), 0)
+            woken = await subscription.wait(timeout)
+            if next_catchup is not None and loop.time() >= next_catchup:
+                woken = True
+                next_catchup = loop.time() + catchup
+            if not woken:
+                yield ": heartbeat\n\n"
+    finally:
+        notification_hub.unsubscribe(subscription)
+
+async def notification_stream(request):
+    """
+    通知推送（Server-Sent Events）
+    GET /feedback/notifications/stream/?ticket=<推送票据>&since=<通知ID>&admin_filter=true
+    票据由 POST notifications/stream-ticket/ 签发；也可以用 Authorization 请求头认证
+    断线重连时 Last-Event-ID 请求头优先于 since 参数；都没有时只推送连接之后的新通知
+    需要通过 ASGI 服务器部署（backend/asgi.py）才能保持大量空闲连接
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': '仅支持GET请求'}, status=405)
+    user = await sync_to_async(_authenticate_stream)(request)
+    if user is None:
+        return JsonResponse({'detail': '身份认证信息未提供或无效'}, status=401)
+
+    since = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    try:
+        last_id = int(since) if since is not None else None
+    except ValueError:
+        return JsonResponse({'error': 'since 参数必须是整数'}, status=400)
+    if last_id is None:
+        last_id = await sync_to_async(
+            lambda: Notification.objects.filter(recipient=user).order_by('-id').values_list('id', flat=True).first() or 0
+        )()
+
+    admin_filter = request.GET.get('admin_filter', 'false').lower() == 'true'
+    # 授权上下文在连接建立时取得一次，角色变化在连接到期重连后生效
+    auth = await sync_to_async(AuthorizationContext.for_user)(user) if admin_filter else None
+
+    if notification_hub.connection_count(user.id) >= notification_hub.max_connections_per_user:
+        return JsonResponse({'error': '连接数过多，请关闭其他标签页后重试'}, status=429)
+
+    response = StreamingHttpResponse(
+        _notification_events(user, last_id, admin_filter, auth),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 # 历史记录相关API
 class ViewHistoryListCreate(generics.ListCreateAPIView):
     """获取用户浏览历史记录"""
@@ -409,80 +617,146 @@ def check_favorite_status(request, issue_id):
     favorited = Favorite.objects.filter(user=request.user, issue=issue).exists()
     return Response({'favorited': favorited})
 
-# 智能客服聊天API
-@api_view(['POST'])
-@permission_classes([AllowAny])  # 允许任何人使用智能客服
-def chat(request):
+def _json_body(request):
+    """解析异步视图的 JSON 请求体，格式不正确时返回 None"""
+    try:
+        data = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+def _load_chat_session(request, session_id):
+    """读取客户端发送的会话，登录用户的会话与账号绑定；不存在或已失效时返回新会话"""
+    return chat_sessions.load(session_id, _authenticate_jwt(request))
+
+# 智能客服聊天API（异步视图，通过 backend/asgi.py 部署时不占用线程等待上游）
+@csrf_exempt
+async def chat(request):
     """
     智能客服聊天接口
-    接收用户消息，返回AI回复
+    接收用户消息和会话ID（session_id，首次对话可省略），返回AI回复和会话ID
+    对话历史保存在服务端，客户端不再发送 history
+    允许任何人使用智能客服
     """
+    if request.method != 'POST':
+        return JsonResponse({'error': '仅支持POST请求'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
     
     try:
+        data = _json_body(request)
+        if data is None:
+            return JsonResponse({'error': '请求格式不正确'}, status=status.HTTP_400_BAD_REQUEST)
+        
         # 获取用户消息
-        user_message = request.data.get('message', '').strip()
+        user_message = str(data.get('message') or '').strip()
         
         if not user_message:
-            return Response(
+            return JsonResponse(
                 {'error': '消息不能为空'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # 获取对话历史（可选）
-        conversation_history = request.data.get('history', [])
+        # 读取服务端保存的会话
+        session = await sync_to_async(_load_chat_session)(request, data.get('session_id'))
         
         # 调用聊天服务
-        result = chat_service.get_response(user_message, conversation_history)
+        result = await chat_service.aget_response(user_message, session=session)
         
         if result['success']:
-            return Response({
+            return JsonResponse({
                 'message': result['message'],
-                'usage': result.get('usage', {})
+                'usage': result.get('usage', {}),
+                'session_id': result['session_id']
             })
         else:
-            return Response(
+            return JsonResponse(
                 {'error': result['message']},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                status=status.HTTP_503_SERVICE_UNAVAILABLE if result.get('degraded') else status.HTTP_500_INTERNAL_SERVER_ERROR
             )
             
     except Exception as e:
-        return Response(
+        return JsonResponse(
             {'error': f'服务器错误: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 
-@api_view(['POST'])
-@authentication_classes([])  # 跳过认证
-@permission_classes([AllowAny])  # 允许所有用户
-def classify_issue_view(request):
+@csrf_exempt
+async def chat_stream(request):
     """
-    智能分类问题接口
+    智能客服流式聊天接口（Server-Sent Events）
+    请求体与 chat/ 相同；校验失败时返回普通 JSON 错误，
+    否则依次推送 delta 事件（{"content": 文本片段}），最后推送 done 事件（{"usage": ..., "session_id": ...}）或 error 事件
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': '仅支持POST请求'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': '请求格式不正确'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    user_message = str(data.get('message') or '').strip()
+    if not user_message:
+        return JsonResponse({'error': '消息不能为空'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    session = await sync_to_async(_load_chat_session)(request, data.get('session_id'))
+    result = chat_service.astream_response(user_message, session=session)
+    if isinstance(result, dict):
+        return JsonResponse(
+            {'error': result['message']},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE if result.get('degraded') else status.HTTP_400_BAD_REQUEST
+        )
+    
+    async def events():
+        async for event, payload in result:
+            if event == 'delta':
+                yield _sse('delta', {'content': payload})
+            elif event == 'done':
+                yield _sse('done', {'usage': payload, 'session_id': str(session.pk)})
+            else:
+                yield _sse('error', {'error': payload})
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@csrf_exempt
+async def classify_issue_view(request):
+    """
+    智能分类问题接口（异步视图）
     接收标题和描述，返回建议的分类
     允许未登录用户访问
     """
+    if request.method != 'POST':
+        return JsonResponse({'error': '仅支持POST请求'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    
     try:
-        title = request.data.get('title', '')
-        description = request.data.get('description', '')
+        data = _json_body(request)
+        if data is None:
+            return JsonResponse({'error': '请求格式不正确'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        title = str(data.get('title') or '')
+        description = str(data.get('description') or '')
         
         if not title:
-            return Response(
+            return JsonResponse(
                 {'error': '标题不能为空'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         # 调用分类服务
-        result = classify_service.classify_issue(title, description)
+        result = await classify_service.aclassify_issue(title, description)
         
         if result['success']:
-            return Response({
+            return JsonResponse({
                 'category': result['category'],
                 'confidence': result['confidence'],
                 'reason': result['reason']
             })
         else:
             # 分类失败时仍返回默认分类
-            return Response({
+            return JsonResponse({
                 'category': result['category'],
                 'confidence': result['confidence'],
                 'reason': result['reason'],
@@ -490,12 +764,50 @@ def classify_issue_view(request):
             })
             
     except Exception as e:
-        return Response(
+        return JsonResponse(
             {'error': f'分类服务错误: {str(e)}', 'category': '其他'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 
+@api_view(['POST'])
+@permission_classes([IsAnyAdmin])
+def classify_batch_view(request):
+    """
+    批量智能分类（管理员）
+    请求体：{"issues": [{"title": ..., "description": ...}, ...]}，最多 CLASSIFY_BATCH_MAX_ITEMS 条
+    返回与请求顺序一致的分类结果
+    """
+    issues = request.data.get('issues')
+    max_items = getattr(settings, 'CLASSIFY_BATCH_MAX_ITEMS', 200)
+    if not isinstance(issues, list) or not issues:
+        return Response({'error': '请提供问题列表'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(issues) > max_items:
+        return Response({'error': f'一次最多分类 {max_items} 个问题'}, status=status.HTTP_400_BAD_REQUEST)
+    if not all(isinstance(item, dict) for item in issues):
+        return Response({'error': '问题格式不正确'}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = classify_service.classify_batch([
+        (str(item.get('title') or ''), str(item.get('description') or '')) for item in issues
+    ])
+    return Response({'results': [
+        {
+            'category': result['category'],
+            'confidence': result['confidence'],
+            'reason': result['reason'],
+            'success': result['success'],
+        }
+        for result in results
+    ]})
+
+
+@api_view(['GET'])
+@permission_classes([IsAnyAdmin])
+def classify_cache_stats(request):
+    """智能分类缓存的命中率等指标（当前进程）"""
+    return Response(classification_cache.stats())
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def confirm_issue_resolved(request, issue_id):
@@ -535,7 +847,7 @@ def confirm_issue_resolved(request, issue_id):
             rating_text = f"评分: {rating}星" if rating else "未评分"
             feedback_text = f"反馈: {feedback}" if feedback else "无反馈"
             
-            Notification.objects.create(
+            NotificationService.create_notification(
                 recipient=latest_reply.administrator,
                 sender=request.user,
                 notification_type='status_update',
@@ -622,7 +934,7 @@ def mark_issue_unresolved(request, issue_id):
         if latest_reply and latest_reply.administrator:
             reason_text = f"原因: {reason}" if reason else "用户未填写原因"
             
-            Notification.objects.create(
+            NotificationService.create_notification(
                 recipient=latest_reply.administrator,
                 sender=request.user,
                 notification_type='status_update',
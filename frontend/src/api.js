@@ -37,6 +37,11 @@ export const feedbackAPI = {
   getIssueDetail: (id) => api.get(`/feedback/issues/${id}/`),
   updateIssue: (id, data) => api.put(`/feedback/issues/${id}/`, data),
   deleteIssue: (id) => api.delete(`/feedback/issues/${id}/`),
+  // 全文搜索（标题、描述、评论和回复），按相关度排序，page 从 1 开始
+  searchIssues: (q, page = 1, pageSize = 20) =>
+    api.get("/feedback/issues/search/", { params: { q, page, page_size: pageSize } }),
+  similarIssues: (title, description = "") =>
+    api.get("/feedback/issues/similar/", { params: { title, description } }),
 
   getTopicList: () => api.get("/feedback/topics/"),
 
@@ -84,6 +89,19 @@ export const notificationAPI = {
     return api.get("/feedback/notifications/", { params });
   },
 
+  // 通知推送（Server-Sent Events）地址：EventSource 无法设置请求头，每次连接前获取一张短期推送票据放在查询参数中
+  getStreamUrl: async (adminFilter = false, since = null) => {
+    const { data } = await api.post("/feedback/notifications/stream-ticket/");
+    const params = new URLSearchParams({ ticket: data.ticket });
+    if (adminFilter) {
+      params.set("admin_filter", "true");
+    }
+    if (since !== null) {
+      params.set("since", since);
+    }
+    return `${api.defaults.baseURL}/feedback/notifications/stream/?${params}`;
+  },
+
   // 获取未读通知数量
   getUnreadCount: (adminFilter = false) => {
     const params = adminFilter ? { admin_filter: true } : {};
@@ -125,9 +143,53 @@ export const favoriteAPI = {
 };
 
 export const chatAPI = {
-  // 智能客服聊天接口
-  chat: ({ message, history = [] }) =>
-    api.post("/feedback/chat/", { message, history }),
+  // 智能客服聊天接口：对话历史保存在服务端，只需发送新消息和会话ID
+  chat: ({ message, sessionId }) =>
+    api.post("/feedback/chat/", { message, session_id: sessionId }),
+
+  // 流式聊天接口：逐段回调 onDelta，结束时返回 { usage, session_id }
+  // axios 在浏览器中无法读取流式响应，这里使用 fetch
+  chatStream: async ({ message, sessionId, onDelta, signal }) => {
+    const token = localStorage.getItem(ACCESS_TOKEN);
+    const response = await fetch(`${api.defaults.baseURL}/feedback/chat/stream/`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+      body: JSON.stringify({ message, session_id: sessionId }),
+      signal,
+    });
+    if (!response.ok || !response.body) {
+      const data = await response.json().catch(() => ({}));
+      throw new Error(data.error || `HTTP ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        const fields = {};
+        block.split("\n").forEach((line) => {
+          const index = line.indexOf(": ");
+          if (index > 0) fields[line.slice(0, index)] = line.slice(index + 2);
+        });
+        if (!fields.data) continue;
+        const data = JSON.parse(fields.data);
+        if (fields.event === "delta") onDelta?.(data.content);
+        else if (fields.event === "done") return data;
+        else if (fields.event === "error") throw new Error(data.error);
+      }
+    }
+    return {};
+  },
 };
 
 export const classifyAPI = {
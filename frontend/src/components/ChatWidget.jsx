@@ -32,6 +32,8 @@ const ChatWidget = () => {
     },
   ]);
 
+  // 对话历史保存在服务端，这里只记住会话ID（关闭页面后失效）
+  const sessionIdRef = useRef(sessionStorage.getItem("chat_session_id"));
   const listRef = useRef(null);
   const draggingRef = useRef(false);
   const dragOffsetRef = useRef({ x: 0, y: 0 });
@@ -202,24 +204,44 @@ const ChatWidget = () => {
     if (!text || loading) return;
 
     const userMsg = { role: "user", content: text };
-    const history = messages.map(({ role, content }) => ({ role, content }));
     setMessages((prev) => [...prev, userMsg]);
     setInput("");
     setLoading(true);
 
+    // 先放入一条空的回复，流式内容到达后逐段追加
+    setMessages((prev) => [...prev, { role: "assistant", content: "" }]);
+    const updateReply = (update) =>
+      setMessages((prev) => {
+        const next = [...prev];
+        const last = next[next.length - 1];
+        next[next.length - 1] = { ...last, content: update(last.content) };
+        return next;
+      });
+
+    let received = false;
     try {
-      const { data } = await chatAPI.chat({ message: text, history });
-      const reply = data?.message || "抱歉，暂时无法获取回复。";
-      setMessages((prev) => [...prev, { role: "assistant", content: reply }]);
+      const result = await chatAPI.chatStream({
+        message: text,
+        sessionId: sessionIdRef.current,
+        onDelta: (delta) => {
+          received = true;
+          updateReply((content) => content + delta);
+        },
+      });
+      if (result?.session_id) {
+        sessionIdRef.current = result.session_id;
+        sessionStorage.setItem("chat_session_id", result.session_id);
+      }
+      if (!received) {
+        updateReply(() => "抱歉，暂时无法获取回复。");
+      }
     } catch (err) {
       console.error("Chat error:", err);
-      setMessages((prev) => [
-        ...prev,
-        {
-          role: "assistant",
-          content: "抱歉，智能客服暂时不可用，请稍后再试。",
-        },
-      ]);
+      updateReply((content) =>
+        received
+          ? `${content}\n（回复中断，请稍后再试）`
+          : "抱歉，智能客服暂时不可用，请稍后再试。"
+      );
     } finally {
       setLoading(false);
     }
@@ -15,11 +15,12 @@ const TrendingIssues = () => {
         const response = await api.get("/feedback/issues/", {
           params: {
             sortBy: "popularity",
+            page_size: 5,
           },
         });
 
-        // 取热度最高的前5个问题
-        const topIssues = response.data.slice(0, 5);
+        // 分页接口只返回热度最高的前5个问题
+        const topIssues = response.data.results;
         setTrendingIssues(topIssues);
       } catch (error) {
         console.error("获取热门问题失败:", error);
@@ -81,17 +81,66 @@ export const useNotifications = (adminFilter = false) => {
     }
   }, [fetchUnreadCount]);
 
-  // 定期更新未读数量（可选）
+  // 通过推送连接实时更新未读数量和通知列表，浏览器不支持时退回定期轮询
   useEffect(() => {
     const token = localStorage.getItem(ACCESS_TOKEN);
     if (!token) return;
 
-    const interval = setInterval(() => {
-      fetchUnreadCount();
-    }, 30000); // 每30秒更新一次
+    if (typeof EventSource === 'undefined') {
+      const interval = setInterval(() => {
+        fetchUnreadCount();
+      }, 30000); // 每30秒更新一次
+      return () => clearInterval(interval);
+    }
 
-    return () => clearInterval(interval);
-  }, [fetchUnreadCount]);
+    let source = null;
+    let reconnectTimer = null;
+    let closed = false;
+    let lastEventId = null;
+
+    const scheduleReconnect = (delay) => {
+      if (!closed) {
+        reconnectTimer = setTimeout(connect, delay);
+      }
+    };
+
+    const connect = async () => {
+      let url;
+      try {
+        url = await notificationAPI.getStreamUrl(adminFilter, lastEventId);
+      } catch (err) {
+        // 获取票据失败（如令牌过期），稍后重试
+        scheduleReconnect(10000);
+        return;
+      }
+      if (closed) return;
+      source = new EventSource(url);
+      source.addEventListener('unread_count', (event) => {
+        if (event.lastEventId) lastEventId = event.lastEventId;
+        setUnreadCount(JSON.parse(event.data).unread_count);
+      });
+      source.addEventListener('notification', (event) => {
+        if (event.lastEventId) lastEventId = event.lastEventId;
+        const notification = JSON.parse(event.data);
+        setNotifications(prev =>
+          prev.some(item => item.id === notification.id) ? prev : [notification, ...prev]
+        );
+      });
+      source.onerror = () => {
+        // 票据只在建立连接时有效，浏览器自动重连会使用过期的票据：
+        // 连接断开（服务器到期关闭、被拒绝）时自行关闭，稍后用新票据从最后收到的通知处继续
+        source.close();
+        scheduleReconnect(3000);
+      };
+    };
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
+      if (source) source.close();
+    };
+  }, [adminFilter, fetchUnreadCount]);
 
   return {
     notifications,
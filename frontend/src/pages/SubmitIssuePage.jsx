@@ -25,6 +25,9 @@ const SubmitIssuePage = ({ user, onIssueSubmitted, onCancel }) => {
   const [classifyConfidence, setClassifyConfidence] = useState(0);
   const [classifyReason, setClassifyReason] = useState("");
 
+  // 可能重复的问题（输入标题、描述时自动查找）
+  const [similarIssues, setSimilarIssues] = useState([]);
+
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [success, setSuccess] = useState(false);
@@ -92,6 +95,29 @@ const SubmitIssuePage = ({ user, onIssueSubmitted, onCancel }) => {
     fetchTopics();
   }, []);
 
+  // 停止输入 400ms 后查找可能重复的问题
+  useEffect(() => {
+    if (!title.trim()) {
+      setSimilarIssues([]);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const res = await feedbackAPI.similarIssues(title, description);
+        if (!cancelled) {
+          setSimilarIssues(res.data.results);
+        }
+      } catch (err) {
+        console.error("查找相似问题失败：", err);
+      }
+    }, 400);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [title, description]);
+
   // 执行智能分类（通过按钮触发）
   const performClassification = async () => {
     if (!title && !description) {
@@ -236,6 +262,29 @@ const SubmitIssuePage = ({ user, onIssueSubmitted, onCancel }) => {
                 className="form-input"
                 required
               />
+              {similarIssues.length > 0 && (
+                <div className="similar-issues-box">
+                  <p className="similar-issues-title">可能重复的问题：</p>
+                  <ul>
+                    {similarIssues.map((issue) => (
+                      <li key={issue.id}>
+                        <a
+                          href={`/detail/${issue.id}`}
+                          onClick={(e) => {
+                            e.preventDefault();
+                            navigate(`/detail/${issue.id}`);
+                          }}
+                        >
+                          {issue.title}
+                        </a>
+                        <span className="similar-issue-meta">
+                          {issue.status} · 👍 {issue.likes}
+                        </span>
+                      </li>
+                    ))}
+                  </ul>
+                </div>
+              )}
             </div>
 
             <div className="form-group">